@@ -0,0 +1,221 @@
+#run.py
+# Offline benchmarks of the manager's session analytics - no network, no game server.
+#
+#   cd manager
+#   python -m benchmarks.run                                  # 10k, 100k and 1M events
+#   python -m benchmarks.run --sizes 10000,5000000 --repeat 5 --json results.json
+#   python -m benchmarks.run --only analyzers                 # or: ingest, route
+#
+# For every size it generates synthetic sessions (benchmarks/synthetic.py) and reports,
+# per benchmark, the median wall time, the throughput in events per second and the peak
+# Python/NumPy memory allocated during one run (tracemalloc, measured in a separate run so
+# it does not slow down the timed ones):
+#   ingest     payload strings -> decode_payload -> SessionEvents.from_dicts
+#   analyzers  every analyzer of managers/session_data.py on a SessionEventBundle
+#   route      GET /session_data/single/<chart> end to end through Flask, against the
+#              local game-server stand-in (benchmarks/standin.py):
+#                running   session still running - fetched and analyzed on every request
+#                first     finished session, first request - fetched, cached, analyzed
+#                cached    finished session, later requests - served from the caches
+#
+# The manager writes its data directory (logs, event cache) to a temporary directory,
+# removed at the end, unless MANAGER_DATA_DIR points somewhere else.
+
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# the manager reads these when it is imported - set them first
+PORT = _free_port()
+os.environ["IMS_GAME_SERVER_URL"] = f"http://127.0.0.1:{PORT}"
+TEMP_DATA_DIR = None if "MANAGER_DATA_DIR" in os.environ else tempfile.mkdtemp(prefix="manager-bench-")
+os.environ.setdefault("MANAGER_DATA_DIR", TEMP_DATA_DIR or "")
+os.environ.setdefault("MANAGER_LOG_STDOUT", "0")
+
+from src.managers.decoding import decode_payload  # noqa: E402
+from src.managers.events import SessionEvents  # noqa: E402
+from src.managers import session_data  # noqa: E402
+from src.managers.session_data import SessionEventBundle, charts_for_game  # noqa: E402
+
+from .standin import GameServerStandIn  # noqa: E402
+from .synthetic import GAMES, generate_session, to_payload  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# analyzers that read the metric streams run on one session; the game analyzers on their game's
+METRIC_ANALYZERS = {
+    "get_heartrate": lambda sid, b: session_data.get_heartrate(sid, b),
+    "get_and_calculate_HRV": lambda sid, b: session_data.get_and_calculate_HRV(sid, b),
+    "get_latency": lambda sid, b: session_data.get_latency(sid, b),
+    "get_jitter": lambda sid, b: session_data.get_jitter(sid, b),
+    "get_downsampled_series[heart]": lambda sid, b: session_data.get_downsampled_series(sid, "heart", bundle=b),
+    "get_downsampled_series[hrv]": lambda sid, b: session_data.get_downsampled_series(sid, "hrv", bundle=b),
+}
+GAME_ANALYZERS = {
+    "WATER_RIPPLES": {"get_click_game_sync": lambda sid, b: session_data.get_click_game_sync(sid, b)},
+    "WINE_GLASSES": {
+        "get_swipe_game_frequency": lambda sid, b: session_data.get_swipe_game_frequency(sid, b),
+        "get_downsampled_series[angle]": lambda sid, b: session_data.get_downsampled_series(sid, "angle", bundle=b),
+    },
+    "WAVES": {"get_waves": lambda sid, b: session_data.get_waves(sid, b)},
+    "PACMAN": {"get_pacman": lambda sid, b: session_data.get_pacman(sid, b)},
+    "TREE": {"get_tree": lambda sid, b: session_data.get_tree(sid, b)},
+}
+ROUTE_GAME = "WAVES"
+
+
+class Results:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, size: int, name: str, events: int, times: list[float], peak_bytes: int | None):
+        median = statistics.median(times)
+        row = {
+            "size": size,
+            "benchmark": name,
+            "events": events,
+            "median_ms": round(median * 1000, 2),
+            "events_per_s": round(events / median) if median > 0 else None,
+            "peak_mb": round(peak_bytes / 2 ** 20, 1) if peak_bytes is not None else None,
+        }
+        self.rows.append(row)
+        print(f"{size:>10,}  {name:<42} {row['median_ms']:>11,.2f} ms  "
+              f"{(row['events_per_s'] or 0):>14,} ev/s  "
+              f"{'' if row['peak_mb'] is None else format(row['peak_mb'], '>8,.1f') + ' MB'}", flush=True)
+
+
+def measure(fn, repeat: int, memory: bool = True) -> tuple[list[float], int | None]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+
+# ------------------------------------------------------------------ benchmarks
+
+def bench_ingest(results: Results, size: int, events: SessionEvents, repeat: int):
+    payload = to_payload(events)
+    times, peak = measure(lambda: SessionEvents.from_dicts(decode_payload(payload, "benchmark")), repeat)
+    results.add(size, "ingest: decode_payload + from_dicts", len(events), times, peak)
+
+
+def bench_analyzers(results: Results, size: int, game: str, events: SessionEvents, repeat: int, with_metrics: bool):
+    bundle = SessionEventBundle.from_events(f"bench-{game}-{size}", events)  # not final: nothing is cached
+    analyzers = {**(METRIC_ANALYZERS if with_metrics else {}), **GAME_ANALYZERS[game]}
+    for name, analyzer in analyzers.items():
+        times, peak = measure(lambda: analyzer(bundle.session_id, bundle), repeat)
+        results.add(size, f"{name} ({game})", len(events), times, peak)
+
+
+def bench_route(results: Results, size: int, events: SessionEvents, repeat: int, standin: GameServerStandIn,
+                client, next_session_id):
+    charts = charts_for_game(ROUTE_GAME)
+
+    def request(sid, chart):
+        response = client.get(f"/session_data/single/{chart}?session_id={sid}")
+        if response.status_code != 200:
+            raise RuntimeError(f"/session_data/single/{chart} answered {response.status_code}")
+
+    running = next_session_id()
+    standin.add_session(running, events, session_type=ROUTE_GAME, state="IN_PROGRESS")
+    standin.warm(running)
+    for chart in charts:
+        times, _ = measure(lambda: request(running, chart), repeat, memory=False)
+        results.add(size, f"route running /single/{chart}", len(events), times, None)
+
+    # a fresh finished session per run, so each run is a first request
+    for chart in charts:
+        times = []
+        for _ in range(repeat):
+            sid = next_session_id()
+            standin.add_session(sid, events, session_type=ROUTE_GAME, state="COMPLETED")
+            standin.warm(sid)
+            started = time.perf_counter()
+            request(sid, chart)
+            times.append(time.perf_counter() - started)
+        results.add(size, f"route first /single/{chart}", len(events), times, None)
+
+        times, _ = measure(lambda: request(sid, chart), repeat, memory=False)
+        results.add(size, f"route cached /single/{chart}", len(events), times, None)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the manager's session analytics.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated session sizes in events (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--only", choices=("ingest", "analyzers", "route"), action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s.replace("_", "")) for s in args.sizes.split(",") if s.strip()]
+    groups = set(args.only or ("ingest", "analyzers", "route"))
+    results = Results()
+
+    standin = client = None
+    if "route" in groups:
+        from src.app import app  # imported late: it needs IMS_GAME_SERVER_URL, set above
+
+        standin = GameServerStandIn()
+        standin.start(port=PORT)
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s['username'], s['token'] = "benchmark", "benchmark-token"
+    session_ids = iter(range(1, 1_000_000))
+
+    print(f"{'size':>10}  {'benchmark':<42} {'median':>14}  {'throughput':>19}  {'peak':>11}")
+    for size in sizes:
+        started = time.perf_counter()
+        sessions = {}
+        for i, game in enumerate(GAMES):
+            if "analyzers" in groups or game == ROUTE_GAME:
+                sessions[game] = generate_session(size, game=game, seed=args.seed + i)
+        print(f"# {size:,} events: generated {len(sessions)} sessions in {time.perf_counter() - started:.1f} s")
+
+        if "ingest" in groups:
+            bench_ingest(results, size, sessions[ROUTE_GAME], args.repeat)
+        if "analyzers" in groups:
+            for game, events in sessions.items():
+                bench_analyzers(results, size, game, events, args.repeat, with_metrics=game == ROUTE_GAME)
+        if "route" in groups:
+            bench_route(results, size, sessions[ROUTE_GAME], args.repeat, standin, client,
+                        lambda: next(session_ids))
+
+    if standin is not None:
+        standin.stop()
+    if TEMP_DATA_DIR:
+        shutil.rmtree(TEMP_DATA_DIR, ignore_errors=True)  # cached events of the synthetic sessions
+    if args.json:
+        import json
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results.rows}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
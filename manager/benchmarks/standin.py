@@ -0,0 +1,134 @@
+#standin.py
+# A local stand-in for the game server, just enough of its HTTP contract for the manager:
+#   POST /data/session/select/events   {"sessionId", "subtype"?}  -> the session's events
+#   POST /data/session/select          {"sessionId"}              -> the session record
+#   POST /data/participant/select      {}                         -> the participants
+#   POST /manager                      {"type": GAME_REQUEST_TYPE, ...}
+#   GET  /login                                                   -> a bearer token
+# Every answer is {"success", "message", "payload": [JSON strings]}, like the real server.
+#
+# Response bodies are encoded once per (session, subtype) and then served from memory, so
+# the stand-in's own work stays out of what the benchmarks measure.
+#
+#   server = GameServerStandIn()
+#   server.add_session(1, events, session_type="WAVES", state="COMPLETED")
+#   url = server.start()      # http://127.0.0.1:<port>
+
+import http.server
+import threading
+
+from src.managers.decoding import dumps, loads
+
+from .synthetic import to_payload
+
+
+def _body(payload: list, success: bool = True, message: str = "") -> bytes:
+    return dumps({"success": success, "message": message, "payload": payload}).encode()
+
+
+class GameServerStandIn:
+    def __init__(self, participants: int = 200, latency_s: float = 0.0):
+        self.latency_s = latency_s  # added to every answer, to model a remote server
+        self._sessions = {}         # sessionId -> {"events", "record", "bodies"}
+        self._lock = threading.Lock()
+        self._server = None
+        self.calls = 0
+        self.participants = [
+            dumps({"pid": pid, "firstName": f"First{pid}", "lastName": f"Last{pid}", "age": 20 + pid % 40,
+                   "gender": "Male" if pid % 2 else "Female", "phone": f"050{pid:07d}",
+                   "email": f"participant{pid}@example.com"})
+            for pid in range(1, participants + 1)
+        ]
+        self.online = [f"{pid:03d}" for pid in range(1, min(participants, 10) + 1)]
+
+    # ------------------------------------------------------------------ data
+
+    def add_session(self, session_id: int, events, session_type: str = "WAVES", state: str = "COMPLETED"):
+        record = {"sessionId": session_id, "expId": 1, "sessionType": session_type.replace("_", " "),
+                  "state": state, "duration": 60}
+        with self._lock:
+            self._sessions[str(session_id)] = {"events": events, "record": record, "bodies": {}}
+
+    def warm(self, session_id):
+        """Encodes every answer about a session up front, so a benchmark does not time the encoding."""
+        with self._lock:
+            session = self._sessions.get(str(session_id))
+        if session is not None:
+            for subtype in [None, *session["events"].subtypes]:
+                self._events_body(session_id, subtype)
+
+    def _events_body(self, session_id, subtype) -> bytes:
+        with self._lock:
+            session = self._sessions.get(str(session_id))
+        if session is None:
+            return _body([])
+        key = subtype or ""
+        body = session["bodies"].get(key)
+        if body is None:
+            events = session["events"].select(subtype=subtype) if subtype else session["events"]
+            body = session["bodies"][key] = _body(to_payload(events))
+        return body
+
+    def _manager_body(self, request: dict) -> bytes:
+        kind = request.get("type")
+        if kind == "get_online_player_ids":
+            return _body(self.online)
+        if kind == "get_lobbies":
+            return _body([])
+        if kind == "get_sessions":
+            with self._lock:
+                return _body([dumps(s["record"]) for s in self._sessions.values()])
+        return _body([], success=False, message=f"Unsupported request type {kind}")
+
+    def answer(self, method: str, path: str, request: dict) -> bytes:
+        self.calls += 1
+        if path == "/login":
+            return _body(["benchmark-token"])
+        if path == "/data/session/select/events":
+            return self._events_body(request.get("sessionId"), request.get("subtype"))
+        if path == "/data/session/select":
+            with self._lock:
+                session = self._sessions.get(str(request.get("sessionId")))
+            return _body([dumps(session["record"])] if session else [])
+        if path == "/data/participant/select":
+            return _body(self.participants)
+        if path == "/manager":
+            return self._manager_body(request)
+        return _body([], success=False, message=f"Unknown path {path}")
+
+    # ------------------------------------------------------------------ server
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        standin = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length) if length else b""
+                request = loads(data) if data else {}
+                if standin.latency_s:
+                    threading.Event().wait(standin.latency_s)
+                body = standin.answer(self.command, self.path, request if isinstance(request, dict) else {})
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="game-server-standin", daemon=True).start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,150 @@
+#synthetic.py
+# Synthetic sessions for the benchmarks, built column by column (no per-event dicts), so
+# even a 5M-event session is generated in seconds and held as a SessionEvents.
+#
+#   events = generate_session(1_000_000, game="WAVES", seed=1)
+#   payload = to_payload(events)      # the game server's format: one JSON string per event
+#
+# Every actor produces 1 Hz HEART_RATE / LATENCY / JITTER samples, one INTER_BEAT_INTERVAL
+# per beat and the input stream of the game; the session duration is chosen so the total
+# comes out at the requested size. A share of the FREQUENCY / ANGLE / FLING rows can be
+# made malformed to exercise the error paths.
+
+import numpy as np
+
+from src.managers.decoding import dumps
+from src.managers.events import SessionEvents
+
+GAMES = ("WATER_RIPPLES", "WINE_GLASSES", "WAVES", "PACMAN", "TREE")
+START_MS = 1_700_000_000_000
+SYNC_PERIOD_S = 6
+
+# events per actor per second, by subtype
+METRIC_RATES = {"HEART_RATE": 1.0, "INTER_BEAT_INTERVAL": 1.25, "LATENCY": 1.0, "JITTER": 1.0}
+GAME_RATES = {
+    "WATER_RIPPLES": {"CLICK": 1.5},
+    "WINE_GLASSES": {"FREQUENCY": 10.0, "ANGLE": 10.0},
+    "WAVES": {"FLING": 2.0},
+    "PACMAN": {"FLING": 2.0},
+    "TREE": {"FLING": 2.0},
+}
+TYPES = {
+    "HEART_RATE": "SENSOR_DATA", "INTER_BEAT_INTERVAL": "SENSOR_DATA",
+    "LATENCY": "NETWORK_DATA", "JITTER": "NETWORK_DATA",
+    "CLICK": "USER_INPUT", "FREQUENCY": "USER_INPUT", "ANGLE": "USER_INPUT", "FLING": "USER_INPUT",
+    "SYNCED_AT_TIME": "SYNC", "SYNC_START_TIME": "SYNC", "SYNC_END_TIME": "SYNC",
+}
+
+
+def _timestamps(rng, rate: float, duration_s: float) -> np.ndarray:
+    n = max(int(rate * duration_s), 1)
+    ts = START_MS + np.arange(n, dtype=np.int64) * int(1000 / rate)
+    return ts + rng.integers(0, 50, n)  # clients do not sample on the exact millisecond
+
+
+def _values(rng, subtype: str, n: int, malformed: float):
+    """(values, raw strings or None) of n rows of a subtype."""
+    raw = None
+    if subtype == "HEART_RATE":
+        values = np.round(rng.normal(80, 10, n)).clip(45, 180)
+    elif subtype == "INTER_BEAT_INTERVAL":
+        values = np.round(60000 / rng.normal(80, 10, n).clip(45, 180))
+    elif subtype == "LATENCY":
+        values = np.round(rng.gamma(2.0, 12.0, n), 2)
+    elif subtype == "JITTER":
+        values = np.round(rng.gamma(1.5, 2.0, n), 2)
+    elif subtype == "FREQUENCY":
+        values = np.round(rng.uniform(0, 3, n), 3)
+    elif subtype == "ANGLE":
+        values = np.round(rng.uniform(0, 360, n), 1)
+        values[rng.random(n) < 0.02] = 600  # the clients' "no angle" placeholder
+    elif subtype == "FLING":
+        speeds = np.round(rng.uniform(50, 900, n), 1)
+        directions = rng.integers(0, 4, n)
+        rewards = np.where(rng.random(n) < 0.3, "true", "false")
+        raw = np.array([f"{s},{d},{r}" for s, d, r in zip(speeds.tolist(), directions.tolist(), rewards.tolist())],
+                       dtype=object)
+        values = np.full(n, np.nan)
+    else:  # CLICK and the SYNC markers carry no data
+        values = np.full(n, np.nan)
+
+    if malformed and subtype in ("FREQUENCY", "ANGLE", "FLING"):
+        bad = rng.random(n) < malformed
+        if raw is None:
+            raw = np.full(n, None, dtype=object)
+        raw[bad] = "not-a-number"
+        values[bad] = np.nan
+    return values, raw
+
+
+def generate_session(n_events: int, game: str = "WAVES", actors: tuple = ("001", "002"),
+                     seed: int = 0, malformed: float = 0.0) -> SessionEvents:
+    """A session of about n_events events (rows sorted by timestamp, as the clients upload them)."""
+    if game not in GAME_RATES:
+        raise ValueError(f"unknown game {game!r}, expected one of {GAMES}")
+    rng = np.random.default_rng(seed)
+    rates = {**METRIC_RATES, **GAME_RATES[game]}
+    duration_s = n_events / (sum(rates.values()) * len(actors))
+
+    subtypes = list(rates)
+    sync_subtypes = ["SYNC_START_TIME", "SYNC_END_TIME"] if game == "WINE_GLASSES" else ["SYNCED_AT_TIME"]
+    subtypes += sync_subtypes
+    types = sorted(set(TYPES[s] for s in subtypes))
+    actor_names = list(actors) + ["server"]
+
+    columns = {"timestamp": [], "actor": [], "type": [], "subtype": [], "value": [], "raw": []}
+
+    def add(actor_code: int, subtype: str, ts: np.ndarray):
+        values, raw = _values(rng, subtype, len(ts), malformed)
+        columns["timestamp"].append(ts)
+        columns["actor"].append(np.full(len(ts), actor_code, dtype=np.int32))
+        columns["type"].append(np.full(len(ts), types.index(TYPES[subtype]), dtype=np.int16))
+        columns["subtype"].append(np.full(len(ts), subtypes.index(subtype), dtype=np.int16))
+        columns["value"].append(values)
+        columns["raw"].append(raw if raw is not None else np.full(len(ts), None, dtype=object))
+
+    for code in range(len(actors)):
+        for subtype, rate in rates.items():
+            add(code, subtype, _timestamps(rng, rate, duration_s))
+
+    n_sync = max(int(duration_s / SYNC_PERIOD_S), 1)
+    sync_starts = START_MS + np.arange(n_sync, dtype=np.int64) * SYNC_PERIOD_S * 1000
+    server = len(actors)
+    if game == "WINE_GLASSES":
+        add(server, "SYNC_START_TIME", sync_starts)
+        add(server, "SYNC_END_TIME", sync_starts + 2000)
+    else:
+        add(server, "SYNCED_AT_TIME", sync_starts + 1000)
+
+    timestamp = np.concatenate(columns["timestamp"])
+    order = np.argsort(timestamp, kind="stable")
+    raw = np.concatenate(columns["raw"])[order]
+    return SessionEvents(
+        timestamp=timestamp[order],
+        actor=np.concatenate(columns["actor"])[order],
+        type_=np.concatenate(columns["type"])[order],
+        subtype=np.concatenate(columns["subtype"])[order],
+        value=np.concatenate(columns["value"])[order],
+        raw=raw,
+        actors=actor_names, types=types, subtypes=subtypes,
+    )
+
+
+def to_payload(events: SessionEvents) -> list[str]:
+    """The events as the game server sends them: a list of JSON-encoded event objects."""
+    actors, types, subtypes = events.actors, events.types, events.subtypes
+    return [
+        dumps({"type": types[t], "subtype": subtypes[s], "timestamp": ts, "actor": actors[a], "data": data})
+        for ts, a, t, s, data in zip(events.timestamp.tolist(), events.actor.tolist(), events.type.tolist(),
+                                     events.subtype.tolist(), events.data_strings())
+    ]
+
+
+def to_dicts(events: SessionEvents) -> list[dict]:
+    """The events as decoded dicts (the input of SessionEvents.from_dicts)."""
+    actors, types, subtypes = events.actors, events.types, events.subtypes
+    return [
+        {"type": types[t], "subtype": subtypes[s], "timestamp": ts, "actor": actors[a], "data": data}
+        for ts, a, t, s, data in zip(events.timestamp.tolist(), events.actor.tolist(), events.type.tolist(),
+                                     events.subtype.tolist(), events.data_strings())
+    ]
@@ -1,6 +1,6 @@
-from datetime import datetime, timedelta
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, g, stream_with_context, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import before_render_template, template_rendered
 import requests
 from . import *
 from .managers.participants import *
@@ -9,17 +9,81 @@ from .managers.game import *
 from .managers.operators import *
 from .managers.session_data import *
 from .managers.feedback import *
+from .managers.presets import get_preset, apply_preset
+from .managers.provisioning import ScheduleError, load_presets, parse_schedule, provision
 from .managers.logger import Logger
+from .managers.http_client import http_client
+from .managers.event_cache import event_cache
+from .managers.decoding import decode_payload, decode_stats, dumps
+from .managers.precompute import analytics_store, precompute_queue
+from .managers.lobby_stream import lobby_stream_hub, LOBBY_LIST, RETRY_MS
+from .managers.snapshot_cache import snapshot_cache
+from .managers.participant_index import participant_index, DEFAULT_PAGE_SIZE
+from .managers.metrics import REGISTRY, ROUTE_LATENCY, UPSTREAM_CALLS
+from .managers.request_timing import request_timing, start_request, SLOW_REQUEST_MS, UPSTREAM_CALL_BUDGET
+from .managers.shared_state import shared_state
+from .managers.login_limiter import login_limiter
+from .managers.resilience import CIRCUIT_STATES
 from .ENUMS import *
 import json
+import time
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+# every worker process must sign sessions with the same key: MANAGER_SECRET_KEY, or one
+# generated by whichever worker starts first and kept in the shared state across restarts
+app.secret_key = os.environ.get("MANAGER_SECRET_KEY") or shared_state.add("app", "secret_key", os.urandom(24).hex())
 
 Logger()
 
-failed_login_attempts = dict()  # Dictionary to track failed login attempts by username
-timeouts = dict() # Dictionary to track timeouts by client IP
+
+@app.before_request
+def _start_timer():
+    g.timing = start_request()
+
+
+def _render_started(sender, **extra):
+    timing = request_timing.get()
+    if timing is not None:
+        timing.enter("render")
+
+
+def _render_finished(sender, **extra):
+    timing = request_timing.get()
+    if timing is not None:
+        timing.exit()
+
+
+before_render_template.connect(_render_started, app)
+template_rendered.connect(_render_finished, app)
+
+
+@app.after_request
+def _record_timing(response):
+    timing = g.get('timing')
+    if timing is None:
+        return response
+    # the route pattern, not the URL - ids in paths and query strings must not become labels
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    breakdown = timing.breakdown()
+    ROUTE_LATENCY.observe(breakdown["total"] / 1000, route=route, method=request.method,
+                          status=response.status_code)
+    UPSTREAM_CALLS.observe(timing.upstream_calls, route=route)
+    response.headers['Server-Timing'] = timing.header()
+
+    if timing.upstream_calls > UPSTREAM_CALL_BUDGET:
+        Logger.log_warning(f"{request.method} {route} made {timing.upstream_calls} upstream calls "
+                           f"(budget {UPSTREAM_CALL_BUDGET})", rate_key=f"upstream_budget:{route}",
+                           route=route, upstream_calls=timing.upstream_calls)
+    if breakdown["total"] > SLOW_REQUEST_MS:
+        Logger.log_warning(f"Slow request: {request.method} {route} took {breakdown['total']} ms",
+                           rate_key=f"slow_request:{route}", route=route, timing_ms=breakdown)
+    return response
+
+
+@app.teardown_request
+def _end_timer(exc):
+    request_timing.set(None)
+
 
 @app.route('/')
 def home():
@@ -33,60 +97,41 @@ def home():
 @app.route('/login', methods=['GET', 'POST'])
 def login():
 
-    # check if the client is timed out
+    # check if the client is timed out - before anything reaches the game server (managers/login_limiter.py)
     client_ip = request.headers.get('X-Real-IP')
-    if client_ip in timeouts:
-        timeout = timeouts[client_ip]
-        if datetime.now() < timeout:
-            flash("Too many failed login attempts. Please try again later.", "error")
-            return render_template('lockout.html')
-        else:
-            del timeouts[client_ip]
+    if request.method != 'POST' and login_limiter.check(client_ip):
+        flash("Too many failed login attempts. Please try again later.", "error")
+        return render_template('lockout.html')
 
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
+        if login_limiter.check(client_ip, username, attempt=True):
+            flash("Too many failed login attempts. Please try again later.", "error")
+            return render_template('lockout.html')
+
         if username and password:
             if len(username) > 64 or len(password) > 64:
                 return render_template('login.html')
 
         auth_res = authenticate_basic(username, password)
-        if auth_res and auth_res.get_success():
-            # Reset failed login attempts for this client IP
-            if client_ip in failed_login_attempts:
-                del failed_login_attempts[client_ip]
+        if auth_res is None:
+            # the game server did not answer - not the operator's fault, not counted as a failure
+            flash("The game server is unavailable, please try again shortly", "error")
+        elif auth_res.get_success():
+            # Reset failed login attempts for this client IP and username
+            login_limiter.succeeded(client_ip, username)
 
             # session.permanent = False  # <- this line ensures session ends on browser close
             session['username'] = username
             session['token'] = auth_res.get_payload()[0]
             return redirect(url_for('main_menu'))
         else:
-            if client_ip not in failed_login_attempts:
-                failed_login_attempts[client_ip] = 0
-
-            # Increment failed login attempts for this client IP
-            failed_login_attempts[client_ip] += 1
-
             flash("Invalid credentials", "error")
 
-            # increase the timeout based on the number of failed attempts
-            failed_attempts_count = failed_login_attempts[client_ip]
-            if failed_attempts_count > 10 and failed_attempts_count % 2 == 1:
-                Logger.log_info(f"Locking out client {client_ip} for 30 minutes due to too many failed login attempts.")
-                timeouts[client_ip] = datetime.now() + timedelta(minutes=30)
-                return render_template('lockout.html')
-            elif failed_attempts_count == 9:
-                Logger.log_info(f"Locking out client {client_ip} for 10 minutes due to too many failed login attempts.")
-                timeouts[client_ip] = datetime.now() + timedelta(minutes=10)
-                return render_template('lockout.html')
-            elif failed_attempts_count == 7:
-                Logger.log_info(f"Locking out client {client_ip} for 5 minutes due to too many failed login attempts.")
-                timeouts[client_ip] = datetime.now() + timedelta(minutes=5)
-                return render_template('lockout.html')
-            elif failed_attempts_count == 5:
-                Logger.log_info(f"Locking out client {client_ip} for 1 minute due to too many failed login attempts.")
-                timeouts[client_ip] = datetime.now() + timedelta(minutes=1)
+            # the lockout grows with the number of failed attempts
+            if login_limiter.failed(client_ip, username):
                 return render_template('lockout.html')
 
     return render_template('login.html')
@@ -103,20 +148,11 @@ def main_menu():
 
 @app.route('/get_participants', methods=['GET'])
 def get_parts():
-    online_participants_ids = get_participants()
-    all_participants = get_participants_for_view()
-
-    online_participants = []
-    if len(online_participants_ids) > 0 and all_participants:
-        # remove leading zeros
-        online_participants_ids = [int(x) for x in online_participants_ids]
-        for part in all_participants:
-            part = json.loads(part)
-            if part['pid'] in online_participants_ids:
-                part['id'] = str(part['pid']).zfill(3) # add leading zeros for display
-                online_participants.append(part)
-        print(f"online_participants: {online_participants}")
-    return jsonify(online_participants)
+    # answered from the worker's shared snapshots - never without a login
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    # online ids joined to the participant directory by pid
+    return jsonify(participant_index.online())
 
 
 @app.route('/lobbies', methods=['GET'])
@@ -150,6 +186,34 @@ def create_lobby_action():
         return f"Error: {e}", 500
 
 
+@app.route('/provision_lobbies', methods=['POST'])
+def provision_lobbies_route():
+    """
+    Creates a lobby, with its joins and its preset's sessions, per pair of a schedule: an uploaded
+    'schedule' file (CSV or JSON) with an optional default 'preset', or a JSON body. Streams one
+    JSON line per change of a lobby's state, then a summary (managers/provisioning.py).
+    """
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    try:
+        upload = request.files.get('schedule')
+        if upload is not None:
+            fmt = "json" if (upload.filename or "").lower().endswith(".json") else "csv"
+            text = upload.read().decode('utf-8-sig')
+            entries = parse_schedule(text, fmt, default_preset=request.form.get('preset') or None)
+        elif request.is_json:
+            entries = parse_schedule(request.get_data(as_text=True), "json")
+        else:
+            entries = parse_schedule(request.get_data(as_text=True), "csv", default_preset=request.args.get('preset'))
+        presets = load_presets(entries)
+    except (ScheduleError, UnicodeDecodeError) as e:
+        return jsonify({"status": "error", "message": f"Invalid schedule: {e}"}), 400
+
+    lines = (dumps(update) + "\n" for update in provision(entries, presets))
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/delete_lobby', methods=['GET'])
 def delete_lobby_action():
     lobby_id = request.args.get('lobby_id')
@@ -206,8 +270,6 @@ def lobby():
     else:
         action = 'start'
 
-    print(selected_participants_list, lobby_id, action, state)
-
     return render_template('lobby.html', selected_participants=selected_participants_list, lobby_id=lobby_id,
                            action='start', GAME_TYPE=GAME_TYPE)
 
@@ -258,6 +320,8 @@ def stop_game_route():
 
 @app.route('/get_lobby', methods=['POST'])
 def get_lobby_route():
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
     lobby_id = request.json.get('lobby_id')
     if not lobby_id:
         return jsonify({"status": "error", "message": "Invalid data"}), 400
@@ -271,6 +335,36 @@ def get_lobby_route():
     return jsonify({"status": "error", "message": "Lobby not found"}), 404
 
 
+def _event_stream(key: str):
+    # one shared upstream poller feeds every open stream (see managers/lobby_stream.py)
+    sub = lobby_stream_hub.subscribe(key, session.get('token'))
+    if sub is None:
+        # this worker's stream slots are taken; the pages fall back to polling
+        return jsonify({"status": "error", "message": "Too many open streams"}), 503, \
+            {'Retry-After': str(RETRY_MS // 1000)}
+    return Response(lobby_stream_hub.stream(sub), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/lobby/stream', methods=['GET'])
+def lobby_stream_route():
+    """Server-Sent Events with the changes of one lobby (ready status, state, sessions, ...)."""
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    lobby_id = request.args.get('lobby_id')
+    if not lobby_id:
+        return jsonify({"status": "error", "message": "Missing lobby_id"}), 400
+    return _event_stream(lobby_id)
+
+
+@app.route('/lobbies/stream', methods=['GET'])
+def lobbies_stream_route():
+    """Server-Sent Events with the lobby list and the online participants."""
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    return _event_stream(LOBBY_LIST)
+
+
 @app.route('/update_session_order', methods=['POST'])
 def update_session_order():
     data = request.json
@@ -313,7 +407,7 @@ def add_session():
     sync_window_length = data.get('syncWindowLength')
     is_warmup = data.get('isWarmup')
     countdown_timer = data.get('countdownTimer')
-    print(data)
+    Logger.log_debug(f"Create session request for lobby {lobby_id}", lobby_id=lobby_id, request=data)
 
     if not (lobby_id and game_type_name and duration and sync_tolerance and sync_window_length and is_warmup is not None and countdown_timer):
         Logger.log_error(f"Invalid data: {data}")
@@ -379,15 +473,35 @@ def delete_session_route():
 def participants_menu():
     if 'username' not in session:
         return redirect(url_for('login'))
-    participants = get_participants_for_view()
-    # print(participants)
-
-    if participants:
-        participants = [json.loads(part) for part in participants]
-    else:
-        participants = []
-
-    return render_template('participants.html', participants=participants)
+    # the table is filled page by page from /participants/search
+    return render_template('participants.html', page_size=DEFAULT_PAGE_SIZE)
+
+
+@app.route('/participants/search', methods=['GET'])
+def participants_search():
+    """
+    One page of the participant directory.
+    ?q=       words matched against the pid and the start of first name, last name and email
+    ?online=1 only participants that are online
+    ?page=, ?page_size=
+    """
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"status": "error", "message": "page and page_size must be integers"}), 400
+
+    if not participant_index.sync():
+        return jsonify({"status": "error", "message": "Participants are unavailable"}), 502
+    result = participant_index.search(
+        query=request.args.get('q', ''),
+        online_only=request.args.get('online', '').lower() in ('1', 'true', 'yes'),
+        page=page,
+        page_size=page_size,
+    )
+    return jsonify({"status": "success", **result})
 
 
 @app.route('/add_participant', methods=['POST'])
@@ -481,62 +595,108 @@ def single_session_data():
     duration     = request.args.get('duration', '')
     tolerance   = request.args.get('tolerance', '')
 
-    # ── metrics ──
-    heart    = get_heartrate(sid)
-    hrv      = get_and_calculate_HRV(sid)
-    latency  = get_latency(sid)
-    jitter   = get_jitter(sid)
-
-    click_events = sync_events = None
-    frequency_data = sync_intervals = None
-    waves_data = None
-    pacman_data = None
-    tree_data = None
-    angle_data = None
-
-    if game_type_key in ("WATER_RIPPLES", "FLOWER_GARDEN"):
-        click_events, sync_events = get_click_game_sync(sid)
-    elif game_type_key in ("WINE_GLASSES", "FLOUR_MILL"):
-        frequency_data, angle_data, sync_intervals = get_swipe_game_frequency(sid)
-    elif game_type_key == "WAVES":
-        waves_data = get_waves(sid)
-    elif game_type_key == "PACMAN":
-        pacman_data = get_pacman(sid)
-    elif game_type_key == "TREE":
-        tree_data = get_tree(sid)
-    else:
+    if game_type_key not in GAME_CHARTS:
         Logger.log_error(f"Unknown game type in single_session_data: {game_type}")
 
-
+    # ── the page is only a shell; every chart fetches its own data from
+    #    /session_data/single/<chart> once it scrolls into view ──
     metadata = {
         "gameType"    : game_type,
+        "gameTypeKey" : game_type_key,
+        "gameChart"   : GAME_CHARTS.get(game_type_key),
         "participants": [p.strip() for p in participants.split(',') if p],
         "sessionId"   : sid,
         "duration"    : duration,
-        "tolerance"   : tolerance
+        "tolerance"   : tolerance,
+        "hrvArgs"     : {k: v for k, v in request.args.items() if k in ('hrv_window', 'hrv_window_s')}
 
     }
-    data = {
-        "heart"          : heart,
-        "hrv"            : hrv,
-        "latency"        : latency,
-        "jitter"         : jitter,
-        "click_events"   : click_events,
-        "sync_events"    : sync_events,
-        "frequency_data" : frequency_data,
-        "sync_intervals" : sync_intervals,
-        "angle_data"     : angle_data,
-        "waves_data"     : waves_data,
-        "pacman_data"    : pacman_data,
-        "tree_data"      : tree_data
-    }
 
     return render_template("single_session_data.html",
-                           metadata=metadata,
-                           data=data)
+                           metadata=metadata)
+
+
+@app.route('/session_data/single/<chart>', methods=['GET'])
+def single_session_chart(chart):
+    """The data of one chart of the single-session page (line series are downsampled)."""
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    sid = request.args.get('session_id')
+    if not sid:
+        return jsonify({"status": "error", "message": "Missing session_id"}), 400
+    if chart not in CHART_SUBTYPES:
+        return jsonify({"status": "error", "message": f"Unknown chart {chart}"}), 404
+
+    hrv_args = hrv_window_args(request.args)
+    if not hrv_args:
+        # computed in the background when the experiment ended (see managers/precompute.py)
+        body = analytics_store.get(sid, chart)
+        if body is not None:
+            return app.response_class(body, mimetype="application/json")
+
+    try:
+        data = get_session_chart(sid, chart, max_points=INITIAL_SERIES_POINTS, **hrv_args)
+    except Exception as e:
+        Logger.log_error(f"single_session_chart – {chart}: {e}")
+        return jsonify({"status": "error", "message": "Internal server error"}), 500
+    return jsonify({"status": "success", "chart": chart, "data": data})
+
+
+def hrv_window_args(args) -> dict:
+    """?hrv_window=<beats> or ?hrv_window_s=<seconds> (time-based window); default 10 beats."""
+    window_s = args.get('hrv_window_s', type=float)
+    if window_s and window_s > 0:
+        return {"window_ms": int(window_s * 1000)}
+    window = args.get('hrv_window', type=int)
+    if window and window >= 2:
+        return {"window_size": window}
+    return {}
 
 
 # ───────────────────────────────────────── (optional) JSON API
+INITIAL_SERIES_POINTS = 2000
+MAX_SERIES_POINTS = 10000
+
+
+@app.route('/session_data/series', methods=['GET'])
+def session_series_route():
+    """
+    One line-chart metric of a session, at most max_points per actor in [t0, t1] (seconds).
+    Called by the single-session page whenever a chart is zoomed or panned.
+    """
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    sid = request.args.get('session_id')
+    metric = request.args.get('metric')
+    if not sid or metric not in SERIES_SUBTYPES:
+        return jsonify({"status": "error", "message": "Missing session_id or unknown metric"}), 400
+
+    max_points = min(request.args.get('max_points', INITIAL_SERIES_POINTS, type=int), MAX_SERIES_POINTS)
+    series = get_downsampled_series(sid, metric,
+                                    t0=request.args.get('t0', type=float),
+                                    t1=request.args.get('t1', type=float),
+                                    max_points=max(max_points, 10),
+                                    method=request.args.get('method', 'minmax'),
+                                    **hrv_window_args(request.args))
+    return jsonify({"status": "success", "metric": metric, "series": series})
+
+
+@app.route('/session_data/hrv', methods=['GET'])
+def session_hrv_route():
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    sid = request.args.get('session_id')
+    if not sid:
+        return jsonify({"status": "error", "message": "Missing session_id"}), 400
+
+    bundle = SessionEventBundle(sid, ("INTER_BEAT_INTERVAL",))
+    return jsonify({
+        "status": "success",
+        "rolling": get_and_calculate_HRV(sid, bundle, **hrv_window_args(request.args)),
+        "summary": hrv_summary(bundle.get(subtype="INTER_BEAT_INTERVAL")),
+    })
+
+
 @app.route('/get_all_sessions', methods=['GET'])
 def get_all_sessions_route():
     try:
@@ -617,14 +777,12 @@ def get_presets_route():
         parsed = server_response(response)
         if parsed.get_success():
             updated_payload = []
-            payload = parsed.get_payload()
-            for preset in payload:
-                preset = json.loads(preset)
+            for preset in decode_payload(parsed.get_payload(), "presets"):
                 for session in preset.get('sessions', []):
                     backend_game_type = session.get('gameType')
                     session['gameType'] = get_game_type_value_from_name(backend_game_type)
                 updated_payload.append(preset)
-            return jsonify({"status": "success", "payload": json.dumps(updated_payload)})
+            return jsonify({"status": "success", "payload": dumps(updated_payload)})
         else:
             return jsonify({"status": "error", "message": parsed.get_message()}), 400
     except Exception as e:
@@ -689,6 +847,191 @@ def delete_preset_route():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route('/apply_preset', methods=['POST'])
+def apply_preset_route():
+    """Replace a lobby's sessions with a preset's, in one request."""
+    if 'username' not in session:
+        return jsonify({"status": "error", "message": "Not logged in"}), 401
+    try:
+        data = request.json or {}
+        # Expecting: {"lobby_id": "...", "preset_name": "...", "replace": true}
+        lobby_id, preset_name = data.get('lobby_id'), data.get('preset_name')
+        if not lobby_id or not preset_name:
+            return jsonify({"status": "error", "message": "Missing lobby_id or preset_name"}), 400
+
+        lobby_info = get_lobby(lobby_id)
+        if lobby_info is not None and lobby_info.experimentRunning:
+            return jsonify({"status": "error", "message": "Cannot apply a preset while the experiment is running"}), 409
+        preset = get_preset(preset_name)
+        if preset is None:
+            return jsonify({"status": "error", "message": f"Preset {preset_name} not found"}), 404
+
+        session_ids = apply_preset(lobby_id, preset, replace=bool(data.get('replace', True)))
+        if session_ids is None:
+            return jsonify({"status": "error", "message": "Failed to apply preset"}), 502
+        return jsonify({"status": "success", "sessionIds": session_ids})
+    except KeyError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        Logger.log_error(f"Error applying preset: {e}")
+        return jsonify({"status": "error", "message": "Internal server error"}), 500
+
+
+###################### DIAGNOSTICS ######################
+METRICS_TOKEN = os.environ.get('MANAGER_METRICS_TOKEN')
+LOOPBACK_ADDRS = ('127.0.0.1', '::1')
+
+
+def _component_metrics():
+    """Counters the components keep themselves, read on every /metrics scrape."""
+    events = event_cache.stats()
+    yield ("manager_event_cache_lookups_total", "counter", "Session event cache lookups by result.",
+           [({"result": "memory_hit"}, events["memory_hits"]), ({"result": "disk_hit"}, events["disk_hits"]),
+            ({"result": "miss"}, events["misses"])])
+    yield ("manager_event_cache_hit_ratio", "gauge", "Share of session event lookups served from the cache.",
+           [({}, events["hit_ratio"])])
+    yield ("manager_event_cache_memory_bytes", "gauge", "Bytes of session events held in memory.",
+           [({}, events["memory_bytes"])])
+
+    yield ("manager_analytics_evictions_total", "counter", "Precomputed sessions removed to keep the analytics store in bounds.",
+           [({}, analytics_store.evictions)])
+
+    snapshots = snapshot_cache.stats()
+    yield ("manager_snapshot_cache_reads_total", "counter", "Lobby and participant snapshot reads by outcome.",
+           [({"result": k}, snapshots[k]) for k in ("fresh", "stale", "coalesced")])
+    yield ("manager_snapshot_cache_loads_total", "counter", "Upstream loads made by the snapshot cache.",
+           [({"result": "ok"}, snapshots["loads"] - snapshots["failures"]), ({"result": "failed"}, snapshots["failures"])])
+
+    pool = http_client.stats()
+    yield ("manager_upstream_connections_opened_total", "counter", "Sockets opened to the game server.",
+           [({}, pool["connections_opened"])])
+    yield ("manager_upstream_connection_reuse_ratio", "gauge", "Share of game-server calls made on a kept-alive socket.",
+           [({}, pool["reuse_ratio"])])
+    yield ("manager_upstream_circuit_state", "gauge", "Circuit breaker per game-server host: 0 closed, 1 half open, 2 open.",
+           [({"host": host}, CIRCUIT_STATES.index(b["state"])) for host, b in pool["breakers"].items()])
+    yield ("manager_upstream_timeout_seconds", "gauge", "Timeout in use per game-server endpoint, adapted to its latency.",
+           [({"endpoint": endpoint}, t["timeout_s"]) for endpoint, t in pool["timeouts"].items()])
+
+    decoding = decode_stats()
+    yield ("manager_decoded_items_total", "counter", "Game-server payload items decoded.", [({}, decoding["items"])])
+    yield ("manager_decode_errors_total", "counter", "Payload items that could not be decoded.", [({}, decoding["errors"])])
+
+    logging_stats = Logger.stats()
+    yield ("manager_log_records_dropped_total", "counter", "Log records dropped because the log queue was full.",
+           [({}, logging_stats["dropped"])])
+    yield ("manager_log_records_rate_limited_total", "counter", "Log records suppressed by rate limiting.",
+           [({}, logging_stats["rate_limited"])])
+
+    streams = lobby_stream_hub.stats()
+    yield ("manager_lobby_stream_subscribers", "gauge", "Open lobby event streams.",
+           [({}, sum(streams["subscribers"].values()))])
+
+    logins = login_limiter.stats()
+    yield ("manager_login_attempts_total", "counter", "Login attempts by outcome; blocked ones never reach the game server.",
+           [({"outcome": k}, logins[k]) for k in ("success", "failure", "blocked_ip", "blocked_username", "blocked_rate")])
+    yield ("manager_login_limiter_tracked_keys", "gauge", "Live login throttling entries, shared by all workers.",
+           [({"kind": k}, v) for k, v in logins["tracked"].items()])
+
+
+REGISTRY.register_collector(_component_metrics)
+REGISTRY.share(shared_state)  # a scrape reaches one gunicorn worker - it answers for all of them
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    """
+    Prometheus metrics of every worker, labelled worker="<pid>" (see managers/metrics.py).
+    Open to logged-in operators, to scrapers presenting MANAGER_METRICS_TOKEN, and to
+    scrapes from inside the container (loopback, not forwarded by a proxy).
+    """
+    authorized = ('username' in session
+                  or (METRICS_TOKEN and request.headers.get('Authorization') == f"Bearer {METRICS_TOKEN}")
+                  or (request.remote_addr in LOOPBACK_ADDRS and request.headers.get('X-Real-IP') is None))
+    if not authorized:
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/stats/http', methods=['GET'])
+def http_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(http_client.stats())
+
+
+@app.route('/stats/cache', methods=['GET'])
+def cache_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify({"session_events": event_cache.stats()})
+
+
+@app.route('/precompute/jobs', methods=['GET'])
+def precompute_jobs_route():
+    """Progress of the background analytics jobs queued when experiments ended."""
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify({"status": "success", "jobs": precompute_queue.jobs()})
+
+
+@app.route('/precompute/jobs/<int:job_id>', methods=['GET'])
+def precompute_job_route(job_id):
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    job = precompute_queue.job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify({"status": "success", "job": job})
+
+
+@app.route('/stats/lobby_stream', methods=['GET'])
+def lobby_stream_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(lobby_stream_hub.stats())
+
+
+@app.route('/stats/snapshots', methods=['GET'])
+def snapshot_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(snapshot_cache.stats())
+
+
+@app.route('/stats/shared_state', methods=['GET'])
+def shared_state_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(shared_state.stats())
+
+
+@app.route('/stats/login', methods=['GET'])
+def login_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(login_limiter.stats())
+
+
+@app.route('/stats/participants', methods=['GET'])
+def participant_index_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(participant_index.stats())
+
+
+@app.route('/stats/logging', methods=['GET'])
+def logging_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(Logger.stats())
+
+
+@app.route('/stats/decoding', methods=['GET'])
+def decoding_stats_route():
+    if 'username' not in session:
+        return redirect(url_for('login'))
+    return jsonify(decode_stats())
+
 
 if __name__ == '__main__':
     # run on port 80
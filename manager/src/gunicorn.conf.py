@@ -0,0 +1,47 @@
+#gunicorn.conf.py
+# Production serving of the manager: several worker processes, each with a pool of threads.
+#
+#   gunicorn --config /app/gunicorn.conf.py          (the container's entrypoint)
+#
+#   MANAGER_WORKERS   worker processes (default: one per CPU)
+#   MANAGER_THREADS   request threads per worker (default 16 - every open lobby stream holds one;
+#                     at most MANAGER_STREAM_MAX_SUBSCRIBERS of them, default half, see lobby_stream.py)
+#   MANAGER_BIND      default 0.0.0.0:5000
+#
+# Workers import the app after forking (no preload), so every worker starts its own
+# background threads. What they must agree on - login throttling, the session secret,
+# precompute job status - lives in data/shared_state.db (managers/shared_state.py).
+# /metrics answers for every worker, whichever one the scrape reaches: each publishes its
+# samples there, labelled worker="<pid>" (managers/metrics.py).
+
+import itertools
+import multiprocessing
+import os
+
+_here = os.path.dirname(os.path.abspath(__file__))
+
+# the app is the package this file sits in (/app in the container): import it as <package>.app
+chdir = os.path.dirname(_here)
+wsgi_app = f"{os.path.basename(_here)}.app:app"
+
+bind = os.environ.get("MANAGER_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("MANAGER_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("MANAGER_THREADS", 16))
+worker_class = "gthread"
+preload_app = False
+timeout = 120           # a worker that stops answering its heartbeat for this long is restarted
+graceful_timeout = 30
+keepalive = 5
+
+
+def pre_fork(server, worker):
+    # the lowest slot no live worker holds: a restarted worker takes over the slot (and the
+    # log files) of the one it replaces, so the number of file sets stays at `workers`
+    taken = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+    worker.slot = next(slot for slot in itertools.count() if slot not in taken)
+
+
+def post_fork(server, worker):
+    # rotating one log file from several processes loses records - each worker slot writes its own
+    if workers > 1:
+        os.environ["MANAGER_LOG_FILE"] = f"output.{worker.slot}.log"
@@ -1,8 +1,13 @@
 import requests
 import json
+import os
 from ..ENUMS import *
 import base64
 from .logger import Logger
+from .http_client import http_client
+from .fanout import current_token
+from .decoding import decode_payload, decode_one, loads, dumps
+from .request_timing import phase
 
 RUNNING_LOCAL = False
 
@@ -16,37 +21,48 @@ GAL = False
 if GAL:
     URL = "https://ims-project.cs.bgu.ac.il:8640"
 
+# e.g. a local game-server stand-in (see manager/benchmarks)
+URL = os.environ.get("IMS_GAME_SERVER_URL", URL)
 
-from flask import session
+# persistent volume of the manager container (/app/data)
+DATA_DIR = os.environ.get("MANAGER_DATA_DIR",
+                          os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+
+from flask import session, has_request_context
 
 
 def auth_headers():
-    token = session.get('token')
+    # outside a request (fan-out worker threads) the token is the one captured by fan_out()
+    token = current_token()
     return {"Authorization": f"Bearer {token}"} if token else {}
 
-def post_auth(url, json, headers=None, timeout=2.0):
+def post_auth(url, json, headers=None, timeout=None):
+    # timeout=None -> per-endpoint default from http_client.ENDPOINT_TIMEOUTS
     final_headers = auth_headers()
     if headers:
         final_headers.update(headers)
-    post = requests.post(url, json=json, headers=final_headers, timeout=timeout)
+    post = http_client.post(url, json=json, headers=final_headers, timeout=timeout)
     if post.status_code == 401:
         response = server_response(post)
         if not response.get_success() and response.get_message() == "Invalid Bearer token":
-            session.pop('token')
-            session.pop('username')
+            if has_request_context():
+                session.pop('token')
+                session.pop('username')
 
     return post
 
-def get_auth(url, headers=None, timeout=2.0):
+def get_auth(url, headers=None, timeout=None):
     final_headers = auth_headers()
     if headers:
         final_headers.update(headers)
-    get = requests.get(url, headers=final_headers, timeout=timeout)
+    get = http_client.get(url, headers=final_headers, timeout=timeout)
     if get.status_code == 401:
         response = server_response(get)
         if not response.get_success() and response.get_message() == "Invalid Bearer token":
-            session.pop('token')
-            session.pop('username')
+            if has_request_context():
+                session.pop('token')
+                session.pop('username')
 
     return get
 
@@ -55,7 +71,7 @@ def authenticate_basic(username: str, password: str):
         token = base64.b64encode(f"{username}:{password}".encode()).decode()
         headers = {"Authorization": f"Basic {token}"}
         # Logger.log_debug(f"Sending auth request to {URL + 'auth'} with headers: {headers}")
-        res = requests.get(URL + "/login", headers=headers)
+        res = http_client.get(URL + "/login", headers=headers)
 
         # Logger.log_debug(f"Auth status: {res.status_code}, response: {res.text}")
         return server_response(res)
@@ -99,7 +115,8 @@ class operators_request:
 class server_response:
     def __init__(self, res: requests.Response):
         try:
-            data = res.json()
+            with phase("decode"):
+                data = loads(res.content)
         except Exception as e:
             Logger.log_error(f"Invalid JSON response: {e} — Raw response: {res.text}")
             data = {}
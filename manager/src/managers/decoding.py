@@ -0,0 +1,115 @@
+#decoding.py
+# Decoding of game-server payloads.
+#
+# The game server answers {"success": ..., "message": ..., "payload": [...]} where the
+# payload is a list of JSON documents, each one encoded as a STRING:
+#   ["{\"pid\": 1, ...}", "{\"pid\": 2, ...}", ...]
+# Instead of one json.loads per item, decode_payload() joins the strings into a single
+# JSON array and parses it with one parser call. Only if that fails (a malformed item)
+# does it fall back to item by item, so one bad item never costs the rest of the batch.
+#
+# orjson is used when it is installed (with the json module as a fallback for the
+# documents it is stricter about), the standard json module otherwise.
+
+import json
+import threading
+
+from .logger import Logger
+from .request_timing import timed
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+
+    def loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is strict (no NaN / Infinity); accept whatever the json module accepts
+            return json.loads(data)
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+except ImportError:
+    BACKEND = "json"
+
+    def loads(data):
+        return json.loads(data)
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+
+_lock = threading.Lock()
+_stats = {"payloads": 0, "items": 0, "bulk_fallbacks": 0, "errors": 0}
+
+
+def _count(**increments):
+    with _lock:
+        for key, n in increments.items():
+            _stats[key] += n
+
+
+@timed("decode")
+def decode_payload(payload, context: str = "payload") -> list:
+    """
+    Decodes a payload list in one pass. Items that are not strings (already decoded by the
+    server) are kept as they are; items that do not parse are logged and left out.
+    """
+    if not payload:
+        return []
+
+    positions = [i for i, item in enumerate(payload) if isinstance(item, str)]
+    out = list(payload)
+    if positions:
+        texts = [payload[i] for i in positions]
+        decoded = None
+        try:
+            decoded = loads("[" + ",".join(texts) + "]")
+            if not isinstance(decoded, list) or len(decoded) != len(texts):
+                decoded = None  # an item was not one single document - decode them one by one
+        except ValueError:
+            pass
+
+        if decoded is None:
+            _count(bulk_fallbacks=1)
+            decoded, failed = _decode_items(texts, context)
+        else:
+            failed = ()
+        for i, value in zip(positions, decoded):
+            out[i] = value
+        if failed:
+            dropped = {positions[j] for j in failed}
+            out = [item for i, item in enumerate(out) if i not in dropped]
+
+    _count(payloads=1, items=len(out))
+    return out
+
+
+def _decode_items(texts: list[str], context: str) -> tuple[list, list[int]]:
+    decoded, failed = [], []
+    for j, text in enumerate(texts):
+        try:
+            decoded.append(loads(text))
+        except ValueError as e:
+            decoded.append(None)
+            failed.append(j)
+            if len(failed) <= 3:  # enough to diagnose, without one line per bad event
+                Logger.log_error(f"decode_payload – {context}: {e}  sample={text[:120]}", rate_key="decode_item")
+    if failed:
+        _count(errors=len(failed))
+        Logger.log_error(f"decode_payload – {context}: {len(failed)} of {len(texts)} items could not be decoded")
+    return decoded, failed
+
+
+def decode_one(payload, context: str = "payload"):
+    """The first item of a payload, decoded - or None."""
+    items = decode_payload(payload[:1] if payload else [], context)
+    return items[0] if items else None
+
+
+def decode_stats() -> dict:
+    with _lock:
+        return {"backend": BACKEND, **_stats}
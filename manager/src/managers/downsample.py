@@ -0,0 +1,156 @@
+#downsample.py
+# Multi-resolution time series for the session charts.
+#
+# A long session has hundreds of thousands of points per series, far more than a chart
+# can show. For every series we keep a pyramid:
+#   level 0      the raw points
+#   level k + 1  the min/max envelope of level k with 1/FACTOR of its points
+# A query for a time range picks the finest level that has at most max_points points in
+# that range, and, if it is still too dense, reduces the slice once more (min/max
+# envelope or LTTB). Zoomed out you get a bounded overview; zoomed in you get full detail.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+LEVEL_FACTOR = 4
+MIN_LEVEL_POINTS = 512
+DEFAULT_MAX_POINTS = 2000
+
+
+def minmax_envelope(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Keeps the min and the max point of every bucket (in time order), plus the first and
+    last point, so spikes and the overall extent survive any reduction.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 4:
+        return x, y
+
+    bucket = int(np.ceil(n / ((n_out - 2) // 2)))
+    full = (n // bucket) * bucket
+    blocks = y[:full].reshape(-1, bucket)
+    offsets = np.arange(0, full, bucket)
+    picks = [offsets + np.nanargmin(blocks, axis=1), offsets + np.nanargmax(blocks, axis=1)]
+    if full < n:
+        tail = y[full:]
+        picks.append(np.array([full + np.nanargmin(tail), full + np.nanargmax(tail)]))
+    picks.append(np.array([0, n - 1]))
+
+    index = np.unique(np.concatenate(picks))
+    return x[index], y[index]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets: n_out visually representative points."""
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return x, y
+
+    every = (n - 2) / (n_out - 2)
+    index = np.empty(n_out, dtype=np.int64)
+    index[0], index[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        # the point of bucket i that makes the largest triangle with the previously
+        # chosen point and the average of bucket i + 1
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        index[i + 1] = a
+    return x[index], y[index]
+
+
+REDUCERS = {"minmax": minmax_envelope, "lttb": lttb}
+
+
+class SeriesPyramid:
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        order = np.argsort(x, kind="stable")
+        self.levels = [(x[order], y[order])]
+        while len(self.levels[-1][0]) > MIN_LEVEL_POINTS * LEVEL_FACTOR:
+            lx, ly = self.levels[-1]
+            self.levels.append(minmax_envelope(lx, ly, len(lx) // LEVEL_FACTOR))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(lx.nbytes + ly.nbytes for lx, ly in self.levels)
+
+    @property
+    def extent(self) -> tuple[float, float]:
+        x = self.levels[0][0]
+        return (float(x[0]), float(x[-1])) if len(x) else (0.0, 0.0)
+
+    def query(self, t0: float = None, t1: float = None, max_points: int = DEFAULT_MAX_POINTS,
+              method: str = "minmax") -> tuple[np.ndarray, np.ndarray, int]:
+        """(x, y, level) for t0 <= x <= t1 with at most max_points points."""
+        reduce = REDUCERS.get(method, minmax_envelope)
+        for level, (lx, ly) in enumerate(self.levels):
+            lo = 0 if t0 is None else np.searchsorted(lx, t0, side="left")
+            hi = len(lx) if t1 is None else np.searchsorted(lx, t1, side="right")
+            # keep one point either side so lines run to the edge of the visible range
+            lo, hi = max(lo - 1, 0), min(hi + 1, len(lx))
+            # the finest level that is at most one LEVEL_FACTOR too dense is reduced directly
+            if hi - lo <= max_points * LEVEL_FACTOR or level == len(self.levels) - 1:
+                sx, sy = reduce(lx[lo:hi], ly[lo:hi], max_points)
+                return sx, sy, level
+        return np.empty(0), np.empty(0), 0
+
+
+def build_pyramids(series: dict) -> dict[str, SeriesPyramid]:
+    """{actor: {"timestamps": [...], "values": [...]}} -> {actor: SeriesPyramid}"""
+    pyramids = {}
+    for actor, data in (series or {}).items():
+        x = np.asarray(data["timestamps"], dtype=np.float64)
+        y = np.asarray(data["values"], dtype=np.float64)
+        keep = ~np.isnan(y)
+        pyramids[actor] = SeriesPyramid(x[keep], y[keep])
+    return pyramids
+
+
+def query_pyramids(pyramids: dict, t0: float = None, t1: float = None,
+                   max_points: int = DEFAULT_MAX_POINTS, method: str = "minmax") -> dict:
+    out = {}
+    for actor, pyramid in pyramids.items():
+        x, y, level = pyramid.query(t0, t1, max_points, method)
+        out[actor] = {"timestamps": np.round(x, 3).tolist(), "values": y.tolist(), "level": level}
+    return out
+
+
+class PyramidStore:
+    """LRU of built pyramids, keyed by (session, metric, ...), bounded in bytes."""
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[dict, int]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, pyramids: dict):
+        size = sum(p.nbytes for p in pyramids.values())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (pyramids, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+
+pyramid_store = PyramidStore()
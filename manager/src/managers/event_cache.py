@@ -0,0 +1,177 @@
+#event_cache.py
+# Cache of the (columnar) SessionEvents of FINISHED sessions.
+#
+# Once a session is COMPLETED or CANCELLED its events never change, so there is no
+# need to ever invalidate an entry. Two tiers:
+#   - memory: LRU, bounded by SessionEvents.nbytes
+#   - disk:   one .npz file per session under /app/data/event_cache, survives restarts,
+#             bounded in bytes as well (least recently used files are removed first)
+# Sessions that are still running are never cached.
+
+import os
+import threading
+from collections import OrderedDict
+
+from . import DATA_DIR
+from .events import SessionEvents
+from .logger import Logger
+
+FINAL_SESSION_STATES = ("COMPLETED", "CANCELLED")
+
+MEMORY_MAX_BYTES = 256 * 1024 * 1024
+DISK_MAX_BYTES = 4 * 1024 * 1024 * 1024
+CACHE_DIR = os.path.join(DATA_DIR, "event_cache")
+
+
+class SessionEventCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, memory_max_bytes: int = MEMORY_MAX_BYTES,
+                 disk_max_bytes: int = DISK_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[SessionEvents, int]] = OrderedDict()
+        self._memory_bytes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped_running = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------ public
+
+    def get(self, session_id) -> SessionEvents | None:
+        key = str(session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+
+        events = self._read_disk(key)
+        if events is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._put_memory(key, events)
+            return events
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def cacheable(self, state: str) -> bool:
+        if state in FINAL_SESSION_STATES:
+            return True
+        with self._lock:
+            self.skipped_running += 1
+        return False
+
+    def put(self, session_id, events: SessionEvents, state: str) -> bool:
+        """
+        Caches the events if the session is in a final state. Returns whether they were cached.
+        An empty event list is not cached - the clients may not have uploaded their events yet.
+        """
+        if state not in FINAL_SESSION_STATES or not len(events):
+            return False
+
+        key = str(session_id)
+        self._put_memory(key, events)
+        self._write_disk(key, events)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "skipped_running": self.skipped_running,
+                "evictions": self.evictions,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+            }
+
+    # ------------------------------------------------------------------ memory tier
+
+    def _put_memory(self, key: str, events: SessionEvents):
+        size = events.nbytes
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._entries[key] = (events, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.evictions += 1
+
+    # ------------------------------------------------------------------ disk tier
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _read_disk(self, key: str) -> SessionEvents | None:
+        if not key.isalnum():  # session ids come from the query string - never build paths from anything else
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            events = SessionEvents.load(path)
+            os.utime(path)  # mark as recently used for disk eviction
+            return events
+        except Exception as e:
+            Logger.log_error(f"SessionEventCache – dropping unreadable entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key: str, events: SessionEvents):
+        if not key.isalnum():
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                events.save(f)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except Exception as e:
+            Logger.log_error(f"SessionEventCache – failed to write session {key} to disk: {e}")
+
+    def _trim_disk(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+event_cache = SessionEventCache()
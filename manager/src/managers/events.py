@@ -0,0 +1,152 @@
+#events.py
+# Columnar representation of a session's events.
+#
+# The game server sends events as JSON objects:
+#   {"type": "...", "subtype": "...", "timestamp": 1712345678901, "actor": "...", "data": "..."}
+# Instead of keeping one dict per event, SessionEvents keeps one NumPy array per field:
+#   timestamp  int64                     epoch millis
+#   actor      int32 codes into .actors   (categorical)
+#   type       int16 codes into .types    (categorical)
+#   subtype    int16 codes into .subtypes (categorical)
+#   value      float64                   'data' parsed as a number, NaN when it isn't one
+#   raw        object                    the original 'data' string, ONLY for rows that did not
+#                                        parse as a number (e.g. FLING "speed,direction,reward"),
+#                                        None everywhere else
+# Filtering, sorting and grouping are index operations on these arrays.
+
+import numpy as np
+
+_EMPTY_INDEX = np.empty(0, dtype=np.int64)
+
+
+class SessionEvents:
+    def __init__(self, timestamp: np.ndarray, actor: np.ndarray, type_: np.ndarray, subtype: np.ndarray,
+                 value: np.ndarray, raw: np.ndarray, actors: list[str], types: list[str], subtypes: list[str]):
+        self.timestamp = timestamp
+        self.actor = actor
+        self.type = type_
+        self.subtype = subtype
+        self.value = value
+        self.raw = raw
+        # categories are shared (never mutated) between a SessionEvents and every view taken from it
+        self.actors = actors
+        self.types = types
+        self.subtypes = subtypes
+
+    # ------------------------------------------------------------------ construction
+
+    @classmethod
+    def empty(cls) -> "SessionEvents":
+        return cls.from_dicts([])
+
+    @classmethod
+    def from_dicts(cls, events: list[dict]) -> "SessionEvents":
+        actor_codes, type_codes, subtype_codes = {}, {}, {}
+        timestamps, actors, types, subtypes, values, raws = [], [], [], [], [], []
+        nan = float("nan")
+
+        for ev in events:
+            timestamps.append(ev.get("timestamp") or 0)
+            actors.append(actor_codes.setdefault(ev.get("actor") or "", len(actor_codes)))
+            types.append(type_codes.setdefault(ev.get("type") or "", len(type_codes)))
+            subtypes.append(subtype_codes.setdefault(ev.get("subtype") or "", len(subtype_codes)))
+
+            data = ev.get("data")
+            value, raw = nan, None
+            if data is not None and data != "":
+                try:
+                    value = float(data)
+                except (TypeError, ValueError):
+                    raw = data if isinstance(data, str) else str(data)
+            values.append(value)
+            raws.append(raw)
+
+        raw_column = np.empty(len(raws), dtype=object)
+        raw_column[:] = raws
+        return cls(
+            timestamp=np.asarray(timestamps, dtype=np.int64),
+            actor=np.asarray(actors, dtype=np.int32),
+            type_=np.asarray(types, dtype=np.int16),
+            subtype=np.asarray(subtypes, dtype=np.int16),
+            value=np.asarray(values, dtype=np.float64),
+            raw=raw_column,
+            actors=list(actor_codes),
+            types=list(type_codes),
+            subtypes=list(subtype_codes),
+        )
+
+    # ------------------------------------------------------------------ persistence
+
+    def save(self, file):
+        raw_index = np.flatnonzero(self.raw != None)  # noqa: E711 - elementwise comparison
+        np.savez(
+            file,
+            timestamp=self.timestamp, actor=self.actor, type=self.type, subtype=self.subtype, value=self.value,
+            raw_index=raw_index, raw_values=np.array(self.raw[raw_index].tolist(), dtype=str),
+            actors=np.array(self.actors, dtype=str), types=np.array(self.types, dtype=str),
+            subtypes=np.array(self.subtypes, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, file) -> "SessionEvents":
+        with np.load(file, allow_pickle=False) as f:
+            raw = np.empty(len(f["timestamp"]), dtype=object)
+            raw[f["raw_index"]] = f["raw_values"].tolist()
+            return cls(
+                timestamp=f["timestamp"], actor=f["actor"], type_=f["type"], subtype=f["subtype"],
+                value=f["value"], raw=raw,
+                actors=f["actors"].tolist(), types=f["types"].tolist(), subtypes=f["subtypes"].tolist(),
+            )
+
+    # ------------------------------------------------------------------ views
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    @property
+    def nbytes(self) -> int:
+        raw_bytes = sum(len(r) + 49 for r in self.raw if r is not None)
+        return (self.timestamp.nbytes + self.actor.nbytes + self.type.nbytes + self.subtype.nbytes
+                + self.value.nbytes + self.raw.nbytes + raw_bytes)
+
+    def take(self, index) -> "SessionEvents":
+        """Rows selected by a boolean mask or an integer index array, in that order."""
+        return SessionEvents(
+            timestamp=self.timestamp[index], actor=self.actor[index], type_=self.type[index],
+            subtype=self.subtype[index], value=self.value[index], raw=self.raw[index],
+            actors=self.actors, types=self.types, subtypes=self.subtypes,
+        )
+
+    def select(self, type_: str = None, subtype: str = None) -> "SessionEvents":
+        mask = np.ones(len(self), dtype=bool)
+        for wanted, codes, categories in ((type_, self.type, self.types), (subtype, self.subtype, self.subtypes)):
+            if not wanted:
+                continue
+            if wanted not in categories:
+                return self.take(_EMPTY_INDEX)
+            mask &= codes == categories.index(wanted)
+        return self if mask.all() else self.take(mask)
+
+    def sorted(self) -> "SessionEvents":
+        """Rows ordered by timestamp (stable, so equal timestamps keep their arrival order)."""
+        if len(self) < 2 or np.all(self.timestamp[1:] >= self.timestamp[:-1]):
+            return self
+        return self.take(np.argsort(self.timestamp, kind="stable"))
+
+    def group_by_actor(self) -> dict[str, np.ndarray]:
+        """
+        actor name -> row indices of that actor, in row order.
+        Actors appear in the order of their first row (like a defaultdict filled while iterating).
+        """
+        if not len(self):
+            return {}
+        order = np.argsort(self.actor, kind="stable")
+        codes, starts = np.unique(self.actor[order], return_index=True)
+        groups = np.split(order, starts[1:])
+        by_first_row = sorted(zip(codes.tolist(), groups), key=lambda cg: cg[1][0])
+        return {self.actors[code]: rows for code, rows in by_first_row}
+
+    def data_strings(self) -> list[str]:
+        """The 'data' field of every row as a string (raw where kept, else formatted from the value)."""
+        return [raw if raw is not None else ("" if value != value else repr(value))
+                for raw, value in zip(self.raw.tolist(), self.value.tolist())]
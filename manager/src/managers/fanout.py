@@ -0,0 +1,101 @@
+#fanout.py
+# Concurrent fan-out of independent game-server calls.
+#
+#   results = fan_out({"FREQUENCY": lambda: fetch(...), "ANGLE": lambda: fetch(...)}, deadline=10)
+#
+# The calls run on a small shared thread pool, so a page waits for the slowest call
+# instead of the sum of all of them. Each call is isolated: an exception or a missed
+# deadline only replaces that call's result with the default, the others are kept.
+#
+# Worker threads have no Flask request context, so the operator's bearer token is
+# captured when fanning out and handed to the workers through a context variable
+# (see auth_headers() in managers/__init__.py).
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import has_request_context, session
+
+from .logger import Logger
+from .request_timing import phase, request_timing
+
+MAX_WORKERS = int(os.environ.get("MANAGER_FANOUT_WORKERS", 8))
+DEFAULT_DEADLINE = 15.0  # seconds for the whole fan-out
+THREAD_PREFIX = "fanout"
+
+# bearer token of the operator a worker thread is calling on behalf of
+fanout_token: contextvars.ContextVar[str | None] = contextvars.ContextVar("fanout_token", default=None)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix=THREAD_PREFIX)
+
+
+def current_token() -> str | None:
+    if has_request_context():
+        return session.get('token')
+    return fanout_token.get()
+
+
+def _in_worker() -> bool:
+    return threading.current_thread().name.startswith(THREAD_PREFIX)
+
+
+def _with_token(token, fn):
+    # the request's timing goes along too, so calls made by the workers count for it
+    timing = request_timing.get()
+
+    def run():
+        reset = fanout_token.set(token)
+        reset_timing = request_timing.set(timing)
+        try:
+            return fn()
+        finally:
+            request_timing.reset(reset_timing)
+            fanout_token.reset(reset)
+    return run
+
+
+def fan_out(calls: dict, deadline: float = DEFAULT_DEADLINE, default=None) -> dict:
+    """
+    Runs every callable of {name: callable} concurrently and returns {name: result}.
+    A call that raises, or has not finished when the deadline passes, yields 'default'.
+    """
+    if not calls:
+        return {}
+
+    token = current_token()
+    results = {}
+
+    # a fan-out from inside a worker runs inline - waiting on the same bounded pool could deadlock
+    if _in_worker() or len(calls) == 1:
+        end = time.monotonic() + deadline
+        for name, fn in calls.items():
+            if time.monotonic() > end:
+                Logger.log_error(f"fan_out – {name}: deadline of {deadline}s exceeded")
+                results[name] = default
+                continue
+            try:
+                results[name] = fn()
+            except Exception as e:
+                Logger.log_error(f"fan_out – {name}: {e}")
+                results[name] = default
+        return results
+
+    futures = {name: _executor.submit(_with_token(token, fn)) for name, fn in calls.items()}
+    with phase("fanout"):
+        wait(futures.values(), timeout=deadline)
+
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            Logger.log_error(f"fan_out – {name}: deadline of {deadline}s exceeded")
+            results[name] = default
+            continue
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            Logger.log_error(f"fan_out – {name}: {e}")
+            results[name] = default
+    return results
@@ -2,9 +2,8 @@
 
 from typing import List
 from flask import session
-from . import post_auth, server_response, URL
+from . import post_auth, server_response, URL, decode_payload
 from .logger import Logger
-import json
 
 
 def get_feedback(sid: str) -> List[dict]:
@@ -30,15 +29,8 @@ def get_feedback(sid: str) -> List[dict]:
         if response.status_code in (200, 201):
             ser_res = server_response(response)
             if ser_res.get_success():
-                raw_payload = ser_res.get_payload() or []
-                for item in raw_payload:
-                    try:
-                        # If payload items are JSON‐strings, parse them
-                        feedback_list.append(json.loads(item))
-                    except Exception:
-                        # If already a dict, just append
-                        if isinstance(item, dict):
-                            feedback_list.append(item)
+                # JSON-string items are parsed, already decoded dicts are kept as they are
+                feedback_list = decode_payload(ser_res.get_payload() or [], "feedback")
                 return feedback_list
 
             Logger.log_error(f"get_feedback – API returned error: {ser_res.get_message()}")
@@ -75,15 +67,8 @@ def get_experiment_feedback(exp_id: str) -> List[dict]:
         if response.status_code in (200, 201):
             ser_res = server_response(response)
             if ser_res.get_success():
-                raw_payload = ser_res.get_payload() or []
-                for item in raw_payload:
-                    try:
-                        # If payload items are JSON‐strings, parse them
-                        feedback_list.append(json.loads(item))
-                    except Exception:
-                        # If already a dict, just append
-                        if isinstance(item, dict):
-                            feedback_list.append(item)
+                # JSON-string items are parsed, already decoded dicts are kept as they are
+                feedback_list = decode_payload(ser_res.get_payload() or [], "feedback")
                 return feedback_list
 
             Logger.log_error(f"get_experiment_feedback – API error: {ser_res.get_message()}")
@@ -0,0 +1,166 @@
+#fling.py
+# Decoder of FLING events - the USER_INPUT of Waves, Pacman and Tree.
+#
+# A FLING's data is "speed,direction,reward" (Waves may send only the speed):
+#   speed      float64   dp/sec
+#   direction  int64
+#   reward     bool      "true" (any case) or not
+# decode_fling() parses the whole data column at once. The strings become one fixed-width
+# bytes array, viewed as a byte matrix with a row per event; the commas split every row
+# into field matrices (chars of other fields blanked), and each field is converted with one astype(). Only a field
+# that holds unparsable strings is searched for them, by halves, down to small chunks
+# converted one by one - so the cost of bad rows grows with their number, not with the
+# size of the session. Rare non-ASCII data is decoded string by string.
+#
+# What a game needs of a row is in FLING_GAMES; valid_rows() is the mask of the rows
+# that have it. The analyzers in session_data.py are views over the decoded arrays.
+
+import numpy as np
+
+from .events import SessionEvents
+from .request_timing import timed
+
+# fields a row must have for the game's chart ("complete": speed, direction and reward are all there)
+FLING_GAMES = {
+    "WAVES": ("speed",),
+    "PACMAN": ("complete", "speed"),
+    "TREE": ("complete", "speed", "direction"),  # direction is only validated for Tree session data
+}
+
+_SCALAR_CHUNK = 64  # chunks this small are converted string by string
+
+
+def _convert(strings: np.ndarray, rows: np.ndarray, dtype, values: np.ndarray, ok: np.ndarray):
+    if not len(rows):
+        return
+    try:
+        values[rows] = strings[rows].astype(dtype)
+        return
+    except (ValueError, OverflowError):
+        pass
+    if len(rows) <= _SCALAR_CHUNK:
+        convert = float if dtype == np.float64 else int
+        for row in rows.tolist():
+            try:
+                values[row] = convert(strings[row])
+            except OverflowError:
+                pass  # a number, just too large for the dtype - left at 0
+            except ValueError:
+                ok[row] = False
+        return
+    mid = len(rows) // 2
+    _convert(strings, rows[:mid], dtype, values, ok)
+    _convert(strings, rows[mid:], dtype, values, ok)
+
+
+_SPACE = ord(" ")
+_IS_SPACE = np.zeros(256, dtype=bool)
+_IS_SPACE[[0, 9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True  # what str.strip() removes, and the padding
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[ord("A"):ord("Z") + 1] += 32
+_TRUE = np.frombuffer(b"true", dtype=np.uint8)
+
+
+def _parse(field: np.ndarray, dtype, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(values, ok) of the given rows of a bytes column padded with spaces."""
+    values = np.zeros(len(field), dtype=dtype)
+    ok = np.zeros(len(field), dtype=bool)
+    ok[rows] = True
+    _convert(field, rows, dtype, values, ok)
+    return values, ok
+
+
+def _field(chars: np.ndarray, in_field: np.ndarray, space: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(bytes column of one field, the other chars blanked; mask of the rows where it is not blank)"""
+    blanked = np.where(in_field, chars, np.uint8(_SPACE))
+    return blanked.view(f"S{chars.shape[1]}").ravel(), (in_field & ~space).any(axis=1)
+
+
+def _is_true(chars: np.ndarray, in_field: np.ndarray, space: np.ndarray) -> np.ndarray:
+    """the field of every row, stripped and lower-cased, == "true" """
+    content = in_field & ~space
+    first = np.minimum(content.argmax(axis=1), chars.shape[1] - len(_TRUE))
+    word = _LOWER[np.take_along_axis(chars, first[:, None] + np.arange(len(_TRUE)), axis=1)] \
+        if chars.shape[1] >= len(_TRUE) else np.zeros((len(chars), len(_TRUE)), dtype=np.uint8)
+    return (content.sum(axis=1) == len(_TRUE)) & (word == _TRUE).all(axis=1)
+
+
+def _decode_text(text: str) -> tuple:
+    """(speed, speed_ok, direction, direction_ok, reward, complete) of one data string"""
+    parts = text.split(",")
+    speed, speed_ok, direction, direction_ok = np.nan, False, 0, False
+    try:
+        speed, speed_ok = float(parts[0].strip()), True
+    except ValueError:
+        pass
+    if len(parts) > 1:
+        try:
+            direction, direction_ok = int(parts[1].strip()), True
+            np.int64(direction)
+        except OverflowError:
+            direction = 0  # a number, just too large for the dtype
+        except ValueError:
+            pass
+    reward = len(parts) > 2 and parts[2].strip().lower() == "true"
+    return speed, speed_ok, direction, direction_ok, reward, len(parts) > 2
+
+
+@timed("decode")
+def decode_fling(events: SessionEvents, need_direction: bool = True) -> dict:
+    """
+    Arrays aligned with the rows of events: speed, direction, reward and the masks
+    speed_ok, direction_ok and complete (the data has at least three fields). A field
+    that does not parse is NaN / 0 with its mask False. need_direction=False skips
+    parsing the direction, for games that do not check it.
+    """
+    n = len(events)
+    # data that was a plain number was parsed when the events were built: a lone speed
+    speed = events.value.copy()
+    speed_ok = ~np.isnan(speed)
+    direction = np.zeros(n, dtype=np.int64)
+    direction_ok = np.zeros(n, dtype=bool)
+    reward = np.zeros(n, dtype=bool)
+    complete = np.zeros(n, dtype=bool)
+
+    text_rows = np.flatnonzero(events.raw != None)  # noqa: E711 - elementwise comparison
+    texts = events.raw[text_rows].tolist()
+    try:
+        data = np.array(texts, dtype=bytes)
+    except UnicodeEncodeError:
+        ascii_only = [text.isascii() for text in texts]
+        for row, text, is_ascii in zip(text_rows.tolist(), texts, ascii_only):
+            if not is_ascii:
+                (speed[row], speed_ok[row], direction[row], direction_ok[row],
+                 reward[row], complete[row]) = _decode_text(text)
+        text_rows = text_rows[np.array(ascii_only, dtype=bool)]
+        data = np.array([text for text, is_ascii in zip(texts, ascii_only) if is_ascii], dtype=bytes)
+
+    if len(text_rows):
+        chars = data.view(np.uint8).reshape(len(data), data.itemsize)  # padded with NUL bytes
+        space = _IS_SPACE[chars]
+        comma = chars == ord(",")
+        field_index = np.cumsum(comma, axis=1, dtype=np.int16)
+        field_index[comma] = -1  # the commas belong to no field
+
+        column, filled = _field(chars, field_index == 0, space)
+        values, ok = _parse(column, np.float64, np.flatnonzero(filled))
+        speed[text_rows] = np.where(ok, values, np.nan)
+        speed_ok[text_rows] = ok
+        has_third = comma.sum(axis=1) >= 2
+        complete[text_rows] = has_third
+        reward[text_rows] = has_third & _is_true(chars, field_index == 2, space)
+        if need_direction:
+            # only rows that can still be valid - a broken column costs one search, not two
+            column, filled = _field(chars, field_index == 1, space)
+            values, ok = _parse(column, np.int64, np.flatnonzero(filled & has_third & speed_ok[text_rows]))
+            direction[text_rows] = values
+            direction_ok[text_rows] = ok
+
+    return {"speed": speed, "direction": direction, "reward": reward,
+            "speed_ok": speed_ok, "direction_ok": direction_ok, "complete": complete}
+
+
+def valid_rows(fling: dict, game: str) -> np.ndarray:
+    """Mask of the rows that carry everything the game's chart needs."""
+    return np.logical_and.reduce([fling[field if field == "complete" else f"{field}_ok"]
+                                  for field in FLING_GAMES[game]])
@@ -1,6 +1,14 @@
 #game.py
 from . import *
 from .logger import Logger
+from .lobby import get_sessions, session_list, _lobby_changed
+from .precompute import precompute_queue
+from .shared_state import shared_state
+
+# DB ids of the sessions of each running experiment, for the precompute job when it ends.
+# Kept in the shared state: the experiment may be stopped through another worker.
+EXPERIMENT_SESSIONS = "experiment_sessions"
+EXPERIMENT_SESSIONS_TTL_S = 24 * 3600
 
 
 def start_game(lobby_id):
@@ -13,6 +21,8 @@ def start_game(lobby_id):
             ser_res = server_response(res)
             Logger.log_info(f"Starting game: {ser_res}")
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
+                _record_session_db_ids(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Error starting game: {ser_res}")
@@ -25,6 +35,22 @@ def start_game(lobby_id):
         return False
 
 
+def _record_session_db_ids(lobby_id):
+    """
+    The game server gives every session of the lobby its DB id when the experiment starts,
+    and drops each session from the lobby once it is played - so the ids are taken now.
+    """
+    try:
+        db_ids = [s["dbId"] for s in session_list(get_sessions(lobby_id)) if s.get("dbId") is not None]
+    except Exception as e:
+        Logger.log_error(f"Error listing sessions of lobby {lobby_id}: {e}")
+        return
+    if db_ids:
+        shared_state.set(EXPERIMENT_SESSIONS, lobby_id, db_ids, ttl=EXPERIMENT_SESSIONS_TTL_S)
+    else:
+        Logger.log_error(f"Lobby {lobby_id}: no session DB ids after starting the experiment")
+
+
 def stop_game(lobby_id):
     body = server_request(GAME_REQUEST_TYPE.end_experiment.name, lobbyId=lobby_id).to_dict()
 
@@ -33,6 +59,12 @@ def stop_game(lobby_id):
         if res.status_code == 200:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
+                # the sessions are analysed in the background; the ones never played are skipped
+                session_ids = shared_state.get(EXPERIMENT_SESSIONS, lobby_id)
+                if session_ids:
+                    shared_state.delete(EXPERIMENT_SESSIONS, lobby_id)
+                    precompute_queue.submit(lobby_id, session_ids)
                 return True
             else:
                 Logger.log_error(f"Error stopping game: {ser_res}")
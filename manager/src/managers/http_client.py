@@ -0,0 +1,248 @@
+#http_client.py
+# Shared, pooled HTTP client for every manager -> game-server call.
+#
+# A bare requests.post/get opens (and tears down) a fresh TCP/TLS connection per call.
+# Here every thread gets its own requests.Session, but all of them mount the SAME
+# HTTPAdapter, so they draw from one thread-safe urllib3 connection pool per host and
+# keep-alive sockets are reused across calls and across Flask request threads.
+#
+# Every call also goes through the resilience layer (managers/resilience.py):
+#   - a circuit breaker per host fails calls at once while the game server is failing
+#   - the timeout of an idempotent read adapts to its observed latency, up to the configured one
+#   - idempotent reads are hedged: if the answer takes longer than the endpoint's p95, the
+#     same request is sent again and the first good answer wins (HEDGE_BUDGET caps the extra load)
+
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import UPSTREAM_ERRORS, UPSTREAM_HEDGES, UPSTREAM_LATENCY
+from .request_timing import phase
+from .resilience import CLOSED, CircuitBreaker, CircuitOpenError, LatencyTracker
+
+# Pool sizing is per worker process. POOL_MAXSIZE should be >= the number of threads
+# that can talk to the game server at the same time, otherwise extra sockets are
+# opened and thrown away instead of being returned to the pool.
+POOL_CONNECTIONS = int(os.environ.get("MANAGER_HTTP_POOL_CONNECTIONS", 4))  # distinct hosts kept warm
+POOL_MAXSIZE = int(os.environ.get("MANAGER_HTTP_POOL_MAXSIZE", 16))         # keep-alive sockets per host
+
+DEFAULT_TIMEOUT = 2.0
+
+# Per-endpoint timeouts (seconds), matched by longest path prefix.
+# Used whenever the caller does not pass an explicit timeout.
+ENDPOINT_TIMEOUTS = {
+    "/login": 5.0,
+    "/manager": 2.0,
+    "/data/session/select/events": 10.0,
+    "/data/session/select": 3.0,
+    "/data/experiment/select": 3.0,
+    "/data/participant/select": 3.0,
+    "/presets": 3.0,
+}
+
+# Idempotent reads of steady latency: their timeouts adapt and they are hedged. Commands are
+# left out - a short timeout would report a command the server did apply as failed - and so
+# are the session events, whose latency follows the session's size, not the server's health.
+# Paths are matched exactly, so /data/session/select/events is not one of them.
+HEDGED_PATHS = {"/data/session/select", "/data/session/select/feedback", "/data/experiment/select/names",
+                "/data/experiment/select/feedback", "/data/participant/select", "/presets/get"}
+HEDGED_MANAGER_TYPES = {"get_lobbies", "get_lobby", "get_sessions", "get_online_player_ids"}
+HEDGE_WORKERS = int(os.environ.get("MANAGER_HEDGE_WORKERS", 16))
+HEDGE_BUDGET = 0.1  # second requests per hedgeable call, at most
+HEDGE_BURST = 10
+
+
+class HttpClient:
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 endpoint_timeouts: dict = None, default_timeout: float = DEFAULT_TIMEOUT):
+        self._adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+        self._default_timeout = default_timeout
+        self._endpoint_timeouts = sorted((endpoint_timeouts or ENDPOINT_TIMEOUTS).items(),
+                                         key=lambda kv: len(kv[0]), reverse=True)
+        self._lock = threading.Lock()
+        self._calls_by_path = {}
+        self.latency = LatencyTracker()
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        self._hedge_slots = threading.Semaphore(HEDGE_WORKERS)  # never queue a call behind busy hedge threads
+        self._hedgeable_calls = 0
+        self._hedges = {"sent": 0, "won": 0}
+
+    def _session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = requests.Session()
+            # the manager proxies many operators through the same sessions -
+            # never let a cookie from one upstream response ride along on another user's call
+            s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            s.mount("http://", self._adapter)
+            s.mount("https://", self._adapter)
+            self._local.session = s
+        return s
+
+    def timeout_for(self, url: str) -> float:
+        path = urlsplit(url).path
+        for prefix, timeout in self._endpoint_timeouts:
+            if path.startswith(prefix):
+                return timeout
+        return self._default_timeout
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host)
+        return breaker
+
+    def request(self, method: str, url: str, timeout: float = None, **kwargs) -> requests.Response:
+        path = urlsplit(url).path
+        # /manager multiplexes every game request - label it by the request type
+        body = kwargs.get("json")
+        request_type = body.get("type", "") if path == "/manager" and isinstance(body, dict) else ""
+        key = (path, request_type)
+
+        breaker = self.breaker(url)
+        allowed, probe = breaker.allow()
+        if not allowed:
+            UPSTREAM_ERRORS.inc(path=path, type=request_type, kind="circuit_open")
+            raise CircuitOpenError(f"game server failing - {method} {path} not sent "
+                                   f"(retry in {breaker.retry_in():.1f}s)")
+
+        idempotent_read = self._hedgeable(path, request_type)
+        if timeout is None:
+            timeout = self.timeout_for(url)
+            if idempotent_read:
+                timeout = self.latency.timeout(key, timeout)
+        with self._lock:
+            self._calls_by_path[path] = self._calls_by_path.get(path, 0) + 1
+
+        hedge_delay = self.latency.hedge_delay(key) if idempotent_read else None
+        if hedge_delay is None or probe or breaker.state != CLOSED or not self._hedge_slots.acquire(blocking=False):
+            return self._send(method, url, timeout, key, breaker, probe, kwargs)
+        return self._hedged(method, url, timeout, key, breaker, hedge_delay, kwargs)
+
+    @staticmethod
+    def _hedgeable(path: str, request_type: str) -> bool:
+        return request_type in HEDGED_MANAGER_TYPES if path == "/manager" else path in HEDGED_PATHS
+
+    def _send(self, method: str, url: str, timeout: float, key: tuple, breaker: CircuitBreaker, probe: bool,
+              kwargs: dict) -> requests.Response:
+        path, request_type = key
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            with phase("upstream"):
+                response = self._session().request(method, url, timeout=timeout, **kwargs)
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        UPSTREAM_LATENCY.observe(elapsed, path=path, type=request_type)
+
+        if response is not None:
+            healthy = response.status_code < 500
+            if healthy and self._hedgeable(path, request_type):
+                self.latency.observe(key, elapsed)
+        elif isinstance(error, requests.RequestException):
+            healthy = False
+            kind = "timeout" if isinstance(error, requests.Timeout) else "connection"
+            UPSTREAM_ERRORS.inc(path=path, type=request_type, kind=kind)
+        else:
+            healthy = None  # failed on our side (bad URL, ...)
+        breaker.record(healthy, probe)
+        if error is not None:
+            raise error
+
+        if response.status_code >= 400:
+            UPSTREAM_ERRORS.inc(path=path, type=request_type, kind=f"http_{response.status_code // 100}xx")
+        return response
+
+    def _submit(self, *args):
+        # the request's timing and token context goes along to the hedge thread
+        future = self._hedge_pool.submit(contextvars.copy_context().run, self._send, *args)
+        future.add_done_callback(lambda _: self._hedge_slots.release())
+        return future
+
+    def _hedged(self, method: str, url: str, timeout: float, key: tuple, breaker: CircuitBreaker,
+                delay: float, kwargs: dict) -> requests.Response:
+        args = (method, url, timeout, key, breaker, False, kwargs)
+        primary = self._submit(*args)  # holds the slot acquired by request()
+        with self._lock:
+            self._hedgeable_calls += 1
+        with phase("fanout"):
+            if wait([primary], timeout=delay).done:
+                return primary.result()
+
+            with self._lock:
+                within_budget = self._hedges["sent"] < HEDGE_BUDGET * self._hedgeable_calls + HEDGE_BURST
+                if within_budget:
+                    self._hedges["sent"] += 1
+            if not within_budget or not self._hedge_slots.acquire(blocking=False):
+                return primary.result()
+            hedge = self._submit(*args)
+            UPSTREAM_HEDGES.inc(path=key[0], type=key[1], outcome="sent")
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None and future.result().status_code < 500:
+                        if future is hedge:
+                            with self._lock:
+                                self._hedges["won"] += 1
+                            UPSTREAM_HEDGES.inc(path=key[0], type=key[1], outcome="won")
+                        return future.result()
+        return primary.result()  # both failed - answer with (or raise) the first request's outcome
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Connection reuse statistics for this worker process.
+        'connections_opened' counts new sockets; every other request went over a kept-alive one.
+        """
+        hosts = {}
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{key.key_scheme}://{key.key_host}:{key.key_port}"
+            entry = hosts.setdefault(host, {"requests": 0, "connections_opened": 0})
+            entry["requests"] += pool.num_requests
+            entry["connections_opened"] += pool.num_connections
+
+        total_requests = sum(h["requests"] for h in hosts.values())
+        total_opened = sum(h["connections_opened"] for h in hosts.values())
+        with self._lock:
+            calls_by_path = dict(self._calls_by_path)
+            hedges = {**self._hedges, "hedgeable_calls": self._hedgeable_calls}
+
+        return {
+            "pool_maxsize": self._adapter._pool_maxsize,
+            "requests": total_requests,
+            "connections_opened": total_opened,
+            "connections_reused": max(total_requests - total_opened, 0),
+            "reuse_ratio": round(1 - total_opened / total_requests, 3) if total_requests else 0.0,
+            "hosts": hosts,
+            "calls_by_path": calls_by_path,
+            "breakers": {host: breaker.stats() for host, breaker in list(self._breakers.items())},
+            "timeouts": self.latency.stats(lambda path: self.timeout_for(path)),
+            "hedges": hedges,
+        }
+
+
+http_client = HttpClient()
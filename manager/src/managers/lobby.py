@@ -3,13 +3,16 @@
 
 from . import *
 from .logger import Logger
+from .snapshot_cache import snapshot_cache
+from .fanout import fan_out
+from .pipeline import CommandPipeline, first_item
 
 
 class lobbies_list_payload:
     def __init__(self, payload: list[str]):
-        # Parse each JSON string in the payload into a dictionary
+        # Parse the JSON strings of the payload into dictionaries (one pass for the whole list)
         self.lobbies: list[lobby_info_payload] = [
-            lobby_info_payload(json.loads(lobby)) for lobby in payload
+            lobby_info_payload(lobby) for lobby in decode_payload(payload, "lobbies")
         ]
 
 
@@ -42,6 +45,20 @@ class lobby_info_payload:
 
 
 def get_lobbies():
+    # polled by every lobby page - served from a short-lived shared snapshot
+    return snapshot_cache.get("lobbies", "lobbies", _fetch_lobbies)
+
+
+def get_lobby(lobby_id: str) -> lobby_info_payload:
+    return snapshot_cache.get("lobby", f"lobby:{lobby_id}", lambda: _fetch_lobby(lobby_id))
+
+
+def _lobby_changed(lobby_id: str = None):
+    """Drops the cached snapshots of a lobby after the manager changed it."""
+    snapshot_cache.invalidate("lobbies", *([f"lobby:{lobby_id}"] if lobby_id else []))
+
+
+def _fetch_lobbies():
     body = server_request(GAME_REQUEST_TYPE.get_lobbies.name).to_dict()
     try:
         response = post_auth(URL + "/manager", body)
@@ -59,7 +76,7 @@ def get_lobbies():
         return None
     
 
-def get_lobby(lobby_id: str) -> lobby_info_payload:
+def _fetch_lobby(lobby_id: str) -> lobby_info_payload:
     body = server_request(GAME_REQUEST_TYPE.get_lobby.name, lobbyId=lobby_id).to_dict()
     try:
         response = post_auth(URL + "/manager", body)
@@ -69,7 +86,7 @@ def get_lobby(lobby_id: str) -> lobby_info_payload:
             ser_res = server_response(response)
             if ser_res.get_success():
                 # Parse the JSON string into a dictionary before using it
-                payload_dict = json.loads(ser_res.get_payload()[0])
+                payload_dict = decode_one(ser_res.get_payload(), "lobby")
                 return lobby_info_payload(payload_dict)
 
             Logger.log_error(f"Failed to get lobby: {ser_res.get_message()}")
@@ -80,28 +97,29 @@ def get_lobby(lobby_id: str) -> lobby_info_payload:
 
 
 def create_lobby(participants: list[str], gameType=GAME_TYPE.water_ripples):
-    body = server_request(GAME_REQUEST_TYPE.create_lobby.name, gameType=gameType.name).to_dict()
-    try:
-        res = post_auth(URL + "/manager", json=body)
-        if res.status_code in [200, 201]:
-            ser_res = server_response(res)
-            if ser_res.get_success():
-                lobby_id = ser_res.get_payload()[0]
-                print(f"Created lobby {lobby_id} with participants {participants}")
-
-                for participant in participants:
-                    if not join_lobby(lobby_id, participant):
-                        return f"Failed to join {participant} to lobby {lobby_id}"
-
-                return lobby_id
-            else:
-                Logger.log_error(f"Failed to create lobby: {ser_res.get_message()}")
-                return None
-
-    except Exception as e:
-        Logger.log_error(f"Failed to create lobby, {e}")
+    # create, then every join at once - undone with remove_lobby if a join fails
+    pipeline = CommandPipeline()
+    pipeline.add("lobby", server_request(GAME_REQUEST_TYPE.create_lobby.name, gameType=gameType.name),
+                 result=first_item,
+                 compensate=lambda lobby_id: server_request(GAME_REQUEST_TYPE.remove_lobby.name, lobbyId=lobby_id))
+    for participant in participants:
+        pipeline.add(f"join:{participant}",
+                     lambda results, participant=participant: server_request(
+                         GAME_REQUEST_TYPE.join_lobby.name, participant, results["lobby"]),
+                     after=("lobby",))
+
+    outcome = pipeline.run()
+    lobby_id = outcome.results.get("lobby")
+    _lobby_changed(lobby_id)
+    if not outcome.ok:
+        Logger.log_error(f"Failed to create lobby: {outcome.error}", lobby_id=lobby_id, participants=participants,
+                         removed="lobby" in outcome.compensated)
         return None
 
+    Logger.log_info(f"Created lobby {lobby_id}", lobby_id=lobby_id, participants=participants,
+                    elapsed_ms=outcome.elapsed_ms)
+    return lobby_id
+
 def remove_lobby(lobby_id: str):
     body = server_request(GAME_REQUEST_TYPE.remove_lobby.name, lobbyId=lobby_id).to_dict()
     try:
@@ -109,6 +127,7 @@ def remove_lobby(lobby_id: str):
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Failed to remove lobby: {ser_res.get_message()}")
@@ -126,6 +145,7 @@ def join_lobby(lobby_id: str, player_id: str):
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Error joining lobby: {ser_res}")
@@ -153,6 +173,7 @@ def leave_lobby(lobby_id: str, player_id: str):
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Error leaving lobby: {ser_res}")
@@ -167,12 +188,13 @@ def change_session_order(lobby_id: str, session_order: list[str]):
     """
     body = server_request(GAME_REQUEST_TYPE.change_sessions_order.name, lobbyId=lobby_id).to_dict()
     body["sessionIds"] = session_order
-    print(f"Updating session order with body: {body}")
+    Logger.log_debug(f"Updating session order of lobby {lobby_id}", lobby_id=lobby_id, session_ids=session_order)
     try:
         res = post_auth(URL + "/manager", json=body)
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Failed to update session order: {ser_res.get_message()}")
@@ -192,7 +214,6 @@ def get_sessions(lobby_id: str):
             ser_res = server_response(response)
             if ser_res.get_success():
                 payload = ser_res.get_payload()  # Directly access the payload
-                print(payload)
                 # Ensure the payload is a list of session objects
                 if isinstance(payload, list):
                     return payload  # Return the list of session objects directly
@@ -206,6 +227,19 @@ def get_sessions(lobby_id: str):
         Logger.log_error(f"Failed to get sessions, {e}")
         return None
 
+def session_list(payload) -> list[dict]:
+    """The sessions of a get_sessions payload (the game server sends the list as one JSON string)."""
+    sessions = []
+    for item in payload or []:
+        if isinstance(item, str):
+            item = loads(item)
+        if isinstance(item, list):
+            sessions.extend(s for s in item if isinstance(s, dict))
+        elif isinstance(item, dict):
+            sessions.append(item)
+    return sessions
+
+
 def create_session(lobby_id: str, game_type: str, duration: int, sync_tolerance: int, window: int, is_warmup: bool, countdown_timer: int):
     """
     Creates a new session in the specified lobby.
@@ -216,12 +250,13 @@ def create_session(lobby_id: str, game_type: str, duration: int, sync_tolerance:
     body["syncWindowLength"] = window
     body["isWarmup"] = is_warmup
     body["countdownTimer"] = countdown_timer
-    print(f"Creating session with body: {body}")
+    Logger.log_debug(f"Creating session in lobby {lobby_id}", lobby_id=lobby_id, request=body)
     try:
         res = post_auth(URL + "/manager", json=body)
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return ser_res.get_payload()[0]  # Return the session ID
             else:
                 Logger.log_error(f"Failed to create session: {ser_res.get_message()}")
@@ -232,6 +267,69 @@ def create_session(lobby_id: str, game_type: str, duration: int, sync_tolerance:
         return None
 
 
+def create_sessions(lobby_id: str, sessions: list[dict], replace: bool = False) -> list[str] | None:
+    """
+    Adds sessions to a lobby, in order, after the ones it already has - or, with replace,
+    in place of them. Each session is a dict of create_session's fields: gameType, duration,
+    syncTolerance, syncWindowLength, isWarmup, countdownTimer.
+    Returns the new session ids, or None - then none of them is left behind and the lobby's
+    previous sessions are untouched.
+    """
+    def session_request(spec):
+        body = server_request(GAME_REQUEST_TYPE.create_session.name, lobbyId=lobby_id,
+                              gameType=spec["gameType"]).to_dict()
+        for field in ("duration", "syncTolerance", "syncWindowLength", "isWarmup", "countdownTimer"):
+            body[field] = spec[field]
+        return body
+
+    def remove_request(session_id):
+        body = server_request(GAME_REQUEST_TYPE.remove_session.name, lobbyId=lobby_id).to_dict()
+        body["sessionId"] = session_id
+        return body
+
+    def order_request(results):
+        # the game server appends concurrent creates in arrival order - put them in the requested one
+        # (sessions being replaced go last, and are removed once the new ones are in place)
+        existing = existing_ids(results)
+        body = server_request(GAME_REQUEST_TYPE.change_sessions_order.name, lobbyId=lobby_id).to_dict()
+        body["sessionIds"] = new_ids(results) + existing if replace else existing + new_ids(results)
+        return body
+
+    def existing_ids(results):
+        # listed concurrently with the creates - it may already include some of them
+        new = set(new_ids(results))
+        return [s["sessionId"] for s in session_list(results["existing"])
+                if s.get("sessionId") is not None and s["sessionId"] not in new]
+
+    def new_ids(results):
+        return [results[f"session:{i}"] for i in range(len(sessions))]
+
+    # listing the lobby and every create go out together, the order once they are all in
+    pipeline = CommandPipeline()
+    pipeline.add("existing", server_request(GAME_REQUEST_TYPE.get_sessions.name, lobbyId=lobby_id))
+    for i, spec in enumerate(sessions):
+        pipeline.add(f"session:{i}", session_request(spec), result=first_item, compensate=remove_request)
+    pipeline.add("order", order_request, after=("existing", *(f"session:{i}" for i in range(len(sessions)))))
+
+    outcome = pipeline.run()
+    _lobby_changed(lobby_id)
+    if not outcome.ok:
+        Logger.log_error(f"Failed to create sessions in lobby {lobby_id}: {outcome.error}", lobby_id=lobby_id,
+                         removed=outcome.compensated)
+        return None
+
+    if replace:
+        # best effort - a session that cannot be removed stays at the end of the list
+        previous = existing_ids(outcome.results)
+        removed = fan_out({sid: (lambda sid=sid: delete_session(lobby_id, sid)) for sid in previous}, default=False)
+        left = [sid for sid in previous if not removed.get(sid)]
+        if left:
+            Logger.log_error(f"Could not remove the previous sessions {left} of lobby {lobby_id}", lobby_id=lobby_id)
+    Logger.log_debug(f"Created {len(sessions)} sessions in lobby {lobby_id}", lobby_id=lobby_id,
+                     elapsed_ms=outcome.elapsed_ms)
+    return new_ids(outcome.results)
+
+
 def delete_session(lobby_id: str, session_id: str):
     """
     Deletes a session from a lobby.
@@ -243,6 +341,7 @@ def delete_session(lobby_id: str, session_id: str):
         if res.status_code in [200, 201]:
             ser_res = server_response(res)
             if ser_res.get_success():
+                _lobby_changed(lobby_id)
                 return True
             else:
                 Logger.log_error(f"Failed to delete session: {ser_res.get_message()}")
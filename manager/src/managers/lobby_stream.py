@@ -0,0 +1,281 @@
+#lobby_stream.py
+# Server-Sent Events for the lobby pages, fed by ONE shared upstream poller.
+#
+# Every open lobby page used to poll /get_lobby once a second, and each of those polls
+# was a get_lobby call to the game server - upstream load grew with tabs x poll rate.
+# Now a page opens an EventSource on /lobby/stream (or /lobbies/stream for the lobby
+# list) and the single poller thread of this process:
+#   - calls get_lobby once per cycle for every lobby that somebody is watching
+#     (plus get_sessions while its experiment runs), get_lobbies and
+#     get_online_player_ids once per cycle when somebody watches the list,
+#   - diffs the lobby_info_payload snapshots against the previous cycle,
+#   - pushes only what changed to the subscribers of that lobby.
+# With nobody subscribed the poller thread exits; the next subscriber restarts it.
+#
+# Every open stream holds one request thread of its worker, so a worker serves at most
+# MANAGER_STREAM_MAX_SUBSCRIBERS streams (default: half of MANAGER_THREADS) and answers
+# 503 beyond that - the other threads stay free for ordinary requests. A stream also ends
+# after MANAGER_STREAM_MAX_SECONDS (plus a little jitter, so tabs do not reconnect all
+# at once); the browser reconnects after the retry delay and may land on another worker.
+#
+# Events of a lobby stream:    snapshot {lobby}, change {lobbyId, changes}, sessions {sessions}, gone {lobbyId}
+# Events of the list stream:   snapshot {lobbies, online}, added {lobby}, change {lobbyId, changes},
+#                              removed {lobbyId}, online {online}
+
+import os
+import queue
+import random
+import threading
+import time
+
+from . import dumps
+from .fanout import fan_out, fanout_token
+from .lobby import get_lobby, get_lobbies, get_sessions
+from .logger import Logger
+from .participants import get_participants
+
+POLL_INTERVAL_S = 1.0
+HEARTBEAT_S = 15.0           # comment line that keeps proxies from closing an idle stream
+GONE_AFTER_FAILURES = 3      # consecutive failed get_lobby calls before a lobby is reported gone
+SUBSCRIBER_QUEUE_SIZE = 100  # events buffered for a slow client before it is resynced
+MAX_SUBSCRIBERS = int(os.environ.get("MANAGER_STREAM_MAX_SUBSCRIBERS",
+                                     max(int(os.environ.get("MANAGER_THREADS", 16)) // 2, 1)))
+MAX_STREAM_S = float(os.environ.get("MANAGER_STREAM_MAX_SECONDS", 300))
+STREAM_JITTER = 0.1          # streams end up to 10% after MAX_STREAM_S
+RETRY_MS = 3000              # reconnect delay the browser is told to use
+
+LOBBY_LIST = "__lobbies__"
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+def _changes(old: dict, new: dict) -> dict:
+    return {k: v for k, v in new.items() if old.get(k) != v}
+
+
+class _Subscriber:
+    def __init__(self, key: str, token: str | None):
+        self.key = key
+        self.token = token
+        self.events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.resync = False
+
+    def push(self, event: str):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # too far behind - drop the backlog, the stream sends a fresh snapshot instead
+            self.resync = True
+            while not self.events.empty():
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    break
+
+
+class LobbyStreamHub:
+    def __init__(self, poll_interval: float = POLL_INTERVAL_S, max_subscribers: int = MAX_SUBSCRIBERS,
+                 max_stream_s: float = MAX_STREAM_S):
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self.max_stream_s = max_stream_s
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[_Subscriber]] = {}
+        self._thread = None
+
+        # state of the previous cycle
+        self._lobbies: dict[str, dict] = {}       # lobbyId -> lobby dict, for watched lobbies
+        self._sessions: dict[str, list] = {}      # lobbyId -> sessions payload
+        self._failures: dict[str, int] = {}
+        self._list: dict[str, dict] | None = None  # lobbyId -> lobby dict, for the list stream
+        self._online: list | None = None
+
+        self.polls = 0
+        self.upstream_calls = 0
+        self.rejected = 0
+
+    # ------------------------------------------------------------------ subscribers
+
+    def subscribe(self, key: str, token: str | None) -> _Subscriber | None:
+        """A new subscriber of key, or None when this worker already serves max_subscribers streams."""
+        sub = _Subscriber(key, token)
+        with self._lock:
+            if sum(len(subs) for subs in self._subscribers.values()) >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self._subscribers.setdefault(key, set()).add(sub)
+            snapshot = self._snapshot_event(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lobby-poller", daemon=True)
+                self._thread.start()
+        if snapshot:
+            sub.push(snapshot)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            subs = self._subscribers.get(sub.key)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.key]
+                    self._forget(sub.key)
+
+    def stream(self, sub: _Subscriber):
+        """
+        Generator of SSE text for one subscriber; ends after the stream's lifetime (the
+        browser reconnects) and unsubscribes when it ends or the client goes away.
+        """
+        deadline = time.monotonic() + self.max_stream_s * (1 + random.uniform(0, STREAM_JITTER))
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if sub.resync:
+                    sub.resync = False
+                    with self._lock:
+                        snapshot = self._snapshot_event(sub.key)
+                    if snapshot:
+                        yield snapshot
+                try:
+                    yield sub.events.get(timeout=min(HEARTBEAT_S, remaining))
+                except queue.Empty:
+                    if remaining > HEARTBEAT_S:
+                        yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": {key: len(subs) for key, subs in self._subscribers.items()},
+                "max_subscribers": self.max_subscribers,
+                "max_stream_s": self.max_stream_s,
+                "rejected": self.rejected,
+                "polls": self.polls,
+                "upstream_calls": self.upstream_calls,
+                "polling": self._thread is not None and self._thread.is_alive(),
+            }
+
+    def _snapshot_event(self, key: str) -> str | None:
+        if key == LOBBY_LIST:
+            if self._list is None:
+                return None
+            return _sse("snapshot", {"lobbies": list(self._list.values()), "online": self._online or []})
+        lobby = self._lobbies.get(key)
+        return _sse("snapshot", lobby) if lobby is not None else None
+
+    def _forget(self, key: str):
+        if key == LOBBY_LIST:
+            self._list, self._online = None, None
+        else:
+            for state in (self._lobbies, self._sessions, self._failures):
+                state.pop(key, None)
+
+    def _publish(self, key: str, event: str):
+        with self._lock:
+            subs = list(self._subscribers.get(key, ()))
+        for sub in subs:
+            sub.push(event)
+
+    # ------------------------------------------------------------------ poller
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            with self._lock:
+                keys = list(self._subscribers)
+                if not keys:
+                    self._thread = None
+                    return
+                # calls go out with the token of a connected operator
+                token = next((s.token for subs in self._subscribers.values() for s in subs if s.token), None)
+
+            reset = fanout_token.set(token)
+            try:
+                self._poll(keys)
+            except Exception as e:
+                Logger.log_error(f"LobbyStreamHub – poll failed: {e}")
+            finally:
+                fanout_token.reset(reset)
+
+            time.sleep(max(self.poll_interval - (time.monotonic() - started), 0.05))
+
+    def _poll(self, keys: list[str]):
+        lobby_ids = [k for k in keys if k != LOBBY_LIST]
+        calls = {f"lobby:{lid}": (lambda lid=lid: get_lobby(lid)) for lid in lobby_ids}
+        # session lists only change while an experiment runs
+        calls.update({f"sessions:{lid}": (lambda lid=lid: get_sessions(lid))
+                      for lid in lobby_ids if self._lobbies.get(lid, {}).get("experimentRunning")})
+        if LOBBY_LIST in keys:
+            calls["list"] = get_lobbies
+            calls["online"] = get_participants
+
+        results = fan_out(calls, deadline=max(self.poll_interval * 3, 3.0))
+        self.polls += 1
+        self.upstream_calls += len(calls)
+
+        for lid in lobby_ids:
+            self._update_lobby(lid, results.get(f"lobby:{lid}"))
+            if f"sessions:{lid}" in results:
+                self._update_sessions(lid, results[f"sessions:{lid}"])
+        if LOBBY_LIST in keys:
+            self._update_list(results.get("list"), results.get("online"))
+
+    def _update_lobby(self, lobby_id: str, lobby):
+        if lobby is None:
+            self._failures[lobby_id] = self._failures.get(lobby_id, 0) + 1
+            if self._failures[lobby_id] == GONE_AFTER_FAILURES:
+                self._publish(lobby_id, _sse("gone", {"lobbyId": lobby_id}))
+            return
+        self._failures.pop(lobby_id, None)
+
+        new = lobby.to_dict()
+        old = self._lobbies.get(lobby_id)
+        with self._lock:
+            self._lobbies[lobby_id] = new
+        if old is None:
+            self._publish(lobby_id, _sse("snapshot", new))
+        else:
+            changes = _changes(old, new)
+            if changes:
+                self._publish(lobby_id, _sse("change", {"lobbyId": lobby_id, "changes": changes}))
+
+    def _update_sessions(self, lobby_id: str, sessions):
+        if sessions is None or self._sessions.get(lobby_id) == sessions:
+            return
+        self._sessions[lobby_id] = sessions
+        self._publish(lobby_id, _sse("sessions", {"lobbyId": lobby_id, "sessions": sessions}))
+
+    def _update_list(self, lobbies, online):
+        if lobbies is None:
+            return  # keep the last known list; the next cycle retries
+        new = {lobby.lobbyId: lobby.to_dict() for lobby in lobbies.lobbies}
+        old = self._list
+        online = online if online is not None else self._online
+
+        with self._lock:
+            self._list = new
+            previous_online, self._online = self._online, online
+        if old is None:
+            self._publish(LOBBY_LIST, _sse("snapshot", {"lobbies": list(new.values()), "online": online or []}))
+            return
+
+        for lobby_id in old.keys() - new.keys():
+            self._publish(LOBBY_LIST, _sse("removed", {"lobbyId": lobby_id}))
+        for lobby_id, lobby in new.items():
+            if lobby_id not in old:
+                self._publish(LOBBY_LIST, _sse("added", lobby))
+            else:
+                changes = _changes(old[lobby_id], lobby)
+                if changes:
+                    self._publish(LOBBY_LIST, _sse("change", {"lobbyId": lobby_id, "changes": changes}))
+        if online != previous_online:
+            self._publish(LOBBY_LIST, _sse("online", {"online": online or []}))
+
+
+lobby_stream_hub = LobbyStreamHub()
@@ -1,92 +1,202 @@
 #logger.py
+# Queued, structured logging.
+#
+# Logger.log_* only put a record on an in-memory queue; a listener thread does the I/O:
+#   - data/logs/output.log   one JSON object per line, rotated at midnight (MANAGER_LOG_FILE;
+#                            gunicorn workers each write their own, see gunicorn.conf.py)
+#   - stdout / stderr        plain text, unless MANAGER_LOG_STDOUT=0
+# A full queue drops the record (and counts it) instead of blocking the request.
+#
+# Messages that can repeat per event - a malformed event in a session of thousands -
+# pass a rate_key: at most RATE_LIMIT_COUNT of them per key are written within
+# RATE_LIMIT_WINDOW_S, the rest are counted and reported with the next one that gets through.
+#
+#   Logger.log_error(f"Invalid FLING data: {data}", rate_key="invalid_fling")
+
+import atexit
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
-from datetime import datetime
 import os
+import queue
 import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+LOG_LEVEL = os.environ.get("MANAGER_LOG_LEVEL", "DEBUG").upper()
+LOG_TO_STDOUT = os.environ.get("MANAGER_LOG_STDOUT", "1").lower() not in ("0", "false", "no")
+QUEUE_SIZE = int(os.environ.get("MANAGER_LOG_QUEUE_SIZE", 10000))
+LOG_FILE = os.environ.get("MANAGER_LOG_FILE", "output.log")
+RATE_LIMIT_COUNT = 5
+RATE_LIMIT_WINDOW_S = 60.0
 
 
 def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: when the listener falls behind, records are dropped and counted."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # format the message here, in the caller's thread, while its arguments are still current
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class _RateLimiter:
+    def __init__(self, count: int = RATE_LIMIT_COUNT, window: float = RATE_LIMIT_WINDOW_S):
+        self.count = count
+        self.window = window
+        self._lock = threading.Lock()
+        self._windows: dict[str, list] = {}  # key -> [window start, written, suppressed]
+        self.suppressed_total = 0
+
+    def allow(self, key: str) -> tuple[bool, int]:
+        """(write this message?, messages suppressed since the last one written)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 1000:  # keys are a fixed set in practice - guard anyway
+                    self._windows = {k: v for k, v in self._windows.items() if now - v[0] < self.window}
+                return True, suppressed
+            if state[1] < self.count:
+                state[1] += 1
+                return True, 0
+            state[2] += 1
+            self.suppressed_total += 1
+            return False, 0
+
+
 class Logger:
     _instance = None
-    _print_counter = 0  # Counter for tracking the number of prints
+    _instance_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(Logger, cls).__new__(cls)
-            cls._instance._initialize_logger()
+            with cls._instance_lock:  # first log calls can come from several threads at once
+                if cls._instance is None:
+                    instance = super(Logger, cls).__new__(cls)
+                    instance._initialize_logger()
+                    cls._instance = instance
         return cls._instance
 
     @classmethod
     def get_handler(cls):
-        return cls().logger.handlers[0]
+        return cls().file_handler
 
     def _initialize_logger(self):
-        # Set up the logger
         self.logger = logging.getLogger("MyLogger")
-        self.logger.setLevel(logging.DEBUG)
-
-        # Create the Logs directory if it doesn't exist
-        # path = /app/data/logs
-        log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "logs")
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-
-        # Set up the handler for daily log rotation without date in the initial file name
-        log_filename = os.path.join(log_dir, "output.log")
-        handler = TimedRotatingFileHandler(log_filename, when="midnight", interval=1, backupCount=5)
-        handler.suffix = "%Y-%m-%d"  # Use date suffix for rotated files
-        handler.setLevel(logging.DEBUG)
-
-        # Create a formatter and set it for the handler
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-
-        # Add the handler to the logger
-        self.logger.addHandler(handler)
+        self.logger.setLevel(getattr(logging, LOG_LEVEL, logging.DEBUG))
+        self.logger.propagate = False
+
+        # path = /app/data/logs (DATA_DIR of managers/__init__.py, which imports this module)
+        data_dir = os.environ.get("MANAGER_DATA_DIR",
+                                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+        log_dir = os.path.join(data_dir, "logs")
+        os.makedirs(log_dir, exist_ok=True)
+
+        # daily rotation without a date in the current file's name
+        self.file_handler = TimedRotatingFileHandler(os.path.join(log_dir, LOG_FILE),
+                                                     when="midnight", interval=1, backupCount=5)
+        self.file_handler.suffix = "%Y-%m-%d"
+        self.file_handler.setFormatter(JsonFormatter())
+        handlers = [self.file_handler]
+
+        if LOG_TO_STDOUT:
+            plain = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            stdout = logging.StreamHandler(sys.stdout)
+            stdout.addFilter(lambda record: record.levelno < logging.ERROR)
+            stderr = logging.StreamHandler(sys.stderr)
+            stderr.setLevel(logging.ERROR)
+            for handler in (stdout, stderr):
+                handler.setFormatter(plain)
+                handlers.append(handler)
+
+        self.queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=QUEUE_SIZE))
+        self.logger.addHandler(self.queue_handler)
+        self.listener = QueueListener(self.queue_handler.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self._stop_listener)  # flush what is still queued
+
+        self.rate_limiter = _RateLimiter()
+
+    def _stop_listener(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
 
     @classmethod
-    def _pretty_print(cls, message, is_error=False):
-        """
-        Prints the message and inserts a newline after every 5 messages.
-        """
-        cls._print_counter += 1
-
-        # Print the message to the appropriate stream
-        if is_error:
-            eprint(message)
-        else:
-            print(message)
-
-        # Add a newline every 5 prints
-        if cls._print_counter % 5 == 0:
-            print("\n")  # Insert a new line after every 5th message
+    def _log(cls, level: int, message, rate_key: str = None, **fields):
+        instance = cls()
+        if not instance.logger.isEnabledFor(level):
+            return
+        if rate_key is not None:
+            allowed, suppressed = instance.rate_limiter.allow(rate_key)
+            if not allowed:
+                return
+            fields["rate_key"] = rate_key
+            if suppressed:
+                fields["suppressed"] = suppressed
+                message = f"{message}  ({suppressed} similar messages suppressed)"
+        instance.logger.log(level, message, extra={"fields": fields} if fields else None)
 
+    @classmethod
+    def stats(cls) -> dict:
+        instance = cls()
+        return {
+            "queued": instance.queue_handler.queue.qsize(),
+            "dropped": instance.queue_handler.dropped,
+            "rate_limited": instance.rate_limiter.suppressed_total,
+            "stdout": LOG_TO_STDOUT,
+            "level": logging.getLevelName(instance.logger.level),
+        }
 
     @classmethod
-    def log_debug(cls, message):
-        cls._pretty_print(message)
-        cls().logger.debug(message)
+    def log_debug(cls, message, rate_key: str = None, **fields):
+        cls._log(logging.DEBUG, message, rate_key, **fields)
 
     @classmethod
-    def log_info(cls, message):
-        cls._pretty_print(message)
-        cls().logger.info(message)
+    def log_info(cls, message, rate_key: str = None, **fields):
+        cls._log(logging.INFO, message, rate_key, **fields)
 
     @classmethod
-    def log_warning(cls, message):
-        cls._pretty_print(message)
-        cls().logger.warning(message)
+    def log_warning(cls, message, rate_key: str = None, **fields):
+        cls._log(logging.WARNING, message, rate_key, **fields)
 
     @classmethod
-    def log_error(cls, message):
-        cls._pretty_print(message, is_error=True)
-        cls().logger.error(message)
+    def log_error(cls, message, rate_key: str = None, **fields):
+        cls._log(logging.ERROR, message, rate_key, **fields)
 
     @classmethod
-    def log_critical(cls, message):
-        cls._pretty_print(message)
-        cls().logger.critical(message)
\ No newline at end of file
+    def log_critical(cls, message, rate_key: str = None, **fields):
+        cls._log(logging.CRITICAL, message, rate_key, **fields)
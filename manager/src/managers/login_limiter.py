@@ -0,0 +1,150 @@
+#login_limiter.py
+# Throttling of the login form, checked before anything is sent to the game server.
+#
+#   reason = login_limiter.check(client_ip, username, attempt=True)   # None, "ip", "username" or "rate"
+#   ... authenticate ...
+#   login_limiter.failed(client_ip, username)   -> minutes of lockout it caused (0: none)
+#   login_limiter.succeeded(client_ip, username)
+#
+# Three kinds of entries, all in the shared state so every worker agrees, all expiring:
+#   login_attempts  POSTs per client IP per minute (fixed window)             -> "rate"
+#   login_failures  failed logins per client IP and per username, forgotten
+#                   FAILURE_MEMORY_S after the last failure
+#   login_lockout   set when a failure count reaches a step of the schedule   -> "ip" / "username"
+# A check is one indexed lookup of the lockouts (plus one counter increment for an attempt).
+# A sweeper thread purges expired entries every SWEEP_INTERVAL_S and caps every namespace at
+# MAX_TRACKED_KEYS, dropping the entries closest to expiry, so a run of credential stuffing
+# from many addresses cannot grow the state without bound.
+
+import os
+import threading
+import time
+
+from .logger import Logger
+from .shared_state import shared_state
+
+ATTEMPTS_PER_MINUTE = int(os.environ.get("MANAGER_LOGIN_ATTEMPTS_PER_MINUTE", 20))
+FAILURE_MEMORY_S = 3600
+MAX_TRACKED_KEYS = int(os.environ.get("MANAGER_LOGIN_MAX_TRACKED", 50_000))
+SWEEP_INTERVAL_S = 60
+
+ATTEMPTS = "login_attempts"
+FAILURES = "login_failures"
+LOCKOUTS = "login_lockout"
+
+
+def ip_lockout_minutes(failures: int) -> int:
+    if failures > 10 and failures % 2 == 1:
+        return 30
+    return {9: 10, 7: 5, 5: 1}.get(failures, 0)
+
+
+def username_lockout_minutes(failures: int) -> int:
+    # higher steps than per IP: anyone can fail logins in someone else's name
+    if failures >= 20 and failures % 5 == 0:
+        return 15
+    return {15: 5, 10: 1}.get(failures, 0)
+
+
+def _ip_key(client_ip) -> str:
+    return f"ip:{client_ip or 'local'}"
+
+
+def _user_key(username: str) -> str:
+    return f"user:{username.strip().lower()[:64]}"
+
+
+class LoginLimiter:
+    def __init__(self, state=shared_state):
+        self.state = state
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._counts = dict.fromkeys(("success", "failure", "blocked_ip", "blocked_username", "blocked_rate"), 0)
+
+    # ------------------------------------------------------------------ public
+
+    def check(self, client_ip, username: str = None, attempt: bool = False) -> str | None:
+        """Why this client may not log in now ("ip", "username", "rate"), or None.
+        attempt=True counts the call against the per-minute limit of the client IP."""
+        self._ensure_sweeper()
+        ip_key = _ip_key(client_ip)
+        keys = [ip_key] + ([_user_key(username)] if username else [])
+        locked = self.state.get_many(LOCKOUTS, keys)
+
+        reason = None
+        if ip_key in locked:
+            reason = "ip"
+        elif locked:
+            reason = "username"
+        elif attempt:
+            window = int(time.time() // 60)
+            if self.state.incr(ATTEMPTS, f"{ip_key}:{window}", ttl=120) > ATTEMPTS_PER_MINUTE:
+                reason = "rate"
+                Logger.log_warning(f"Client {client_ip} exceeded {ATTEMPTS_PER_MINUTE} login attempts per minute",
+                                   rate_key=f"login_rate:{client_ip}", client_ip=client_ip)
+        if reason:
+            self._count(f"blocked_{reason}")
+        return reason
+
+    def failed(self, client_ip, username: str = None) -> int:
+        """Records a failed login. Returns the minutes of lockout it caused, 0 for none."""
+        self._count("failure")
+        minutes = 0
+        targets = [(_ip_key(client_ip), ip_lockout_minutes, f"client {client_ip}")]
+        if username:
+            targets.append((_user_key(username), username_lockout_minutes, f"username {username[:64]!r}"))
+        for key, schedule, who in targets:
+            step = schedule(self.state.incr(FAILURES, key, ttl=FAILURE_MEMORY_S))
+            if step:
+                Logger.log_info(f"Locking out {who} for {step} minute{'s' if step > 1 else ''} "
+                                f"due to too many failed login attempts.")
+                self.state.set(LOCKOUTS, key, time.time() + step * 60, ttl=step * 60)
+                minutes = max(minutes, step)
+        return minutes
+
+    def succeeded(self, client_ip, username: str = None):
+        self._count("success")
+        self.state.delete(FAILURES, _ip_key(client_ip))
+        if username:
+            self.state.delete(FAILURES, _user_key(username))
+
+    def stats(self) -> dict:
+        entries = self.state.stats()["entries"]
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "tracked": {ns: entries.get(ns, 0) for ns in (ATTEMPTS, FAILURES, LOCKOUTS)},
+            "attempts_per_minute": ATTEMPTS_PER_MINUTE,
+            "max_tracked_keys": MAX_TRACKED_KEYS,
+        }
+
+    # ------------------------------------------------------------------ internals
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep, name="login-limiter-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL_S)
+            try:
+                self.state.purge()
+                for ns in (ATTEMPTS, FAILURES, LOCKOUTS):
+                    dropped = self.state.trim(ns, MAX_TRACKED_KEYS)
+                    if dropped:
+                        Logger.log_warning(f"LoginLimiter – {ns} over {MAX_TRACKED_KEYS} entries, dropped {dropped}",
+                                           rate_key=f"login_limiter_trim:{ns}")
+            except Exception as e:
+                Logger.log_error(f"LoginLimiter – sweep: {e}", rate_key="login_limiter_sweep")
+
+
+login_limiter = LoginLimiter()
@@ -0,0 +1,208 @@
+#metrics.py
+# Prometheus text-format metrics of this worker process, served on /metrics.
+#
+# Recording is a dict lookup and a few additions under a per-metric lock:
+#   UPSTREAM_LATENCY.observe(0.12, path="/manager", type="get_lobby")
+#   UPSTREAM_ERRORS.inc(path="/manager", type="get_lobby", kind="timeout")
+# Values that other components already count (cache hit ratios, pool reuse, ...) are not
+# recorded twice - register_collector() reads them from their stats() when /metrics is scraped.
+#
+# No client library is needed; the exposition format is written here
+# (https://prometheus.io/docs/instrumenting/exposition_formats/).
+#
+# Under gunicorn a scrape of /metrics reaches one worker at random. So that it still sees
+# every worker, REGISTRY.share(shared_state) makes each worker publish its samples to the
+# shared state every PUBLISH_INTERVAL_S (and on each scrape it serves). /metrics then
+# answers with the samples of all live workers, each with a worker="<pid>" label.
+# Counters stay monotonic per series; aggregate with sum without (worker) (...).
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from .logger import Logger
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+EVENT_COUNT_BUCKETS = (0, 100, 1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+WORKERS_NS = "metrics_workers"
+PUBLISH_INTERVAL_S = 10
+WORKER_TTL_S = 60  # samples of a worker that stopped publishing are dropped after this
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, *extra: str) -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    parts.extend(e for e in extra if e)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def family(self, worker: str = "") -> tuple:
+        """(name, kind, help, sample lines); worker: an extra label added to every sample"""
+        return self.name, self.kind, self.help, self.samples(worker)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, worker: str = "") -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.labelnames, k, worker)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)  # first bucket with value <= upper bound
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self, worker: str = "") -> list[str]:
+        with self._lock:
+            values = {k: ([*v[0]], v[1], v[2]) for k, v in self._values.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, worker, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key, worker)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key, worker)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._state = None
+        self._publisher = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """collector() -> iterable of (name, kind, help, [(labels dict, value), ...]), called on every scrape."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def share(self, state):
+        """Publish this worker's samples to the shared state, and render those of every worker."""
+        with self._lock:
+            self._state = state
+            if self._publisher is None or not self._publisher.is_alive():
+                self._publisher = threading.Thread(target=self._publish_loop, name="metrics-publisher", daemon=True)
+                self._publisher.start()
+
+    def families(self, worker: str = "") -> list[tuple]:
+        """[(name, kind, help, sample lines)] of this process; worker: a label added to every sample"""
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        families = [metric.family(worker) for metric in metrics]
+        for collector in collectors:
+            try:
+                for name, kind, help_text, samples in collector():
+                    families.append((name, kind, help_text, [
+                        f"{name}{_labels(tuple(labels), tuple(labels.values()), worker)} {_number(value)}"
+                        for labels, value in samples]))
+            except Exception as e:
+                Logger.log_error(f"metrics – collector {getattr(collector, '__name__', collector)}: {e}",
+                                 rate_key="metrics_collector")
+        return families
+
+    def render(self) -> str:
+        if self._state is None:
+            families = self.families()
+        else:
+            self._publish()  # this worker's samples as of now
+            families = {}
+            for _, published in sorted(self._state.items(WORKERS_NS)):
+                for name, kind, help_text, samples in published:
+                    families.setdefault(name, (kind, help_text, []))[2].extend(samples)
+            families = [(name, kind, help_text, samples) for name, (kind, help_text, samples) in families.items()]
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def _publish(self):
+        pid = os.getpid()
+        self._state.set(WORKERS_NS, str(pid), self.families(f'worker="{pid}"'), ttl=WORKER_TTL_S)
+
+    def _publish_loop(self):
+        while True:
+            try:
+                self._publish()
+            except Exception as e:
+                Logger.log_error(f"metrics – publishing: {e}", rate_key="metrics_publish")
+            time.sleep(PUBLISH_INTERVAL_S)
+
+
+REGISTRY = Registry()
+
+UPSTREAM_LATENCY = REGISTRY.register(Histogram(
+    "manager_upstream_request_seconds", "Latency of game-server calls by path and /manager request type.",
+    ("path", "type")))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "manager_upstream_errors_total", "Failed game-server calls by path, request type and kind of failure.",
+    ("path", "type", "kind")))
+UPSTREAM_HEDGES = REGISTRY.register(Counter(
+    "manager_upstream_hedged_requests_total", "Second requests of hedged game-server reads, sent and won.",
+    ("path", "type", "outcome")))
+ROUTE_LATENCY = REGISTRY.register(Histogram(
+    "manager_http_request_seconds", "Latency of the manager's own routes.",
+    ("route", "method", "status")))
+UPSTREAM_CALLS = REGISTRY.register(Histogram(
+    "manager_upstream_calls_per_request", "Game-server calls made while serving one request of a route.",
+    ("route",), buckets=CALL_COUNT_BUCKETS))
+SESSION_EVENTS = REGISTRY.register(Histogram(
+    "manager_session_events", "Events per analyzed session, by where they came from.",
+    ("source",), buckets=EVENT_COUNT_BUCKETS))
@@ -62,7 +62,6 @@ def get_operators():
         if response.status_code in [200, 201]:
             ser_res = server_response(response)
             if ser_res.get_success():
-                print(ser_res.get_payload())
                 return jsonify({"message": "Operators retrieved successfully", "success": True, "payload": ser_res.payload})
             else:
                 Logger.log_error(f"Failed to get operators: {ser_res.get_message()}")
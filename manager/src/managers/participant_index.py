@@ -0,0 +1,212 @@
+#participant_index.py
+# In-memory directory of the participants, for search and paging without re-reading
+# the whole Participants table on every request.
+#
+#   by_pid     pid -> participant dict (with the zero-padded display "id")
+#   by_name    lower-case first / last name token -> pids
+#   by_email   lower-case email -> pids
+#
+# sync() takes the participant payload from the snapshot cache (one upstream read per
+# TTL, shared with every other caller) and applies it incrementally: the payload is a
+# list of JSON strings, so only strings that were not in the previous payload are
+# decoded and indexed, and only pids whose string disappeared are dropped.
+#
+# Name and email lookups are prefix matches: bisect over the sorted keys of the index,
+# rebuilt only after a change.
+
+import threading
+from bisect import bisect_left
+
+from .decoding import decode_one, decode_payload
+from .logger import Logger
+from .participants import get_participants, get_participants_for_view
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _display_id(pid) -> str:
+    return str(pid).zfill(3)  # leading zeros, as the lobby pages show them
+
+
+def _name_tokens(participant: dict) -> set[str]:
+    tokens = set()
+    for field in ("firstName", "lastName"):
+        tokens.update(str(participant.get(field) or "").lower().split())
+    return tokens
+
+
+def _prefix_range(keys: list[str], prefix: str):
+    i = bisect_left(keys, prefix)
+    while i < len(keys) and keys[i].startswith(prefix):
+        yield keys[i]
+        i += 1
+
+
+class ParticipantIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payload = None                  # payload object the index was last synced from
+        self._raw: dict[str, int] = {}        # JSON string of a participant -> its pid
+        self.by_pid: dict[int, dict] = {}
+        self.by_name: dict[str, set[int]] = {}
+        self.by_email: dict[str, set[int]] = {}
+        self._sorted_pids: list[int] = []
+        self._name_keys: list[str] = []
+        self._email_keys: list[str] = []
+        self._dirty = False
+        self.stats_counters = {"syncs": 0, "decoded": 0, "removed": 0}
+
+    # ------------------------------------------------------------------ sync
+
+    def sync(self) -> bool:
+        """Brings the index up to date with the participant snapshot. False if it is unavailable."""
+        payload = get_participants_for_view()
+        if payload is None:
+            return bool(self.by_pid)  # keep serving the last known directory
+        with self._lock:
+            if payload is self._payload:
+                return True  # same snapshot as last time - nothing to do
+            self._apply(payload)
+            self._payload = payload
+        return True
+
+    def _apply(self, payload: list):
+        current = set(item for item in payload if isinstance(item, str))
+        gone = [raw for raw in self._raw if raw not in current]
+        new = [raw for raw in current if raw not in self._raw]
+
+        # an edited participant is a gone string and a new one with the same pid
+        for raw in gone:
+            self._remove(self._raw.pop(raw))
+        decoded = decode_payload(new, "participant index")
+        if len(decoded) != len(new):  # bad items were dropped - pair the strings up one by one
+            decoded = [decode_one([raw], "participant index") for raw in new]
+        for raw, participant in zip(new, decoded):
+            if isinstance(participant, dict) and "pid" in participant:
+                self._raw[raw] = participant["pid"]
+                self._add(participant)
+
+        self.stats_counters["syncs"] += 1
+        self.stats_counters["decoded"] += len(new)
+        self.stats_counters["removed"] += len(gone)
+        if gone or new:
+            self._dirty = True
+
+    def _add(self, participant: dict):
+        pid = participant["pid"]
+        if pid in self.by_pid:
+            self._remove(pid)
+        participant = {**participant, "id": _display_id(pid)}
+        self.by_pid[pid] = participant
+        for token in _name_tokens(participant):
+            self.by_name.setdefault(token, set()).add(pid)
+        email = str(participant.get("email") or "").lower()
+        if email:
+            self.by_email.setdefault(email, set()).add(pid)
+
+    def _remove(self, pid: int):
+        participant = self.by_pid.pop(pid, None)
+        if participant is None:
+            return
+        for token in _name_tokens(participant):
+            pids = self.by_name.get(token)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self.by_name[token]
+        email = str(participant.get("email") or "").lower()
+        pids = self.by_email.get(email)
+        if pids is not None:
+            pids.discard(pid)
+            if not pids:
+                del self.by_email[email]
+
+    def _reindex(self):
+        if self._dirty:
+            self._sorted_pids = sorted(self.by_pid)
+            self._name_keys = sorted(self.by_name)
+            self._email_keys = sorted(self.by_email)
+            self._dirty = False
+
+    # ------------------------------------------------------------------ queries
+
+    def _matching(self, term: str) -> set[int]:
+        pids = set()
+        if term.isdigit():
+            pid = int(term)
+            if pid in self.by_pid:
+                pids.add(pid)
+        for key in _prefix_range(self._name_keys, term):
+            pids |= self.by_name[key]
+        for key in _prefix_range(self._email_keys, term):
+            pids |= self.by_email[key]
+        return pids
+
+    def online(self) -> list[dict]:
+        """The online participants known to the directory, in the order the game server reports them."""
+        self.sync()
+        online_ids = get_participants() or []
+        with self._lock:
+            out = []
+            for x in online_ids:
+                try:
+                    participant = self.by_pid.get(int(x))
+                except (TypeError, ValueError):
+                    continue
+                if participant is not None:
+                    out.append(participant)
+            return out
+
+    def search(self, query: str = "", online_only: bool = False,
+               page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+        """
+        One page of the participants matching every word of 'query' (pid, or a prefix of a
+        first name, last name or email), ordered by pid.
+        """
+        self.sync()
+        online_ids = None
+        if online_only:
+            online_ids = set()
+            for x in get_participants() or []:
+                try:
+                    online_ids.add(int(x))
+                except (TypeError, ValueError):
+                    Logger.log_error(f"ParticipantIndex – invalid online player id {x!r}")
+
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+        page = max(int(page), 1)
+        terms = query.lower().split()
+
+        with self._lock:
+            self._reindex()
+            if terms:
+                pids = None
+                for term in terms:
+                    matched = self._matching(term)
+                    pids = matched if pids is None else pids & matched
+                    if not pids:
+                        break
+                candidates = sorted(pids)
+            else:
+                candidates = self._sorted_pids
+            if online_ids is not None:
+                candidates = [pid for pid in candidates if pid in online_ids]
+
+            start = (page - 1) * page_size
+            items = [self.by_pid[pid] for pid in candidates[start:start + page_size]]
+            return {
+                "participants": items,
+                "total": len(candidates),
+                "page": page,
+                "pageSize": page_size,
+                "pages": (len(candidates) + page_size - 1) // page_size,
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.stats_counters, "participants": len(self.by_pid),
+                    "nameKeys": len(self.by_name), "emailKeys": len(self.by_email)}
+
+
+participant_index = ParticipantIndex()
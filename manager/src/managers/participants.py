@@ -3,14 +3,24 @@
 
 from . import *
 from .logger import Logger
+from .snapshot_cache import snapshot_cache
 from flask import Blueprint, request, jsonify
 import requests
 
 
 def get_participants():
+    # online player ids - a shared snapshot instead of one upstream call per page poll
+    return snapshot_cache.get("online", "online", _fetch_online_participants)
+
+
+def get_participants_for_view():
+    return snapshot_cache.get("participants", "participants", _fetch_participants_for_view)
+
+
+def _fetch_online_participants():
     body = server_request(GAME_REQUEST_TYPE.get_online_player_ids.name).to_dict()
     try:
-        response = post_auth(URL+"/manager", json=body, timeout=0.1)
+        response = post_auth(URL+"/manager", json=body)
         if response.status_code in [200, 201]:
             ser_res = server_response(response)
             if ser_res.get_success():
@@ -24,7 +34,7 @@ def get_participants():
         return None
 
 
-def get_participants_for_view():
+def _fetch_participants_for_view():
     try:
         response = post_auth(URL+"/data/participant/select", json={})
         if response.status_code in [200, 201]:
@@ -45,6 +55,7 @@ def add_participant(participant):
         if response.status_code in [200, 201]:
             ser_res = server_response(response)
             if ser_res.get_success():
+                snapshot_cache.invalidate("participants")
                 return ser_res.get_payload()
 
             Logger.log_error(f"Failed to add participant: {ser_res.get_message()}")
@@ -64,6 +75,7 @@ def remove_participant(participant_id):
             ser_res = server_response(response)
             if ser_res.get_success():
                 Logger.log_info(f"Removed participant {participant_id}, {ser_res.get_payload()}")
+                snapshot_cache.invalidate("participants")
                 return True
 
             Logger.log_error(f"Failed to remove participant: {ser_res.get_message()}")
@@ -81,6 +93,7 @@ def edit_participant(participant):
         if response.status_code in [200, 201]:
             ser_res = server_response(response)
             if ser_res.get_success():
+                snapshot_cache.invalidate("participants")
                 return ser_res.get_payload()
 
             Logger.log_error(f"Failed to edit participant: {ser_res.get_message()}")
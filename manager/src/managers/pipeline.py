@@ -0,0 +1,143 @@
+#pipeline.py
+# Multi-step /manager operations, sent as a pipeline of commands.
+#
+#   pipeline = CommandPipeline()
+#   pipeline.add("lobby", server_request(GAME_REQUEST_TYPE.create_lobby.name, gameType="WAVES"),
+#                result=first_item,
+#                compensate=lambda lobby_id: server_request(GAME_REQUEST_TYPE.remove_lobby.name, lobbyId=lobby_id))
+#   for pid in participants:
+#       pipeline.add(f"join:{pid}", lambda results, pid=pid: server_request(
+#           GAME_REQUEST_TYPE.join_lobby.name, pid, results["lobby"]), after=("lobby",))
+#   outcome = pipeline.run()      # outcome.ok, outcome.results["lobby"], outcome.failed, outcome.error
+#
+# A command is sent once every command it comes after has succeeded; commands that become
+# ready together go out concurrently through fan_out(), so the pipeline takes one round
+# trip per level of dependencies instead of one per command. A request may be a function
+# of the results so far, for commands that need an id an earlier one created.
+#
+# The first failure stops the pipeline: nothing more is sent, and every command that was
+# applied and has a compensation is undone, most recent first. A command that missed the
+# deadline may still be applied by the game server later - it is reported, not undone.
+
+import time
+
+from . import URL, post_auth, server_response
+from .fanout import fan_out
+from .logger import Logger
+
+DEFAULT_DEADLINE = 15.0  # seconds per level of the pipeline
+
+
+def first_item(res: server_response):
+    """Result of commands that answer with the id of what they created."""
+    return res.get_payload()[0]
+
+
+def _body(request) -> dict:
+    return request.to_dict() if hasattr(request, "to_dict") else dict(request)
+
+
+class Command:
+    def __init__(self, name: str, request, after: tuple = (), result=None, compensate=None):
+        self.name = name
+        self.request = request          # server_request / dict, or results -> server_request / dict
+        self.after = tuple(after)
+        self.result = result            # server_response -> result; default: the payload
+        self.compensate = compensate    # result -> server_request / dict undoing the command, or None
+
+    def body(self, results: dict) -> dict:
+        return _body(self.request(results) if callable(self.request) else self.request)
+
+
+class PipelineOutcome:
+    def __init__(self):
+        self.ok = True
+        self.results = {}          # command name -> result, of the commands that succeeded
+        self.failed = None         # name of the command that stopped the pipeline
+        self.error = None
+        self.compensated = []      # names of the commands that were undone
+        self.elapsed_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {"ok": self.ok, "results": self.results, "failed": self.failed, "error": self.error,
+                "compensated": self.compensated, "elapsedMs": self.elapsed_ms}
+
+
+class CommandPipeline:
+    def __init__(self, deadline: float = DEFAULT_DEADLINE):
+        self.deadline = deadline
+        self._commands: dict[str, Command] = {}
+
+    def add(self, name: str, request, after: tuple = (), result=None, compensate=None) -> "CommandPipeline":
+        if name in self._commands:
+            raise ValueError(f"duplicate command {name!r}")
+        missing = [dep for dep in after if dep not in self._commands]
+        if missing:  # commands come after ones already added - which also rules out cycles
+            raise ValueError(f"command {name!r} comes after unknown commands {missing}")
+        self._commands[name] = Command(name, request, after, result, compensate)
+        return self
+
+    def __len__(self):
+        return len(self._commands)
+
+    def run(self) -> PipelineOutcome:
+        started = time.perf_counter()
+        outcome = PipelineOutcome()
+        applied = []  # commands in the order they succeeded, for the compensation
+        pending = dict(self._commands)
+
+        while pending and outcome.ok:
+            ready = [c for c in pending.values() if all(dep in outcome.results for dep in c.after)]
+            for command in ready:
+                del pending[command.name]
+            results = dict(outcome.results)  # what the requests of this level may use
+            level = fan_out({c.name: (lambda c=c: self._send(c, results)) for c in ready},
+                            deadline=self.deadline, default=(False, f"no answer within {self.deadline}s"))
+            for command in ready:
+                succeeded, value = level[command.name]
+                if succeeded:
+                    outcome.results[command.name] = value
+                    applied.append(command)
+                elif outcome.ok:
+                    outcome.ok, outcome.failed, outcome.error = False, command.name, value
+
+        if not outcome.ok:
+            Logger.log_error(f"Pipeline stopped at {outcome.failed}: {outcome.error}",
+                             failed=outcome.failed, applied=[c.name for c in applied])
+            outcome.compensated = self._compensate(applied, outcome.results)
+        outcome.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        return outcome
+
+    # ------------------------------------------------------------------ internals
+
+    @staticmethod
+    def _send(command: Command, results: dict) -> tuple[bool, object]:
+        """(True, result) or (False, error message) - never raises, so fan_out keeps the message."""
+        try:
+            body = command.body(results)
+            res = post_auth(URL + "/manager", json=body)
+            if res.status_code not in [200, 201]:
+                return False, f"{body.get('type')} answered HTTP {res.status_code}"
+            ser_res = server_response(res)
+            if not ser_res.get_success():
+                return False, f"{body.get('type')}: {ser_res.get_message()}"
+            return True, command.result(ser_res) if command.result else ser_res.get_payload()
+        except Exception as e:
+            return False, f"{command.name}: {e}"
+
+    @staticmethod
+    def _compensate(applied: list[Command], results: dict) -> list[str]:
+        undone = []
+        for command in reversed(applied):
+            if command.compensate is None:
+                continue
+            try:
+                body = _body(command.compensate(results[command.name]))
+                res = post_auth(URL + "/manager", json=body)
+                if res.status_code in [200, 201] and server_response(res).get_success():
+                    undone.append(command.name)
+                    continue
+                Logger.log_error(f"Pipeline – failed to undo {command.name} with {body.get('type')}")
+            except Exception as e:
+                Logger.log_error(f"Pipeline – failed to undo {command.name}: {e}")
+        return undone
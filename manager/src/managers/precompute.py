@@ -0,0 +1,269 @@
+#precompute.py
+# Background precomputation of session analytics when an experiment ends.
+#
+# stop_game() hands the sessions of the experiment (their DB ids, recorded by start_game())
+# to precompute_queue. A single worker thread works through the jobs: for every finished
+# session it fetches the events (which fills the event cache) and renders every chart of
+# the single-session page for the session's game. Each chart response is stored as
+#   /app/data/analytics/<session>/<chart>.json
+# and /session_data/single/<chart> serves those files as they are, so the analysis
+# pages are ready by the time the operator opens them. The store is bounded in bytes:
+# after every precomputed session the least recently used session directories are
+# removed first (a read marks its session as used), like the disk tier of the event cache.
+#
+# A job runs in the worker process that queued it; its status is published to the shared
+# state, so /precompute/jobs answers the same on every worker.
+
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from . import DATA_DIR, dumps
+from .event_cache import FINAL_SESSION_STATES
+from .fanout import current_token, fanout_token
+from .logger import Logger
+from .shared_state import shared_state
+from .session_data import SessionEventBundle, charts_for_game, get_session_chart, get_session_info
+
+ANALYTICS_DIR = os.path.join(DATA_DIR, "analytics")
+ANALYTICS_MAX_BYTES = 1024 * 1024 * 1024
+START_DELAY_S = 10   # the clients upload their events when a session ends - give them a moment
+MAX_JOBS_KEPT = 50   # finished jobs kept for the status view
+JOB_TTL_S = 24 * 3600
+JOBS_NS = "precompute_jobs"
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _is_empty(data) -> bool:
+    """No chart data: None / {} / [], or a dict of such parts (e.g. {"frequency_data": {}, ...})."""
+    if isinstance(data, dict) and data:
+        return all(_is_empty(part) for part in data.values())
+    return not data
+
+
+class AnalyticsStore:
+    """Precomputed chart responses on disk, one JSON file per (session, chart)."""
+
+    def __init__(self, root: str = ANALYTICS_DIR, max_bytes: int = ANALYTICS_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._trim_lock = threading.Lock()
+        self.evictions = 0
+
+    def _path(self, session_id, chart: str) -> str | None:
+        key = str(session_id)
+        if not key.isalnum() or not chart.replace("_", "").isalnum():  # ids come from query strings
+            return None
+        return os.path.join(self.root, key, f"{chart}.json")
+
+    def put(self, session_id, chart: str, data):
+        path = self._path(session_id, chart)
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(dumps({"status": "success", "chart": chart, "data": data}))
+        os.replace(tmp_path, path)
+
+    def get(self, session_id, chart: str) -> bytes | None:
+        """The stored response body, or None when the chart was not precomputed."""
+        path = self._path(session_id, chart)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(os.path.dirname(path))  # mark the session as recently used for trim()
+            return body
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            Logger.log_error(f"AnalyticsStore – failed to read {path}: {e}")
+            return None
+
+    def trim(self):
+        """Removes the least recently used sessions until the store fits in max_bytes."""
+        with self._trim_lock:
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                return
+            sessions = []
+            for name in names:
+                path = os.path.join(self.root, name)
+                try:
+                    used = os.stat(path).st_mtime  # a put() or get() touches the directory
+                    size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                except OSError:
+                    continue
+                sessions.append((used, size, path))
+
+            total = sum(size for _, size, _ in sessions)
+            for _, size, path in sorted(sessions):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+
+analytics_store = AnalyticsStore()
+
+
+class PrecomputeQueue:
+    def __init__(self, store: AnalyticsStore = analytics_store, start_delay: float = START_DELAY_S):
+        self.store = store
+        self.start_delay = start_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[int, dict] = OrderedDict()
+        self._worker = None
+
+    # ------------------------------------------------------------------ public
+
+    def submit(self, lobby_id, session_ids) -> dict:
+        """Queues the sessions of an ended experiment. Returns the job's status."""
+        job = {
+            "jobId": shared_state.incr("precompute", "next_job_id"),  # unique across workers
+            "lobbyId": lobby_id,
+            "state": "queued",
+            "createdAt": _now(),
+            "startedAt": None,
+            "finishedAt": None,
+            "total": len(session_ids),
+            "processed": 0,
+            "sessions": [{"sessionId": str(sid), "state": "pending", "charts": 0} for sid in session_ids],
+        }
+        with self._lock:
+            self._jobs[job["jobId"]] = job
+            self._trim()
+            snapshot = self._snapshot(job)
+        self._publish(snapshot)
+        # the worker calls the game server on behalf of the operator who ended the experiment
+        self._queue.put((job["jobId"], current_token(), time.monotonic() + self.start_delay))
+        self._ensure_worker()
+        Logger.log_info(f"Precompute job {job['jobId']} queued for lobby {lobby_id}: {len(session_ids)} sessions")
+        return snapshot
+
+    def jobs(self) -> list[dict]:
+        jobs = sorted((job for _, job in shared_state.items(JOBS_NS)), key=lambda job: job["jobId"], reverse=True)
+        return jobs[:MAX_JOBS_KEPT]
+
+    def job(self, job_id: int) -> dict | None:
+        return shared_state.get(JOBS_NS, job_id)
+
+    # ------------------------------------------------------------------ worker
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="precompute", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            job_id, token, not_before = self._queue.get()
+            delay = not_before - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            reset = fanout_token.set(token)
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                Logger.log_error(f"PrecomputeQueue – job {job_id}: {e}")
+                self._update(job_id, state="failed", finishedAt=_now())
+            finally:
+                fanout_token.reset(reset)
+
+    def _run_job(self, job_id: int):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["state"], job["startedAt"] = "running", _now()
+            sessions = list(job["sessions"])
+            snapshot = self._snapshot(job)
+        self._publish(snapshot)
+
+        for entry in sessions:
+            try:
+                state, charts = self._precompute_session(entry["sessionId"])
+            except Exception as e:
+                Logger.log_error(f"PrecomputeQueue – session {entry['sessionId']}: {e}")
+                state, charts = "failed", 0
+            with self._lock:
+                entry["state"], entry["charts"] = state, charts
+                job["processed"] += 1
+                snapshot = self._snapshot(job)
+            self._publish(snapshot)
+
+        failed = sum(1 for entry in sessions if entry["state"] == "failed")
+        self._update(job_id, state="failed" if failed == len(sessions) and sessions else "done",
+                     finishedAt=_now())
+        Logger.log_info(f"Precompute job {job_id} finished: {len(sessions) - failed}/{len(sessions)} sessions")
+
+    def _precompute_session(self, session_id: str) -> tuple[str, int]:
+        """(state, number of charts stored) for one session."""
+        info = get_session_info(session_id)
+        if not info:
+            return "failed", 0
+        if info.get("state") not in FINAL_SESSION_STATES:
+            return "skipped", 0  # never played - nothing will ever change, nothing to show
+
+        # every event of the session in one fetch; it lands in the event cache for the charts below
+        if not len(SessionEventBundle(session_id)):
+            return "no_events", 0
+
+        game_type_key = (info.get("sessionType") or "").replace(" ", "_").upper()
+        charts = charts_for_game(game_type_key)
+        stored = 0
+        for chart in charts:
+            data = get_session_chart(session_id, chart)
+            if _is_empty(data):
+                # an analyzer that failed (upstream timeout, missing subtype, ...) answers {} or None -
+                # storing that would serve it forever in place of a live computation
+                continue
+            self.store.put(session_id, chart, data)
+            stored += 1
+        if stored:
+            self.store.trim()
+        return "done" if stored == len(charts) else "failed", stored
+
+    # ------------------------------------------------------------------ bookkeeping
+
+    def _update(self, job_id: int, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            snapshot = self._snapshot(job)
+        self._publish(snapshot)
+
+    @staticmethod
+    def _publish(snapshot: dict):
+        shared_state.set(JOBS_NS, snapshot["jobId"], snapshot, ttl=JOB_TTL_S)
+
+    def _trim(self):
+        finished = [jid for jid, job in self._jobs.items() if job["state"] in ("done", "failed")]
+        for jid in finished[:max(len(self._jobs) - MAX_JOBS_KEPT, 0)]:
+            del self._jobs[jid]
+
+    @staticmethod
+    def _snapshot(job: dict) -> dict:
+        out = dict(job)
+        out["sessions"] = [dict(entry) for entry in job["sessions"]]
+        out["progress"] = round(job["processed"] / job["total"], 3) if job["total"] else 1.0
+        return out
+
+
+precompute_queue = PrecomputeQueue()
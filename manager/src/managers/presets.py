@@ -0,0 +1,48 @@
+#presets.py
+# Session presets, stored by the game server, applied to lobbies in one operation.
+
+from . import *
+from .logger import Logger
+from .lobby import create_sessions
+
+SESSION_FIELDS = ("duration", "syncTolerance", "syncWindowLength", "isWarmup", "countdownTimer")
+
+
+def get_preset(name: str) -> dict | None:
+    try:
+        # the game server answers every preset for an empty name
+        response = post_auth(f"{URL}/presets/get", {"name": ""})
+        parsed = server_response(response)
+        if not parsed.get_success():
+            Logger.log_error(f"Failed to get presets: {parsed.get_message()}")
+            return None
+        for preset in decode_payload(parsed.get_payload(), "presets"):
+            if preset.get("name") == name:
+                return preset
+        return None
+    except Exception as e:
+        Logger.log_error(f"Failed to get preset {name}, {e}")
+        return None
+
+
+def preset_sessions(preset: dict) -> list[dict]:
+    """The preset's sessions as create_sessions() takes them, in the preset's order."""
+    sessions = sorted(preset.get("sessions", []), key=lambda s: s.get("index", 0))
+    return [{"gameType": get_game_type_name_from_value(s.get("gameType")), **{f: s.get(f) for f in SESSION_FIELDS}}
+            for s in sessions]
+
+
+def apply_preset(lobby_id: str, preset: dict, replace: bool = True) -> list[str] | None:
+    """
+    Creates every session of the preset in the lobby - concurrently, then ordered in one call -
+    in place of the lobby's sessions (or after them, without replace). Returns the new session
+    ids, or None when the preset could not be applied; the lobby is then left as it was.
+    """
+    sessions = preset_sessions(preset)
+    if not sessions:
+        return []
+    session_ids = create_sessions(lobby_id, sessions, replace=replace)
+    if session_ids is not None:
+        Logger.log_info(f"Applied preset {preset.get('name')} to lobby {lobby_id}", lobby_id=lobby_id,
+                        sessions=len(session_ids), replace=replace)
+    return session_ids
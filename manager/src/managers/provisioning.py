@@ -0,0 +1,173 @@
+#provisioning.py
+# Bulk lobby provisioning from a schedule of participant pairs.
+#
+#   entries = parse_schedule(text, "csv", default_preset="standard")
+#   for status in provision(entries, load_presets(entries)):   # per change of a lobby's state, then a summary
+#       ...
+#
+# A schedule is CSV - one pair per line, "participant,participant[,preset]", an optional
+# header - or JSON: {"preset": "...", "pairs": [["001", "002"], {"participants": [...], "preset": "..."}]}.
+#
+# Each lobby is created with its joins (create_lobby), then gets its preset's sessions
+# (apply_preset); a lobby whose sessions fail is removed again. PROVISION_CONCURRENCY
+# lobbies are worked on at a time, on a pool shared by every provisioning run of this
+# worker, and their game-server calls go through the bounded fan-out pool on top of that.
+
+import csv
+import io
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .fanout import current_token, fanout_token
+from .lobby import create_lobby, remove_lobby
+from .logger import Logger
+from .presets import apply_preset, get_preset
+
+PROVISION_CONCURRENCY = int(os.environ.get("MANAGER_PROVISION_CONCURRENCY", 4))
+MAX_SCHEDULE_LOBBIES = 200
+PAIR_SIZE = 2
+
+_executor = ThreadPoolExecutor(max_workers=PROVISION_CONCURRENCY, thread_name_prefix="provision")
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def _participant_id(value) -> str:
+    pid = str(value).strip()
+    return pid.zfill(3) if pid.isdigit() else pid  # ids are zero-filled, like the online participant ids
+
+
+def _entry(participants, preset, where: str) -> dict:
+    participants = [_participant_id(p) for p in participants if str(p).strip()]
+    if len(participants) != PAIR_SIZE:
+        raise ScheduleError(f"{where}: expected {PAIR_SIZE} participants, got {len(participants)}")
+    if len(set(participants)) != PAIR_SIZE:
+        raise ScheduleError(f"{where}: a participant is paired with themselves")
+    if not preset:
+        raise ScheduleError(f"{where}: no preset given and no default preset")
+    return {"participants": participants, "preset": str(preset).strip()}
+
+
+def parse_schedule(text: str, fmt: str, default_preset: str = None) -> list[dict]:
+    """[{"participants": [a, b], "preset": name}] of a CSV or JSON schedule. Raises ScheduleError."""
+    entries = []
+    if fmt == "json":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ScheduleError(f"invalid JSON: {e}")
+        if isinstance(data, dict):
+            default_preset = data.get("preset") or default_preset
+            data = data.get("pairs")
+        if not isinstance(data, list):
+            raise ScheduleError('expected a list of pairs, or {"preset": ..., "pairs": [...]}')
+        for i, item in enumerate(data, 1):
+            if isinstance(item, dict):
+                entries.append(_entry(item.get("participants") or [], item.get("preset") or default_preset,
+                                      f"pair {i}"))
+            elif isinstance(item, list):
+                entries.append(_entry(item, default_preset, f"pair {i}"))
+            else:
+                raise ScheduleError(f"pair {i}: expected a list or an object")
+    else:
+        header = True
+        for line_no, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            cells = [cell.strip() for cell in row]
+            if not any(cells) or cells[0].startswith("#"):
+                continue
+            if header and not cells[0].isdigit():
+                header = False  # at most one header, before the first pair
+                continue
+            header = False
+            preset = cells[PAIR_SIZE] if len(cells) > PAIR_SIZE and cells[PAIR_SIZE] else default_preset
+            entries.append(_entry(cells[:PAIR_SIZE], preset, f"line {line_no}"))
+
+    if not entries:
+        raise ScheduleError("the schedule has no pairs")
+    if len(entries) > MAX_SCHEDULE_LOBBIES:
+        raise ScheduleError(f"at most {MAX_SCHEDULE_LOBBIES} lobbies per schedule, got {len(entries)}")
+    return entries
+
+
+def load_presets(entries: list[dict]) -> dict:
+    """{name: preset} of every preset the schedule uses. Raises ScheduleError for unknown ones."""
+    presets = {}
+    for name in dict.fromkeys(entry["preset"] for entry in entries):
+        preset = get_preset(name)
+        if preset is None:
+            raise ScheduleError(f"preset {name} not found")
+        presets[name] = preset
+    return presets
+
+
+def _provision_lobby(index: int, entry: dict, preset: dict, report):
+    participants = entry["participants"]
+    report(index, "creating")
+    lobby_id = create_lobby(participants)
+    if not lobby_id:
+        report(index, "failed", error="could not create the lobby or join its participants")
+        return False
+
+    report(index, "sessions", lobbyId=lobby_id)
+    session_ids = apply_preset(lobby_id, preset, replace=False)
+    if session_ids is None:
+        removed = remove_lobby(lobby_id)
+        report(index, "failed", lobbyId=None if removed else lobby_id,
+               error=f"could not create the sessions of preset {entry['preset']}")
+        return False
+
+    report(index, "done", lobbyId=lobby_id, sessions=len(session_ids))
+    return True
+
+
+def provision(entries: list[dict], presets: dict):
+    """
+    Provisions a lobby per entry, PROVISION_CONCURRENCY at a time. Yields
+    {"type": "lobby", "index", "participants", "preset", "state", ...} whenever a lobby's state
+    changes (queued, creating, sessions, done, failed), then {"type": "summary", ...}.
+    """
+    started = time.perf_counter()
+    updates = queue.Queue()
+    token = current_token()  # the pool threads call the game server on behalf of this operator
+
+    def report(index, state, **fields):
+        entry = entries[index]
+        updates.put({"type": "lobby", "index": index, "participants": entry["participants"],
+                     "preset": entry["preset"], "state": state, **fields})
+
+    def run(index):
+        reset = fanout_token.set(token)
+        try:
+            return _provision_lobby(index, entries[index], presets[entries[index]["preset"]], report)
+        except Exception as e:
+            Logger.log_error(f"Provisioning – lobby {index}: {e}")
+            report(index, "failed", error=str(e))
+            return False
+        finally:
+            fanout_token.reset(reset)
+            updates.put(None)  # one per lobby: the run is over when every lobby has sent it
+
+    for index in range(len(entries)):
+        report(index, "queued")
+    for index in range(len(entries)):
+        _executor.submit(run, index)
+
+    done = failed = finished = 0
+    while finished < len(entries):
+        update = updates.get()
+        if update is None:
+            finished += 1
+            continue
+        done += update["state"] == "done"
+        failed += update["state"] == "failed"
+        yield update
+
+    summary = {"type": "summary", "total": len(entries), "done": done, "failed": failed,
+               "elapsedMs": round((time.perf_counter() - started) * 1000, 1)}
+    Logger.log_info(f"Provisioned {done}/{len(entries)} lobbies", **summary)
+    yield summary
@@ -0,0 +1,116 @@
+#request_timing.py
+# Where the time of one inbound request goes, for the Server-Timing header.
+#
+#   with phase("decode"): ...          or          @timed("analytics")
+#
+# Phases nest and are counted EXCLUSIVELY: time spent in an inner phase is taken out of
+# the outer one, so "analytics" does not also contain the upstream calls it made.
+# What no phase claims is reported as "app". Phases:
+#   upstream   game-server HTTP calls (summed - concurrent calls can add up to more than the wall time)
+#   fanout     time the request thread waited for concurrent upstream calls
+#   decode     JSON decoding of game-server payloads
+#   analytics  NumPy work on session events
+#   render     render_template
+#
+# The timing of a request lives in a context variable; fan_out() hands it to its worker
+# threads, so calls made there are counted for the request that fanned out.
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+UPSTREAM_CALL_BUDGET = int(os.environ.get("MANAGER_UPSTREAM_CALL_BUDGET", 5))
+SLOW_REQUEST_MS = float(os.environ.get("MANAGER_SLOW_REQUEST_MS", 1000))
+
+PHASES = ("upstream", "fanout", "decode", "analytics", "render")
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._thread = threading.get_ident()  # the request thread; fan-out workers run alongside it
+        self._lock = threading.Lock()
+        self._local = threading.local()  # stack of open phases, per thread
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self._on_thread = 0.0
+        self.upstream_calls = 0
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self, name: str):
+        # [name, started, time spent in nested phases]
+        self._stack().append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        stack = self._stack()
+        name, started, nested = stack.pop()
+        elapsed = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += elapsed
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+            if threading.get_ident() == self._thread:
+                self._on_thread += elapsed - nested
+            if name == "upstream":
+                self.upstream_calls += 1
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def breakdown(self) -> dict:
+        """{phase: milliseconds}, with the unclaimed remainder as "app" and the wall time as "total"."""
+        total = self.total_ms()
+        with self._lock:
+            out = {name: round(seconds * 1000, 1) for name, seconds in self.durations.items() if seconds}
+            on_thread = self._on_thread * 1000  # time of fan-out workers is not part of the remainder
+        out["app"] = round(max(total - on_thread, 0.0), 1)
+        out["total"] = round(total, 1)
+        return out
+
+    def header(self) -> str:
+        parts = []
+        for name, ms in self.breakdown().items():
+            entry = f"{name};dur={ms}"
+            if name == "upstream":
+                entry += f';desc="{self.upstream_calls} calls"'
+            parts.append(entry)
+        return ", ".join(parts)
+
+
+request_timing: contextvars.ContextVar[RequestTiming | None] = contextvars.ContextVar("request_timing", default=None)
+
+
+def start_request() -> RequestTiming:
+    timing = RequestTiming()
+    request_timing.set(timing)
+    return timing
+
+
+@contextmanager
+def phase(name: str):
+    timing = request_timing.get()
+    if timing is None:  # background threads are not part of any request
+        yield
+        return
+    timing.enter(name)
+    try:
+        yield
+    finally:
+        timing.exit()
+
+
+def timed(name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
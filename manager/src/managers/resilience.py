@@ -0,0 +1,148 @@
+#resilience.py
+# What http_client needs to keep a slow or failing game server from stalling the manager.
+#
+# LatencyTracker   recent latencies per (path, request type). Gives each endpoint a timeout
+#                  that follows its observed p99 (TIMEOUT_P99_FACTOR x p99), kept between
+#                  MIN_TIMEOUT_SHARE of the configured timeout and the configured timeout, and
+#                  the delay after which a hedged read sends its second request (the p95).
+# CircuitBreaker   per game-server host. Opens after CONSECUTIVE_FAILURES failures in a row, or
+#                  when FAILURE_RATIO of the last WINDOW calls failed; while open, calls fail at
+#                  once with CircuitOpenError instead of tying up a thread for a full timeout.
+#                  After a cool-down (doubling up to MAX_COOLDOWN_S) one probe call is let
+#                  through: success closes the breaker, failure opens it again.
+# Failures are timeouts, connection errors and 5xx answers - a 4xx is the server working.
+
+import threading
+import time
+from collections import deque
+
+import requests
+
+from .logger import Logger
+
+MIN_SAMPLES = 20              # latencies needed before an endpoint's timeout adapts / reads are hedged
+LATENCY_WINDOW = 200          # latest latencies kept per endpoint
+TIMEOUT_P99_FACTOR = 3.0
+MIN_TIMEOUT_SHARE = 0.25      # never below a quarter of the configured timeout
+MIN_HEDGE_DELAY_S = 0.02
+
+CONSECUTIVE_FAILURES = 5
+WINDOW = 20
+FAILURE_RATIO = 0.5
+COOLDOWN_S = 2.0
+MAX_COOLDOWN_S = 30.0
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+CIRCUIT_STATES = (CLOSED, HALF_OPEN, OPEN)  # in the order of the metric's values
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The game server is failing - the call was not sent."""
+
+
+def _percentile(ordered: list, q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LatencyTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: dict[tuple, deque] = {}
+        self._cache: dict[tuple, tuple] = {}  # key -> (p95, p99), refreshed every few samples
+
+    def observe(self, key: tuple, seconds: float):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=LATENCY_WINDOW)
+            samples.append(seconds)
+            if len(samples) >= MIN_SAMPLES and (key not in self._cache or len(samples) % 10 == 0):
+                ordered = sorted(samples)
+                self._cache[key] = (_percentile(ordered, 0.95), _percentile(ordered, 0.99))
+
+    def timeout(self, key: tuple, configured: float) -> float:
+        with self._lock:
+            percentiles = self._cache.get(key)
+        if percentiles is None:
+            return configured
+        return round(min(configured, max(configured * MIN_TIMEOUT_SHARE, percentiles[1] * TIMEOUT_P99_FACTOR)), 3)
+
+    def hedge_delay(self, key: tuple) -> float | None:
+        with self._lock:
+            percentiles = self._cache.get(key)
+        return max(percentiles[0], MIN_HEDGE_DELAY_S) if percentiles else None
+
+    def stats(self, configured) -> dict:
+        """{"path type": {p95_ms, p99_ms, timeout_s}}; configured(path) -> the configured timeout."""
+        with self._lock:
+            cache = dict(self._cache)
+        return {f"{path} {request_type}".strip(): {
+                    "p95_ms": round(p95 * 1000, 1), "p99_ms": round(p99 * 1000, 1),
+                    "timeout_s": self.timeout((path, request_type), configured(path))}
+                for (path, request_type), (p95, p99) in sorted(cache.items())}
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._recent = deque(maxlen=WINDOW)  # True for a failure
+        self._consecutive = 0
+        self._cooldown = COOLDOWN_S
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> tuple[bool, bool]:
+        """(may the call be sent, is it the probe of a half-open breaker)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True, False
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True, True
+            self.rejected += 1
+            return False, False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(self._cooldown - (time.monotonic() - self._opened_at), 0.0)
+
+    def record(self, healthy: bool | None, probe: bool = False):
+        """healthy=None: the call failed on our side (bad URL, ...) - says nothing about the server."""
+        with self._lock:
+            if probe:
+                self._probing = False
+            if healthy is None:
+                return
+            self._recent.append(not healthy)
+            if healthy:
+                self._consecutive = 0
+                if self.state != CLOSED and probe:
+                    self.state, self._cooldown = CLOSED, COOLDOWN_S
+                    self._recent.clear()
+                    Logger.log_info(f"Circuit to {self.name} closed - the game server answers again")
+                return
+
+            self._consecutive += 1
+            if self.state == HALF_OPEN and probe:
+                self._open(min(self._cooldown * 2, MAX_COOLDOWN_S))
+            elif self.state == CLOSED and (
+                    self._consecutive >= CONSECUTIVE_FAILURES
+                    or (len(self._recent) == WINDOW and sum(self._recent) >= FAILURE_RATIO * WINDOW)):
+                self._open(COOLDOWN_S)
+
+    def _open(self, cooldown: float):
+        self.state, self._cooldown, self._opened_at = OPEN, cooldown, time.monotonic()
+        self.opened += 1
+        Logger.log_warning(f"Circuit to {self.name} opened for {cooldown:.0f}s - failing game-server calls fast",
+                           rate_key=f"circuit_open:{self.name}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "recent_failures": sum(self._recent), "recent_calls": len(self._recent),
+                    "opened": self.opened, "rejected": self.rejected}
@@ -2,165 +2,283 @@
 from typing import Any
 from . import *
 from .logger import Logger
-from collections import defaultdict
-import math
+from .event_cache import event_cache
+from .events import SessionEvents
+from .fling import FLING_GAMES, decode_fling, valid_rows
+from .hrv import hrv_by_actor, hrv_summary, DEFAULT_WINDOW_BEATS
+from .downsample import build_pyramids, query_pyramids, pyramid_store, DEFAULT_MAX_POINTS
+from .fanout import fan_out, MAX_WORKERS
+from .metrics import SESSION_EVENTS
+from .request_timing import timed
+import threading
+import zlib
 import numpy as np
 import requests
-import json
 
 
-def _decode_list(raw):
-    out = []
-    for item in raw:
-        if isinstance(item, str):
-            try:
-                out.append(json.loads(item))
-            except Exception as e:
-                Logger.log_error(f"JSON decode fail: {e}  sample={item[:120]}")
-        else:
-            out.append(item)
-    return out
+# event subtypes of each game's own analyzer (see SWIPE_SUBTYPES)
+GAME_SUBTYPES = {
+    "WATER_RIPPLES": ("CLICK", "SYNCED_AT_TIME"),
+    "FLOWER_GARDEN": ("CLICK", "SYNCED_AT_TIME"),
+    "WINE_GLASSES": ("FREQUENCY", "ANGLE", "SYNC_START_TIME", "SYNC_END_TIME"),
+    "FLOUR_MILL": ("FREQUENCY", "ANGLE", "SYNC_START_TIME", "SYNC_END_TIME"),
+    "WAVES": ("FLING",),
+    "PACMAN": ("FLING",),
+    "TREE": ("FLING",),
+}
+
+
+def _fetch_payload(session_id: str, subtype: str = None, timeout: float = None) -> list | None:
+    """
+    One round trip to /data/session/select/events, returning the raw payload.
+    subtype=None fetches every event of the session.
+    """
+    js = {"sessionId": session_id}
+    if subtype:
+        js["subtype"] = subtype
+
+    res = server_response(
+        post_auth(f"{URL}/data/session/select/events", json=js, timeout=timeout)
+    )
+
+    if not res or not res.get_success():
+        Logger.log_error(f"get_event_data – Failed to get data for session {session_id}")
+        return None
 
+    return res.get_payload()
 
-def get_event_data(session_id: str, type_: str = None, subtype: str = None) -> list[dict]:
-    try:
-        js = {"sessionId": session_id}
-        if subtype:
-            js["subtype"] = subtype
 
+def _fetch_events(session_id: str, subtype: str = None, timeout: float = None) -> SessionEvents:
+    payload = _fetch_payload(session_id, subtype, timeout)
+    return SessionEvents.from_dicts(decode_payload(payload, "session events")) if payload else SessionEvents.empty()
+
+
+def get_session_info(session_id: str) -> dict | None:
+    """The session's record (sessionType, state, duration, ...) from /data/session/select."""
+    try:
         res = server_response(
-            post_auth(f"{URL}/data/session/select/events", json=js, timeout=1.0)
+            post_auth(URL + "/data/session/select", json={"sessionId": session_id})
         )
+        if res.get_success() and res.get_payload():
+            return decode_one(res.get_payload(), "session")
+    except Exception as e:
+        Logger.log_error(f"get_session_info – {e}")
+    return None
 
-        if not res or not res.get_success():
-            Logger.log_error(f"get_event_data – Failed to get data for session {session_id}")
-            return []
 
-        events = _decode_list(res.get_payload())
-        if not events:
-            Logger.log_error(f"Session {session_id}: empty event list")
-            return []
+def get_session_state(session_id: str) -> str | None:
+    return (get_session_info(session_id) or {}).get("state")
+
+
+def _fetch_subtypes(session_id: str, subtypes) -> SessionEvents:
+    """
+    One filtered query per subtype, all in flight at once, decoded into a single SessionEvents.
+    A subtype whose query fails is left out; the others are still returned.
+    """
+    payloads = fan_out({subtype: (lambda st=subtype: _fetch_payload(session_id, st)) for subtype in subtypes})
+    decoded = []
+    for subtype in subtypes:  # keep the subtype order stable, whatever finished first
+        if payloads.get(subtype):
+            decoded.extend(decode_payload(payloads[subtype], f"{subtype} events"))
+    return SessionEvents.from_dicts(decoded)
+
+
+# the charts of one page load concurrently; the first request for an uncached session
+# fetches it, the others wait on the same lock and then find it in the cache
+_FETCH_LOCKS = [threading.Lock() for _ in range(32)]
+
+
+def _fetch_lock(session_id: str) -> threading.Lock:
+    return _FETCH_LOCKS[zlib.crc32(str(session_id).encode()) % len(_FETCH_LOCKS)]
+
+
+def _cached_or_fetch_all(session_id: str) -> SessionEvents | None:
+    """
+    All events of a session from the event cache, fetching and caching them if the session
+    is finished. Returns None for sessions that are still running (or whose state is unknown).
+    """
+    events = event_cache.get(session_id)
+    if events is not None:
+        return events
+
+    with _fetch_lock(session_id):
+        events = event_cache.get(session_id)
+        if events is not None:
+            return events
+
+        state = get_session_state(session_id)
+        if not event_cache.cacheable(state):
+            return None
+
+        payload = _fetch_payload(session_id)
+        if payload is None:
+            return SessionEvents.empty()
+        events = SessionEvents.from_dicts(decode_payload(payload, "session events"))
+        event_cache.put(session_id, events, state)
+        return events
+
+
+# filtered queries run concurrently (see fanout.py), so up to a pool's worth of them
+# is cheaper than one unfiltered query that drags every other subtype along
+MAX_FILTERED_FETCHES = MAX_WORKERS
+
 
-        if type_:
-            events = [ev for ev in events if ev.get("type") == type_]
+class SessionEventBundle:
+    """
+    Every event a page needs for one session, fetched once and split locally by subtype.
 
+    For a running session the subtypes are fetched with one filtered query each, concurrently;
+    for more than MAX_FILTERED_FETCHES one unfiltered query is used instead.
+    """
+
+    def __init__(self, session_id: str, subtypes=None):
+        self.session_id = session_id
+        self.subtypes = tuple(subtypes) if subtypes else None
+        self.final = False  # True when the session is finished - its events will not change
+        self.events = self._load()
+
+    def _load(self) -> SessionEvents:
+        try:
+            # finished sessions are served from (or stored in) the event cache
+            events = _cached_or_fetch_all(self.session_id)
+            self.final = events is not None
+            source = "final"
+            if events is None:
+                if self.subtypes and len(self.subtypes) <= MAX_FILTERED_FETCHES:
+                    events, source = _fetch_subtypes(self.session_id, self.subtypes), "filtered"
+                else:
+                    events, source = _fetch_events(self.session_id), "running"
+            SESSION_EVENTS.observe(len(events), source=source)
+        except Exception as e:
+            Logger.log_error(f"SessionEventBundle – {e}")
+            events = SessionEvents.empty()
+
+        if not len(events):
+            Logger.log_error(f"Session {self.session_id}: empty event list")
         return events
 
+    @classmethod
+    def from_events(cls, session_id: str, events: SessionEvents, final: bool = False) -> "SessionEventBundle":
+        """A bundle over events already at hand, without fetching anything (e.g. synthetic sessions)."""
+        bundle = cls.__new__(cls)
+        bundle.session_id, bundle.subtypes, bundle.final, bundle.events = session_id, None, final, events
+        return bundle
+
+    def get(self, type_: str = None, subtype: str = None) -> SessionEvents:
+        return self.events.select(type_, subtype)
+
+    def __len__(self):
+        return len(self.events)
+
+
+def get_event_data(session_id: str, type_: str = None, subtype: str = None,
+                   bundle: SessionEventBundle = None) -> SessionEvents:
+    if bundle is not None:
+        return bundle.get(type_, subtype)
+
+    try:
+        events = event_cache.get(session_id)
+        if events is None:
+            events = _fetch_events(session_id, subtype=subtype)
+        if not len(events):
+            Logger.log_error(f"Session {session_id}: empty event list")
+            return events
+
+        return events.select(type_, subtype)
+
     except Exception as e:
         Logger.log_error(f"get_event_data – {e}")
-        return []
+        return SessionEvents.empty()
 
 
-def get_heartrate(session_id: str):
-    try:
-        events = get_event_data(session_id, subtype="HEART_RATE")
-        if not events:
-            return {}
+def _format_timestamps(timestamps_ms: np.ndarray, t0: int = 0) -> list[float]:
+    """Seconds since t0, rounded to the millisecond - plain numbers, so the charts need no parsing."""
+    return np.round((np.asarray(timestamps_ms) - t0) / 1000.0, 3).tolist()
 
-        events.sort(key=lambda x: x["timestamp"])
-        t0 = events[0]["timestamp"]
 
-        heart_rate_data = defaultdict(lambda: {"timestamps": [], "values": []})
+def _series_by_actor(events: SessionEvents, t0: int) -> dict:
+    """{actor: {"timestamps": [...], "values": [...]}} for already sorted events."""
+    series = {}
+    for actor, rows in events.group_by_actor().items():
+        series[actor] = {
+            "timestamps": _format_timestamps(events.timestamp[rows], t0),
+            "values": events.value[rows].tolist(),
+        }
+    return series
 
-        for ev in events:
-            if ev["data"] == '0':
-                continue
-            timestamp = (ev["timestamp"] - t0) / 1000.0
-            heart_rate_data[ev["actor"]]["timestamps"].append(f"{timestamp:.3f}")
-            heart_rate_data[ev["actor"]]["values"].append(ev["data"])
 
-        return dict(heart_rate_data)
+def get_heartrate(session_id: str, bundle: SessionEventBundle = None):
+    try:
+        events = get_event_data(session_id, subtype="HEART_RATE", bundle=bundle).sorted()
+        if not len(events):
+            return {}
+
+        t0 = events.timestamp[0]
+        return _series_by_actor(events.take(events.value != 0), t0)
 
     except Exception as e:
         Logger.log_error(f"get_heartrate – {e}")
         return {}
 
 
-def get_latency(session_id: str):
+def get_latency(session_id: str, bundle: SessionEventBundle = None):
     try:
-        events = get_event_data(session_id, subtype="LATENCY")
-        if not events:
+        events = get_event_data(session_id, subtype="LATENCY", bundle=bundle).sorted()
+        if not len(events):
             return {}
 
-        events.sort(key=lambda x: x["timestamp"])
-        t0 = events[0]["timestamp"]
-
-        latency_data = defaultdict(lambda: {"timestamps": [], "values": []})
-
-        for ev in events:
-            timestamp = (ev["timestamp"] - t0) / 1000.0
-            latency_data[ev["actor"]]["timestamps"].append(f"{timestamp:.3f}")
-            latency_data[ev["actor"]]["values"].append(ev["data"])
-
-        return dict(latency_data)
+        t0 = events.timestamp[0]
+        return _series_by_actor(events, t0)
 
     except Exception as e:
         Logger.log_error(f"get_latency – {e}")
         return {}
 
 
-def get_jitter(session_id: str):
+def get_jitter(session_id: str, bundle: SessionEventBundle = None):
     try:
-        events = get_event_data(session_id, subtype="JITTER")
-        if not events:
+        events = get_event_data(session_id, subtype="JITTER", bundle=bundle).sorted()
+        if not len(events):
             return {}
 
-        events.sort(key=lambda x: x["timestamp"])
-        t0 = events[0]["timestamp"]
-
-        jitter_data = defaultdict(lambda: {"timestamps": [], "values": []})
-
-        for ev in events:
-            if ev["data"] == '0':
-                continue
-            timestamp = (ev["timestamp"] - t0) / 1000.0
-            jitter_data[ev["actor"]]["timestamps"].append(f"{timestamp:.3f}")
-            jitter_data[ev["actor"]]["values"].append(ev["data"])
-
-        return dict(jitter_data)
+        t0 = events.timestamp[0]
+        return _series_by_actor(events.take(events.value != 0), t0)
 
     except Exception as e:
         Logger.log_error(f"get_jitter – {e}")
         return {}
 
 
-def get_and_calculate_HRV(session_id: str):
+@timed("analytics")
+def get_and_calculate_HRV(session_id: str, bundle: SessionEventBundle = None,
+                          window_size: int = DEFAULT_WINDOW_BEATS, window_ms: int = None):
+    """
+    Rolling HRV per actor. 'values' is the rolling SDNN (kept for the existing chart);
+    RMSSD and pNN50 of the same windows are returned alongside it.
+    window_size counts beats; pass window_ms to use a time-based window instead.
+    """
     try:
-        ibi_events = get_event_data(session_id, subtype="INTER_BEAT_INTERVAL")
-        if not ibi_events:
+        ibi_events = get_event_data(session_id, subtype="INTER_BEAT_INTERVAL", bundle=bundle)
+        if not len(ibi_events):
             Logger.log_error(f"Session {session_id}: No INTER_BEAT_INTERVAL events found")
             return {}
 
-        ibi_events.sort(key=lambda x: x["timestamp"])
-
-        actor_ibi = defaultdict(list)
-        for ev in ibi_events:
-            try:
-                interval = float(ev["data"])
-                if interval > 0:
-                    actor_ibi[ev["actor"]].append((ev["timestamp"], interval))
-            except Exception as e:
-                Logger.log_error(f"HRV parse error: {e}  data={ev['data']}")
+        unparsed = np.isnan(ibi_events.value).sum()
+        if unparsed:
+            Logger.log_error(f"Session {session_id}: {unparsed} unparsable INTER_BEAT_INTERVAL values")
 
         hrv_data = {}
-        window_size = 10
-        for actor, intervals in actor_ibi.items():
-            if len(intervals) < window_size:
+        for actor, series in hrv_by_actor(ibi_events, window_size, window_ms).items():
+            if not len(series["timestamps"]):
                 Logger.log_error(f"Actor {actor}: Not enough intervals for HRV calculation")
                 continue
 
-            timestamps = []
-            values = []
-            t0 = intervals[0][0]
-
-            for i in range(window_size, len(intervals) + 1):
-                window_intervals = [val for _, val in intervals[i - window_size:i]]
-                hrv = np.std(window_intervals)
-                timestamp = (intervals[i - 1][0] - t0) / 1000.0
-                timestamps.append(f"{timestamp:.3f}")
-                values.append(hrv)
-
-            hrv_data[actor] = {"timestamps": timestamps, "values": values}
+            hrv_data[actor] = {
+                "timestamps": _format_timestamps(series["timestamps"], series["t0"]),
+                "values": series["sdnn"].tolist(),
+                "rmssd": series["rmssd"].tolist(),
+                "pnn50": series["pnn50"].tolist(),
+            }
 
         return hrv_data
 
@@ -169,213 +287,246 @@ def get_and_calculate_HRV(session_id: str):
         return {}
 
 
-def get_click_game_sync(session_id: str):
-    click_events = get_event_data(session_id, type_="USER_INPUT", subtype="CLICK")
-    sync_events = get_event_data(session_id, subtype="SYNCED_AT_TIME")
+def get_click_game_sync(session_id: str, bundle: SessionEventBundle = None):
+    click_events = get_event_data(session_id, type_="USER_INPUT", subtype="CLICK", bundle=bundle)
+    sync_events = get_event_data(session_id, subtype="SYNCED_AT_TIME", bundle=bundle).sorted()
 
-    click_data = defaultdict(list)
-    sync_data = []
+    click_data = {}
+    for actor, rows in click_events.group_by_actor().items():
+        click_data[actor] = _format_timestamps(click_events.timestamp[rows])
 
-    for ev in click_events:
-        timestamp_sec = ev["timestamp"] / 1000.0
-        click_data[ev["actor"]].append(f"{timestamp_sec:.3f}")
+    return click_data, _format_timestamps(sync_events.timestamp)
 
-    for ev in sync_events:
-        timestamp_sec = ev["timestamp"] / 1000.0
-        sync_data.append(f"{timestamp_sec:.3f}")
 
-    return dict(click_data), sorted(sync_data)
+SWIPE_SUBTYPES = GAME_SUBTYPES["WINE_GLASSES"]
 
 
-def get_swipe_game_frequency(session_id: str):
-    frequency_events = get_event_data(session_id, type_="USER_INPUT", subtype="FREQUENCY")
-    angle_events = get_event_data(session_id, type_="USER_INPUT", subtype="ANGLE")
-    sync_start_events = get_event_data(session_id, subtype="SYNC_START_TIME")
-    sync_end_events = get_event_data(session_id, subtype="SYNC_END_TIME")
+def _numeric(events: SessionEvents, subtype: str, session_id: str) -> np.ndarray:
+    """Mask of the events whose data is a number; the others are logged once per call."""
+    invalid = np.isnan(events.value)
+    if invalid.any():
+        Logger.log_error(f"Invalid {subtype} data in {int(invalid.sum())} events, e.g. {events.raw[invalid][0]}",
+                         rate_key=f"invalid_{subtype.lower()}", session_id=session_id)
+    return ~invalid
 
-    frequency_data = defaultdict(lambda: {"timestamps": [], "values": []})
-    angle_data = defaultdict(lambda: {"timestamps": [], "values": []})
 
-    for ev in frequency_events:
-        try:
-            timestamp_sec = ev["timestamp"] / 1000.0
-            value = float(ev["data"])
-            frequency_data[ev["actor"]]["timestamps"].append(f"{timestamp_sec:.3f}")
-            frequency_data[ev["actor"]]["values"].append(value)
-        except (ValueError, TypeError) as e:
-            Logger.log_error(f"Invalid FREQUENCY data: {ev['data']}  error={e}")
-
-    # --- ANGLE DATA: drop any value == 600, then convert degrees → sin(radians) so y ∈ [-1,1] ---
-    for ev in angle_events:
-        try:
-            raw_value = float(ev["data"])
-            if raw_value == 600:
-                # skip any outlier or placeholder of 600
-                continue
+def _swipe_series(events: SessionEvents, values: np.ndarray) -> dict:
+    """
+    {actor: {"timestamps": seconds, "values": values}} with float64 arrays, each actor's rows in
+    timestamp order. The arrays go straight into build_pyramids(); nothing is turned into lists.
+    """
+    series = {}
+    for actor, rows in events.group_by_actor().items():
+        rows = rows[np.argsort(events.timestamp[rows], kind="stable")]
+        series[actor] = {"timestamps": np.round(events.timestamp[rows] / 1000.0, 3), "values": values[rows]}
+    return series
 
-            timestamp_sec = ev["timestamp"] / 1000.0
-            # convert degrees → radians, then take sine for unit-circle range
-            rad    = math.radians(raw_value)
-            unit_y = math.sin(rad)
-
-            angle_data[ev["actor"]]["timestamps"].append(f"{timestamp_sec:.3f}")
-            angle_data[ev["actor"]]["values"].append(unit_y)
-        except (ValueError, TypeError) as e:
-            Logger.log_error(f"Invalid ANGLE data: {ev['data']}  error={e}")
-
-    # --- SORT FREQUENCY DATA BY TIMESTAMP ---
-    for actor, data in frequency_data.items():
-        combined = list(zip(map(float, data["timestamps"]), data["values"]))
-        combined.sort(key=lambda x: x[0])
-        data["timestamps"] = [f"{t:.3f}" for t, _ in combined]
-        data["values"]     = [v for _, v in combined]
-
-    # --- SORT ANGLE DATA BY TIMESTAMP ---
-    for actor, data in angle_data.items():
-        combined = list(zip(map(float, data["timestamps"]), data["values"]))
-        combined.sort(key=lambda x: x[0])
-        data["timestamps"] = [f"{t:.3f}" for t, _ in combined]
-        data["values"]     = [v for _, v in combined]
+
+def get_swipe_game_frequency(session_id: str, bundle: SessionEventBundle = None):
+    if bundle is None:
+        # the four subtypes in one go instead of four round trips in a row
+        bundle = SessionEventBundle(session_id, SWIPE_SUBTYPES)
+    frequency_events = get_event_data(session_id, type_="USER_INPUT", subtype="FREQUENCY", bundle=bundle)
+    angle_events = get_event_data(session_id, type_="USER_INPUT", subtype="ANGLE", bundle=bundle)
+    sync_start_events = get_event_data(session_id, subtype="SYNC_START_TIME", bundle=bundle)
+    sync_end_events = get_event_data(session_id, subtype="SYNC_END_TIME", bundle=bundle)
+
+    frequency_events = frequency_events.take(_numeric(frequency_events, "FREQUENCY", session_id))
+    frequency_data = _swipe_series(frequency_events, frequency_events.value)
+
+    # --- ANGLE DATA: drop any value == 600 (placeholder), then degrees → sin(radians) so y ∈ [-1,1] ---
+    angle_events = angle_events.take(_numeric(angle_events, "ANGLE", session_id) & (angle_events.value != 600))
+    angle_data = _swipe_series(angle_events, np.sin(np.radians(angle_events.value)))
 
     # --- SYNC INTERVALS ---
-    sync_start_times = sorted(ev["timestamp"] / 1000.0 for ev in sync_start_events)
-    sync_end_times   = sorted(ev["timestamp"] / 1000.0 for ev in sync_end_events)
+    sync_start_times = np.sort(sync_start_events.timestamp / 1000.0).tolist()
+    sync_end_times   = np.sort(sync_end_events.timestamp / 1000.0).tolist()
 
     if len(sync_start_times) != len(sync_end_times):
         Logger.log_error(f"Session {session_id}: Mismatched SYNC_START_TIME and SYNC_END_TIME events")
 
     sync_intervals = list(zip(sync_start_times, sync_end_times))
 
-    return dict(frequency_data), dict(angle_data), sync_intervals
+    return frequency_data, angle_data, sync_intervals
 
 
-def get_waves(session_id: str):
-    try:
-        fling_events = get_event_data(session_id, type_="USER_INPUT", subtype="FLING")
-        if not fling_events:
-            Logger.log_error(f"Session {session_id}: No FLING events found")
-            return None
-
-        # Sort chronologically
-        fling_events.sort(key=lambda x: x["timestamp"])
-
-        fling_data = defaultdict(lambda: {"timestamps": [], "values": []})
-
-        for ev in fling_events:
-            try:
-                # Split "speed,side" string
-                parts = ev["data"].split(",")
-                speed = float(parts[0].strip())  # dp/sec
-                # side = int(parts[1]) if len(parts) > 1 else None  # optional use later
+def _fling_chart(session_id: str, bundle: SessionEventBundle, game: str) -> dict | None:
+    """{actor: {"timestamps": [...], <speed/reward fields>}} of the game's valid FLING events."""
+    fling_events = get_event_data(session_id, type_="USER_INPUT", subtype="FLING", bundle=bundle)
+    if not len(fling_events):
+        Logger.log_error(f"Session {session_id}: No FLING events found")
+        return None
 
-                timestamp_sec = (ev["timestamp"]) / 1000.0
-                fling_data[ev["actor"]]["timestamps"].append(f"{timestamp_sec:.3f}")
-                fling_data[ev["actor"]]["values"].append(speed)
-            except Exception as e:
-                Logger.log_error(f"Invalid FLING data: {ev.get('data')}  error={e}")
+    # Sort chronologically
+    fling_events = fling_events.sorted()
+    fling = decode_fling(fling_events, need_direction="direction" in FLING_GAMES[game])
+    valid = valid_rows(fling, game)
+    invalid = np.flatnonzero(~valid)
+    if len(invalid):
+        Logger.log_error(f"Invalid {game} data in {len(invalid)} FLING events, "
+                         f"e.g. {fling_events.take(invalid[:1]).data_strings()[0]!r}",
+                         rate_key=f"invalid_{game.lower()}", session_id=session_id)
+
+    fling_events = fling_events.take(valid)
+    speed, reward = fling["speed"][valid], fling["reward"][valid]
+    chart = {}
+    for actor, rows in fling_events.group_by_actor().items():
+        series = {"timestamps": _format_timestamps(fling_events.timestamp[rows])}
+        if game == "WAVES":
+            series["values"] = speed[rows].tolist()
+        else:
+            series["speed"] = speed[rows].tolist()
+            series["reward"] = reward[rows].tolist()
+        chart[actor] = series
 
-        if not fling_data:
-            Logger.log_error(f"Session {session_id}: Parsed no valid FLING data")
-            return None
+    if not chart:
+        Logger.log_error(f"Session {session_id}: Parsed no valid {game} data")
+        return None
+    return chart
 
-        return dict(fling_data) if fling_data else None
 
+def get_waves(session_id: str, bundle: SessionEventBundle = None):
+    try:
+        return _fling_chart(session_id, bundle, "WAVES")
     except Exception as e:
         Logger.log_error(f"get_waves – {e}")
         return None
 
 
-def get_pacman(session_id: str):
+def get_pacman(session_id: str, bundle: SessionEventBundle = None):
     try:
-        fling_events = get_event_data(session_id, type_="USER_INPUT", subtype="FLING")
-        if not fling_events:
-            Logger.log_error(f"Session {session_id}: No FLING events found")
-            return None
-
-        fling_events.sort(key=lambda x: x["timestamp"])
-
-        pacman_data = defaultdict(lambda: {"timestamps": [], "speed": [], "reward": []})
-
-        for ev in fling_events:
-            try:
-                parts = ev["data"].split(",")
-                if len(parts) < 3:
-                    raise ValueError("Incomplete PACMAN data")
-
-                speed = float(parts[0].strip())
-                # direction = int(parts[1])  # not used yet
-                reward = parts[2].strip().lower() == "true"
-
-                timestamp_sec = (ev["timestamp"]) / 1000.0
-
-                actor_data = pacman_data[ev["actor"]]
-                actor_data["timestamps"].append(f"{timestamp_sec:.3f}")
-                actor_data["speed"].append(speed)
-                actor_data["reward"].append(reward)
-
-            except Exception as e:
-                Logger.log_error(f"Invalid PACMAN data: {ev.get('data')}  error={e}")
-
-        if not pacman_data:
-            Logger.log_error(f"Session {session_id}: Parsed no valid PACMAN data")
-            return None
-
-        return dict(pacman_data) if pacman_data else None
-
+        return _fling_chart(session_id, bundle, "PACMAN")
     except Exception as e:
         Logger.log_error(f"get_pacman – {e}")
         return None
 
 
-
-def get_tree(session_id: str):
+def get_tree(session_id: str, bundle: SessionEventBundle = None):
     try:
-        fling_events = get_event_data(session_id, type_="USER_INPUT", subtype="FLING")
-        if not fling_events:
-            Logger.log_error(f"Session {session_id}: No FLING events found")
-            return None
-
-        fling_events.sort(key=lambda x: x["timestamp"])
-
-        tree_data = defaultdict(lambda: {"timestamps": [], "speed": [], "reward": []})
-
-        for ev in fling_events:
-            try:
-                parts = ev["data"].split(",")
-                if len(parts) < 3:
-                    raise ValueError("Incomplete TREE data")
-
-                speed = float(parts[0].strip())
-                int(parts[1].strip())  # direction is only validated for Tree session data
-                reward = parts[2].strip().lower() == "true"
-
-                timestamp_sec = (ev["timestamp"]) / 1000.0
-
-                actor_data = tree_data[ev["actor"]]
-                actor_data["timestamps"].append(f"{timestamp_sec:.3f}")
-                actor_data["speed"].append(speed)
-                actor_data["reward"].append(reward)
+        return _fling_chart(session_id, bundle, "TREE")
+    except Exception as e:
+        Logger.log_error(f"get_tree - {e}")
+        return None
 
-            except Exception as e:
-                Logger.log_error(f"Invalid TREE data: {ev.get('data')}  error={e}")
 
-        if not tree_data:
-            Logger.log_error(f"Session {session_id}: Parsed no valid TREE data")
-            return None
+# line-chart series served at multiple resolutions (see downsample.py)
+SERIES_SUBTYPES = {
+    "heart": ("HEART_RATE",),
+    "hrv": ("INTER_BEAT_INTERVAL",),
+    "latency": ("LATENCY",),
+    "jitter": ("JITTER",),
+    "frequency": ("FREQUENCY", "SYNC_START_TIME", "SYNC_END_TIME"),
+    "angle": ("ANGLE",),
+}
+
+
+def _compute_series(session_id: str, metric: str, bundle: SessionEventBundle, hrv_args: dict) -> dict:
+    if metric == "heart":
+        return get_heartrate(session_id, bundle)
+    if metric == "hrv":
+        return get_and_calculate_HRV(session_id, bundle, **hrv_args)
+    if metric == "latency":
+        return get_latency(session_id, bundle)
+    if metric == "jitter":
+        return get_jitter(session_id, bundle)
+    frequency_data, angle_data, _ = get_swipe_game_frequency(session_id, bundle)
+    return frequency_data if metric == "frequency" else angle_data
+
+
+def get_series_pyramids(session_id: str, metric: str, bundle: SessionEventBundle = None,
+                        series: dict = None, **hrv_args) -> dict:
+    """
+    {actor: SeriesPyramid} of a line-chart metric. Pyramids of finished sessions are kept in
+    the pyramid store; pass 'series' when the analyzer output is already at hand.
+    """
+    key = (str(session_id), metric, tuple(sorted(hrv_args.items())) if metric == "hrv" else ())
+    pyramids = pyramid_store.get(key)
+    if pyramids is not None:
+        return pyramids
+
+    if bundle is None:
+        bundle = SessionEventBundle(session_id, SERIES_SUBTYPES[metric])
+    if series is None:
+        series = _compute_series(session_id, metric, bundle, hrv_args)
+    pyramids = build_pyramids(series)
+    if bundle.final:
+        pyramid_store.put(key, pyramids)
+    return pyramids
+
+
+@timed("analytics")
+def get_downsampled_series(session_id: str, metric: str, t0: float = None, t1: float = None,
+                           max_points: int = DEFAULT_MAX_POINTS, method: str = "minmax",
+                           bundle: SessionEventBundle = None, series: dict = None, **hrv_args) -> dict:
+    try:
+        pyramids = get_series_pyramids(session_id, metric, bundle, series, **hrv_args)
+        return query_pyramids(pyramids, t0, t1, max_points, method)
+    except Exception as e:
+        Logger.log_error(f"get_downsampled_series – {metric}: {e}")
+        return {}
 
-        return dict(tree_data) if tree_data else None
 
-    except Exception as e:
-        Logger.log_error(f"get_tree - {e}")
-        return None
+# charts of the single-session page, each loaded on its own (see /session_data/single/<chart>)
+CHART_SUBTYPES = {
+    **SERIES_SUBTYPES,
+    "click_sync": ("CLICK", "SYNCED_AT_TIME"),
+    "waves": ("FLING",),
+    "pacman": ("FLING",),
+    "tree": ("FLING",),
+}
+GAME_CHARTS = {
+    "WATER_RIPPLES": "click_sync",
+    "FLOWER_GARDEN": "click_sync",
+    "WINE_GLASSES": "frequency",
+    "FLOUR_MILL": "frequency",
+    "WAVES": "waves",
+    "PACMAN": "pacman",
+    "TREE": "tree",
+}
+
+
+def charts_for_game(game_type_key: str) -> list[str]:
+    """Every chart the single-session page shows for a game."""
+    charts = ["heart", "hrv", "latency", "jitter"]
+    game_chart = GAME_CHARTS.get(game_type_key)
+    if game_chart:
+        charts.append(game_chart)
+    if game_chart == "frequency":
+        charts.append("angle")
+    return charts
+
+
+@timed("analytics")
+def get_session_chart(session_id: str, chart: str, max_points: int = DEFAULT_MAX_POINTS, **hrv_args):
+    """The data of one chart of the single-session page; line series come downsampled."""
+    if chart == "frequency":
+        bundle = SessionEventBundle(session_id, CHART_SUBTYPES[chart])
+        frequency_data, _, sync_intervals = get_swipe_game_frequency(session_id, bundle)
+        return {
+            "frequency_data": get_downsampled_series(session_id, chart, max_points=max_points,
+                                                     bundle=bundle, series=frequency_data),
+            "sync_intervals": sync_intervals,
+        }
+    if chart in SERIES_SUBTYPES:
+        return get_downsampled_series(session_id, chart, max_points=max_points, **hrv_args)
+
+    bundle = SessionEventBundle(session_id, CHART_SUBTYPES[chart])
+    if chart == "click_sync":
+        click_events, sync_events = get_click_game_sync(session_id, bundle)
+        return {"click_events": click_events, "sync_events": sync_events}
+    if chart == "waves":
+        return get_waves(session_id, bundle)
+    if chart == "pacman":
+        return get_pacman(session_id, bundle)
+    return get_tree(session_id, bundle)
 
 
 def get_lobbies_data() -> list[dict]:
     try:
         res = server_response(
-            post_auth(URL + "/data/experiment/select/names", json={"sessionId": None}, timeout=1.0)
+            post_auth(URL + "/data/experiment/select/names", json={"sessionId": None})
         )
-        return _decode_list(res.get_payload()) if res.get_success() else []
+        return decode_payload(res.get_payload()) if res.get_success() else []
     except Exception as e:
         Logger.log_error(f"get_lobbies – {e}")
         return []
@@ -384,9 +535,9 @@ def get_lobbies_data() -> list[dict]:
 def get_sessions_for_lobby(lobby_id: str) -> list[dict]:
     try:
         res = server_response(
-            post_auth(URL + "/data/session/select", json={"expId": lobby_id}, timeout=1.0)
+            post_auth(URL + "/data/session/select", json={"expId": lobby_id})
         )
-        return _decode_list(res.get_payload()) if res.get_success() else []
+        return decode_payload(res.get_payload()) if res.get_success() else []
     except Exception as e:
         Logger.log_error(f"get_sessions_for_lobby – {e}")
         return []
@@ -0,0 +1,206 @@
+#shared_state.py
+# Small key/value state that every worker process of the manager has to agree on - login
+# throttling, the session secret, precompute job status - in a SQLite file on the data
+# volume (/app/data/shared_state.db).
+#
+#   shared_state.incr("login_failures", client_ip)                   -> 3
+#   shared_state.set("login_lockout", client_ip, until, ttl=1800)
+#   shared_state.get("login_lockout", client_ip)                     -> until, or None once expired
+#
+# Values are JSON. Every call is a single statement on a per-thread connection, and the
+# database runs in WAL mode, so readers never wait for a writer and writers hold the lock
+# for microseconds. Entries may carry a time to live; expired ones read as missing and are
+# purged every PURGE_EVERY writes.
+#
+# Caches (snapshots, events, pyramids, the participant index) stay per process: they are
+# rebuilt from the game server and may briefly differ between workers without harm.
+
+import os
+import sqlite3
+import threading
+import time
+
+from . import DATA_DIR
+from .decoding import dumps, loads
+from .logger import Logger
+
+DB_NAME = "shared_state.db"
+BUSY_TIMEOUT_S = 5.0
+PURGE_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    ns      TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    value,
+    expires REAL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID
+"""
+
+
+def _encode(value):
+    # integers stay integers, so incr() can add to them in SQL
+    return value if isinstance(value, int) and not isinstance(value, bool) else dumps(value)
+
+
+def _decode(value):
+    return loads(value) if isinstance(value, (str, bytes)) else value
+
+
+class SharedState:
+    def __init__(self, path: str = os.path.join(DATA_DIR, DB_NAME)):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_pid = None
+        self._writes = 0
+
+    # ------------------------------------------------------------------ connection
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # first use in this thread, or a connection inherited through fork() - never reuse those
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._schema_lock:
+            if self._schema_pid != os.getpid():
+                conn.execute(_SCHEMA)
+                self._schema_pid = os.getpid()
+        self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _written(self):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    @staticmethod
+    def _expires(ttl: float | None) -> float | None:
+        return time.time() + ttl if ttl is not None else None
+
+    # ------------------------------------------------------------------ public
+
+    def get(self, ns: str, key: str, default=None):
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM kv WHERE ns = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+                (ns, str(key), time.time())).fetchone()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.get – {ns}/{key}: {e}", rate_key="shared_state")
+            return default
+        return _decode(row[0]) if row else default
+
+    def get_many(self, ns: str, keys) -> dict:
+        """{key: value} of the live entries among keys - one query however many keys are asked for."""
+        keys = [str(k) for k in keys]
+        if not keys:
+            return {}
+        try:
+            rows = self._conn().execute(
+                f"SELECT key, value FROM kv WHERE ns = ? AND key IN ({','.join('?' * len(keys))}) "
+                f"AND (expires IS NULL OR expires > ?)",
+                (ns, *keys, time.time())).fetchall()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.get_many – {ns}: {e}", rate_key="shared_state")
+            return {}
+        return {key: _decode(value) for key, value in rows}
+
+    def set(self, ns: str, key: str, value, ttl: float = None):
+        try:
+            self._conn().execute("INSERT OR REPLACE INTO kv (ns, key, value, expires) VALUES (?, ?, ?, ?)",
+                                 (ns, str(key), _encode(value), self._expires(ttl)))
+            self._written()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.set – {ns}/{key}: {e}", rate_key="shared_state")
+
+    def add(self, ns: str, key: str, value, ttl: float = None):
+        """Stores value unless a live entry exists. Returns whichever value is stored now."""
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "INSERT INTO kv (ns, key, value, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+                "WHERE kv.expires IS NOT NULL AND kv.expires <= ? "
+                "RETURNING value",
+                (ns, str(key), _encode(value), self._expires(ttl), now)).fetchone()
+            self._written()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.add – {ns}/{key}: {e}", rate_key="shared_state")
+            return value
+        # RETURNING yields no row when the existing entry was kept
+        return _decode(row[0]) if row else self.get(ns, key, value)
+
+    def incr(self, ns: str, key: str, amount: int = 1, ttl: float = None) -> int:
+        """Adds amount to a counter (a missing or expired one counts from 0) and returns the new value."""
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "INSERT INTO kv (ns, key, value, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET "
+                "  value = CASE WHEN kv.expires IS NOT NULL AND kv.expires <= ? THEN excluded.value "
+                "               ELSE kv.value + excluded.value END, "
+                "  expires = excluded.expires "
+                "RETURNING value",
+                (ns, str(key), amount, self._expires(ttl), now)).fetchone()
+            self._written()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.incr – {ns}/{key}: {e}", rate_key="shared_state")
+            return amount
+        return int(row[0])
+
+    def delete(self, ns: str, key: str):
+        try:
+            self._conn().execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, str(key)))
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.delete – {ns}/{key}: {e}", rate_key="shared_state")
+
+    def items(self, ns: str) -> list[tuple[str, object]]:
+        try:
+            rows = self._conn().execute(
+                "SELECT key, value FROM kv WHERE ns = ? AND (expires IS NULL OR expires > ?)",
+                (ns, time.time())).fetchall()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.items – {ns}: {e}", rate_key="shared_state")
+            return []
+        return [(key, _decode(value)) for key, value in rows]
+
+    def purge(self) -> int:
+        try:
+            return self._conn().execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?",
+                                        (time.time(),)).rowcount
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.purge – {e}", rate_key="shared_state")
+            return 0
+
+    def trim(self, ns: str, max_entries: int) -> int:
+        """Drops the entries of ns closest to expiry until at most max_entries are left."""
+        try:
+            conn = self._conn()
+            excess = conn.execute("SELECT COUNT(*) FROM kv WHERE ns = ?", (ns,)).fetchone()[0] - max_entries
+            if excess <= 0:
+                return 0
+            return conn.execute(
+                "DELETE FROM kv WHERE ns = ? AND key IN "
+                "(SELECT key FROM kv WHERE ns = ? ORDER BY expires IS NULL, expires LIMIT ?)",
+                (ns, ns, excess)).rowcount
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.trim – {ns}: {e}", rate_key="shared_state")
+            return 0
+
+    def stats(self) -> dict:
+        try:
+            rows = self._conn().execute(
+                "SELECT ns, COUNT(*) FROM kv WHERE expires IS NULL OR expires > ? GROUP BY ns",
+                (time.time(),)).fetchall()
+        except sqlite3.Error as e:
+            Logger.log_error(f"SharedState.stats – {e}", rate_key="shared_state")
+            rows = []
+        return {"path": self.path, "pid": os.getpid(), "entries": dict(rows)}
+
+
+shared_state = SharedState()
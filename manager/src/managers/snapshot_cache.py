@@ -0,0 +1,135 @@
+#snapshot_cache.py
+# Short-lived snapshots of game-server state that every page polls (lobbies, online
+# players, participants), so a burst of identical requests does not become a burst
+# of upstream calls and a briefly slow game server does not blank the UI.
+#
+# For every key:
+#   age < ttl                     -> served from the snapshot
+#   ttl <= age < stale_ttl        -> the (stale) snapshot is served right away and ONE
+#                                    background refresh is started (stale-while-revalidate)
+#   no snapshot / age >= stale_ttl -> loaded now; concurrent callers of the same key wait
+#                                    for that one upstream call (singleflight)
+# A failed load (the loader returned None or raised) never replaces a snapshot: the last
+# good one keeps being served until stale_ttl runs out.
+
+import threading
+import time
+
+from .fanout import current_token, fanout_token
+from .logger import Logger
+
+# resource -> (ttl, stale_ttl) in seconds
+RESOURCE_TTLS = {
+    "lobbies": (1.0, 30.0),
+    "lobby": (0.5, 10.0),
+    "online": (1.0, 30.0),
+    "participants": (10.0, 300.0),
+}
+DEFAULT_TTLS = (1.0, 30.0)
+WAIT_TIMEOUT_S = 15.0  # longest a caller waits for another caller's in-flight load
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at", "loading", "done", "generation", "invalidated")
+
+    def __init__(self):
+        self.value = None
+        self.loaded_at = None
+        self.loading = False
+        self.done = threading.Event()
+        self.generation = 0        # bumped by invalidate() - a load started before it is not trusted
+        self.invalidated = False   # changed through the manager - the next read loads
+
+
+class SnapshotCache:
+    def __init__(self, resource_ttls: dict = None):
+        self.resource_ttls = resource_ttls or RESOURCE_TTLS
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self.stats_counters = {"fresh": 0, "stale": 0, "loads": 0, "coalesced": 0, "failures": 0}
+
+    def get(self, resource: str, key: str, loader):
+        """The snapshot of 'key' (one instance of 'resource'), loading it with loader() if needed."""
+        ttl, stale_ttl = self.resource_ttls.get(resource, DEFAULT_TTLS)
+
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            age = None if entry.loaded_at is None else time.monotonic() - entry.loaded_at
+
+            if age is not None and not entry.invalidated:
+                if age < ttl:
+                    self.stats_counters["fresh"] += 1
+                    return entry.value
+                if age < stale_ttl:
+                    self.stats_counters["stale"] += 1
+                    if not entry.loading:
+                        generation = self._start_load(entry)
+                        threading.Thread(target=self._load,
+                                         args=(key, entry, loader, generation, stale_ttl, current_token()),
+                                         name="snapshot-refresh", daemon=True).start()
+                    return entry.value
+
+            if entry.loading:
+                self.stats_counters["coalesced"] += 1
+                generation = None
+            else:
+                generation = self._start_load(entry)
+            done = entry.done
+
+        if generation is not None:
+            self._load(key, entry, loader, generation, stale_ttl, token=None)
+        else:
+            done.wait(WAIT_TIMEOUT_S)
+        with self._lock:
+            return entry.value
+
+    def invalidate(self, *keys: str):
+        """Marks snapshots as outdated after a change made through the manager."""
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.invalidated = True
+                    entry.generation += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.stats_counters, "keys": len(self._entries)}
+
+    # ------------------------------------------------------------------ internals
+
+    @staticmethod
+    def _start_load(entry: _Entry) -> int:
+        entry.loading = True
+        entry.done = threading.Event()
+        return entry.generation
+
+    def _load(self, key: str, entry: _Entry, loader, generation: int, stale_ttl: float, token):
+        # background refreshes run without a request context - they use the caller's token
+        reset = fanout_token.set(token) if token is not None else None
+        try:
+            value = loader()
+        except Exception as e:
+            Logger.log_error(f"SnapshotCache – loading {key}: {e}")
+            value = None
+        finally:
+            if reset is not None:
+                fanout_token.reset(reset)
+
+        with self._lock:
+            self.stats_counters["loads"] += 1
+            if value is not None:
+                entry.value = value
+                entry.loaded_at = time.monotonic()
+                if entry.generation == generation:
+                    entry.invalidated = False
+            else:
+                self.stats_counters["failures"] += 1
+                # keep serving the last good snapshot - unless it is past its stale window
+                if entry.loaded_at is None or time.monotonic() - entry.loaded_at >= stale_ttl:
+                    entry.value = None
+            entry.loading = False
+            entry.done.set()
+
+
+snapshot_cache = SnapshotCache()
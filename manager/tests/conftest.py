@@ -0,0 +1,24 @@
+#conftest.py
+# Unit tests of the manager's vectorized analytics against plain per-row references.
+#
+#   cd manager
+#   python -m pytest tests
+#
+# The manager writes its data directory (logs, caches) when it is imported: it goes to a
+# temporary directory, removed at the end, unless MANAGER_DATA_DIR points somewhere else.
+
+import os
+import shutil
+import sys
+import tempfile
+
+TEMP_DATA_DIR = None if "MANAGER_DATA_DIR" in os.environ else tempfile.mkdtemp(prefix="manager-tests-")
+os.environ.setdefault("MANAGER_DATA_DIR", TEMP_DATA_DIR or "")
+os.environ.setdefault("MANAGER_LOG_STDOUT", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if TEMP_DATA_DIR:
+        shutil.rmtree(TEMP_DATA_DIR, ignore_errors=True)
@@ -0,0 +1,77 @@
+#test_downsample.py
+# lttb() and minmax_envelope() against plain loops over their buckets.
+
+import numpy as np
+import pytest
+
+from src.managers.downsample import lttb, minmax_envelope
+
+
+def _series(n: int, seed: int):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(1, 50, n))
+    y = np.cumsum(rng.normal(0, 1, n)) + np.where(rng.random(n) < 0.01, rng.normal(0, 40, n), 0)
+    return x, y
+
+
+def _reference_lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets, one bucket and one candidate at a time."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    chosen = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = np.mean(x[end:next_end]), np.mean(y[end:next_end])
+        best, best_area = start, -1.0
+        for b in range(start, end):
+            area = abs((x[a] - avg_x) * (y[b] - y[a]) - (x[a] - x[b]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = b, area
+        chosen.append(best)
+        a = best
+    chosen.append(n - 1)
+    return chosen
+
+
+def _reference_minmax(y, n_out):
+    """Indices of the first, the last, and the min and max of every bucket."""
+    n = len(y)
+    bucket = -(-n // ((n_out - 2) // 2))
+    chosen = {0, n - 1}
+    for begin in range(0, n, bucket):
+        values = list(y[begin:begin + bucket])
+        chosen.add(begin + values.index(min(values)))
+        chosen.add(begin + values.index(max(values)))
+    return sorted(chosen)
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 3), (1000, 100), (1001, 7), (5000, 2000), (4099, 512)])
+def test_lttb_matches_reference(n, n_out):
+    x, y = _series(n, seed=n)
+    out_x, out_y = lttb(x, y, n_out)
+    index = _reference_lttb(x, y, n_out)
+    assert len(out_x) == n_out
+    np.testing.assert_array_equal(out_x, x[index])
+    np.testing.assert_array_equal(out_y, y[index])
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 4), (1000, 100), (1001, 7), (5000, 2000), (4099, 512)])
+def test_minmax_envelope_matches_reference(n, n_out):
+    x, y = _series(n, seed=n)
+    out_x, out_y = minmax_envelope(x, y, n_out)
+    index = _reference_minmax(y, n_out)
+    assert len(out_x) <= n_out
+    np.testing.assert_array_equal(out_x, x[index])
+    np.testing.assert_array_equal(out_y, y[index])
+    assert out_y.min() == y.min() and out_y.max() == y.max()  # spikes survive
+
+
+@pytest.mark.parametrize("reduce", [lttb, minmax_envelope])
+def test_short_series_are_returned_as_they_are(reduce):
+    x, y = _series(50, seed=1)
+    out_x, out_y = reduce(x, y, 50)
+    assert out_x is x and out_y is y
+    out_x, out_y = reduce(x, y, 2)  # too few points to reduce to
+    assert out_x is x and out_y is y
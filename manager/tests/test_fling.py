@@ -0,0 +1,77 @@
+#test_fling.py
+# decode_fling() against the per-row str.split parsing it replaced in session_data.py.
+
+import random
+
+import numpy as np
+import pytest
+
+from src.managers.events import SessionEvents
+from src.managers.fling import FLING_GAMES, decode_fling, valid_rows
+
+
+def _reference(data: str, game: str):
+    """(speed, reward) of one row under the game's rules, or None when the row is invalid."""
+    parts = data.split(",")
+    try:
+        if game != "WAVES" and len(parts) < 3:
+            raise ValueError("incomplete")
+        speed = float(parts[0].strip())
+        if game == "TREE":
+            int(parts[1].strip())
+        reward = len(parts) > 2 and parts[2].strip().lower() == "true"
+    except ValueError:
+        return None
+    return speed, reward
+
+
+def _events(data: list) -> SessionEvents:
+    return SessionEvents.from_dicts([{"type": "USER_INPUT", "subtype": "FLING", "timestamp": 1000 + i,
+                                      "actor": f"00{i % 3}", "data": d} for i, d in enumerate(data)])
+
+
+def _assert_matches_reference(data: list):
+    events = _events(data)
+    strings = events.data_strings()
+    for game in FLING_GAMES:
+        fling = decode_fling(events, need_direction="direction" in FLING_GAMES[game])
+        valid = valid_rows(fling, game)
+        for row, text in enumerate(strings):
+            expected = _reference(text, game)
+            assert valid[row] == (expected is not None), (game, text)
+            if expected is not None:
+                assert fling["speed"][row] == expected[0] or (np.isnan(expected[0]) and np.isnan(fling["speed"][row])), \
+                    (game, text)
+                if game != "WAVES":
+                    assert fling["reward"][row] == expected[1], (game, text)
+
+
+MALFORMED = ["", "abc", "x,1,true", "1.0,x,false", "1.0,2.5,true", "1.0,,true", " , ,true", "1.0,2",
+             "1.0,2,", ",,", ",,,", "1_0,1_0,true", "1.0,2,tru e", "1.0,2,truex", "1.0,2, true,x"]
+WHITESPACE = [" 1.5 , 2 , TRUE ", "1.0,\t2\t,\tTrue\n", "1.0,2,\x1ctrue\x1f", "  3e2 ,+1, true ,extra"]
+NON_ASCII = ["é,1,true", "１.5,2,true", "1.0,٣,true", "1.0,2,trué", "٢.٥,١,TRUE"]
+OVERFLOWING = ["99999999999999999999999,1,true", "1.0,99999999999999999999999,true",
+               "1e400,1,true", "é,99999999999999999999999,true", "1.0,-99999999999999999999999,false"]
+NUMBERS = ["3", "2.5", "nan", "inf", "-0"]  # plain numbers are parsed when the events are built
+
+
+@pytest.mark.parametrize("data", [MALFORMED, WHITESPACE, NON_ASCII, OVERFLOWING, NUMBERS],
+                         ids=["malformed", "whitespace", "non_ascii", "overflowing", "numbers"])
+def test_edge_cases_match_reference(data):
+    # every case next to well-formed rows, so the batched and the per-string paths both run
+    _assert_matches_reference(data + ["12.5,1,true", "7,0,false"])
+
+
+@pytest.mark.parametrize("bad_share", [0.0, 0.05, 1.0])
+def test_random_sessions_match_reference(bad_share):
+    rng = random.Random(7)
+    bad = MALFORMED + WHITESPACE + NON_ASCII + OVERFLOWING + NUMBERS
+    data = [rng.choice(bad) if rng.random() < bad_share
+            else f"{rng.uniform(0, 900):.3f},{rng.randint(0, 3)},{rng.choice(['true', 'false'])}"
+            for _ in range(3000)]
+    _assert_matches_reference(data)
+
+
+def test_empty_session():
+    fling = decode_fling(SessionEvents.empty())
+    assert all(len(column) == 0 for column in fling.values())
@@ -0,0 +1,100 @@
+#test_hrv.py
+# rolling_hrv() against a window-by-window loop over every beat.
+
+import numpy as np
+import pytest
+
+from src.managers.hrv import NN50_THRESHOLD_MS, rolling_hrv
+
+
+def _session(seed: int, actors: int = 3, beats: int = 400):
+    """Interleaved IBI streams of several actors, with a few outliers (ectopic beats)."""
+    rng = np.random.default_rng(seed)
+    timestamp, ibi, group = [], [], []
+    for actor in range(actors):
+        intervals = rng.normal(800, 60, beats) + rng.choice([0, 0, 0, 0, 250, -250], beats)
+        intervals = np.clip(intervals, 300, 2000)
+        timestamp.append(1_700_000_000_000 + actor * 7 + np.cumsum(intervals).astype(np.int64))
+        ibi.append(intervals)
+        group.append(np.full(beats, actor))
+    shuffle = rng.permutation(actors * beats)
+    return np.concatenate(timestamp)[shuffle], np.concatenate(ibi)[shuffle], np.concatenate(group)[shuffle]
+
+
+def _reference(timestamp, ibi, group, window_beats=None, window_ms=None):
+    """{(group, timestamp): (sdnn, rmssd, pnn50)} of every row whose window is full."""
+    out = {}
+    for g in np.unique(group):
+        rows = np.flatnonzero(group == g)
+        rows = rows[np.argsort(timestamp[rows], kind="stable")]
+        t, x = timestamp[rows], ibi[rows]
+        for i in range(len(x)):
+            if window_ms is None:
+                if i + 1 < window_beats:
+                    continue
+                window = x[i + 1 - window_beats:i + 1]
+            else:
+                if t[i] - t[0] < window_ms:
+                    continue
+                window = x[:i + 1][t[:i + 1] > t[i] - window_ms]
+            if len(window) < 2:
+                continue
+            diffs = np.diff(window)
+            out[(g, t[i])] = (window.std(), np.sqrt(np.mean(diffs * diffs)),
+                              np.mean(np.abs(diffs) > NN50_THRESHOLD_MS) * 100.0)
+    return out
+
+
+def _computed(result):
+    valid = result["valid"]
+    return {(g, t): (sdnn, rmssd, pnn50) for g, t, sdnn, rmssd, pnn50 in zip(
+        result["group"][valid], result["timestamp"][valid], result["sdnn"][valid],
+        result["rmssd"][valid], result["pnn50"][valid])}
+
+
+@pytest.mark.parametrize("window_beats", [2, 10, 50])
+def test_beat_windows_match_reference(window_beats):
+    timestamp, ibi, group = _session(seed=window_beats)
+    computed = _computed(rolling_hrv(timestamp, ibi, group, window_beats=window_beats))
+    expected = _reference(timestamp, ibi, group, window_beats=window_beats)
+    assert computed.keys() == expected.keys()
+    for key, values in expected.items():
+        np.testing.assert_allclose(computed[key], values, rtol=1e-9, atol=1e-6, err_msg=str(key))
+
+
+@pytest.mark.parametrize("window_ms", [2_000, 30_000, 120_000])
+def test_time_windows_match_reference(window_ms):
+    timestamp, ibi, group = _session(seed=window_ms)
+    computed = _computed(rolling_hrv(timestamp, ibi, group, window_ms=window_ms))
+    expected = _reference(timestamp, ibi, group, window_ms=window_ms)
+    assert computed.keys() == expected.keys()
+    for key, values in expected.items():
+        np.testing.assert_allclose(computed[key], values, rtol=1e-9, atol=1e-6, err_msg=str(key))
+
+
+def test_time_window_bounds_on_regular_beats():
+    # beats exactly window_ms apart: the first full window and the beat that drops out
+    timestamp = np.arange(30, dtype=np.int64) * 1000
+    ibi = 1000.0 + (np.arange(30) % 4) * 60.0
+    group = np.zeros(30, dtype=int)
+    computed = _computed(rolling_hrv(timestamp, ibi, group, window_ms=5_000))
+    expected = _reference(timestamp, ibi, group, window_ms=5_000)
+    assert computed.keys() == expected.keys()
+    for key, values in expected.items():
+        np.testing.assert_allclose(computed[key], values, rtol=1e-9, atol=1e-6, err_msg=str(key))
+
+
+def test_windows_never_cross_actors():
+    # two actors with very different rhythms: a window mixing them would show a huge SDNN
+    timestamp = np.r_[np.arange(20) * 500, np.arange(20) * 1500 + 3]
+    ibi = np.r_[np.full(20, 500.0), np.full(20, 1500.0)]
+    group = np.r_[np.zeros(20, dtype=int), np.ones(20, dtype=int)]
+    result = rolling_hrv(timestamp, ibi, group, window_beats=5)
+    assert result["valid"].sum() == 2 * 16
+    assert np.all(result["sdnn"][result["valid"]] == 0)
+    assert np.all(result["rmssd"][result["valid"]] == 0)
+
+
+def test_empty_input():
+    result = rolling_hrv(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=int))
+    assert not len(result["sdnn"]) and not len(result["valid"])